@@ -0,0 +1,45 @@
+from django.contrib import admin
+from .models import CategorySalesDaily, ProductSalesDaily, RollupWatermark, SalesDaily
+
+
+class SalesRollupAdmin(admin.ModelAdmin):
+    """Read-only view of a rollup table; the rollup builder owns the rows"""
+    list_filter = ('date',)
+    date_hierarchy = 'date'
+    ordering = ('-date',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(SalesDaily)
+class SalesDailyAdmin(SalesRollupAdmin):
+    list_display = ('date', 'revenue', 'units', 'order_count')
+
+
+@admin.register(ProductSalesDaily)
+class ProductSalesDailyAdmin(SalesRollupAdmin):
+    list_display = ('date', 'product', 'revenue', 'units', 'order_count')
+    list_select_related = ('product',)
+    search_fields = ('product__name',)
+
+
+@admin.register(CategorySalesDaily)
+class CategorySalesDailyAdmin(SalesRollupAdmin):
+    list_display = ('date', 'category', 'revenue', 'units', 'order_count')
+    list_select_related = ('category',)
+
+
+@admin.register(RollupWatermark)
+class RollupWatermarkAdmin(admin.ModelAdmin):
+    list_display = ('name', 'updated_until', 'built_at')
+    readonly_fields = ('name', 'updated_until', 'built_at')
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+from analytics.rollups import build_sales_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily sales rollups for orders changed since the last build'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Recompute every day from scratch (e.g. after orders were deleted)'
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        days = build_sales_rollups(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {days} day(s) of sales rollups in {time.monotonic() - started:.2f}s'
+        ))
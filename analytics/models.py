@@ -0,0 +1,67 @@
+from django.db import models
+from products.models import Category, Product
+
+# Create your models here.
+
+class SalesRollup(models.Model):
+    """Totals for one day, counted from non-cancelled orders by creation date"""
+    date = models.DateField()
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units = models.PositiveIntegerField(default=0)
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+        ordering = ['-date']
+
+
+class SalesDaily(SalesRollup):
+    class Meta(SalesRollup.Meta):
+        verbose_name_plural = "Sales (daily)"
+        constraints = [
+            models.UniqueConstraint(fields=['date'], name='sales_daily_uniq'),
+        ]
+
+    def __str__(self):
+        return str(self.date)
+
+
+class ProductSalesDaily(SalesRollup):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_sales')
+
+    class Meta(SalesRollup.Meta):
+        verbose_name_plural = "Product sales (daily)"
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'product'], name='product_sales_daily_uniq'),
+        ]
+        indexes = [
+            # One product's sales history
+            models.Index(fields=['product', 'date'], name='product_sales_product_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product_id} on {self.date}"
+
+
+class CategorySalesDaily(SalesRollup):
+    # Null for products without a category
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, null=True, blank=True, related_name='daily_sales')
+
+    class Meta(SalesRollup.Meta):
+        verbose_name_plural = "Category sales (daily)"
+        indexes = [
+            models.Index(fields=['date', 'category'], name='category_sales_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.category_id or 'Uncategorized'} on {self.date}"
+
+
+class RollupWatermark(models.Model):
+    """How far the rollups have consumed ``Order.updated_at``"""
+    name = models.CharField(max_length=50, unique=True)
+    updated_until = models.DateTimeField(null=True, blank=True)
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} until {self.updated_until}"
@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Max, Sum
+from django.db.models.functions import TruncDate
+from orders.models import Order, OrderItem
+from .models import CategorySalesDaily, ProductSalesDaily, RollupWatermark, SalesDaily
+
+WATERMARK = 'sales'
+
+# Each rollup table and the order item fields it groups a day by
+ROLLUPS = [
+    (SalesDaily, {}),
+    (ProductSalesDaily, {'product_id': 'product'}),
+    (CategorySalesDaily, {'category_id': 'product__category'}),
+]
+
+
+def day_totals(items, group_by):
+    """Aggregate order items into one row per day (and group)"""
+    return (
+        items.annotate(day=TruncDate('order__created_at'))
+        .values('day', *group_by)
+        .annotate(
+            revenue=Sum(F('price') * F('quantity'), output_field=DecimalField(max_digits=14, decimal_places=2)),
+            units=Sum('quantity'),
+            order_count=Count('order', distinct=True),
+        )
+        .order_by()
+    )
+
+
+def build_sales_rollups(full=False):
+    """
+    Rebuild the daily rollups for every day with a changed order.
+
+    Orders updated since the stored watermark (minus ``SALES_ROLLUP_LAG`` to
+    catch transactions that committed late) mark their creation day dirty;
+    each dirty day is recomputed from its order items and replaced. Returns
+    the number of days rebuilt.
+    """
+    lag = timedelta(seconds=settings.SALES_ROLLUP_LAG)
+
+    with transaction.atomic():
+        # Serializes concurrent builds
+        watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+
+        changed = Order.objects.all()
+        if not full and watermark.updated_until is not None:
+            changed = changed.filter(updated_at__gt=watermark.updated_until - lag)
+        until = changed.aggregate(until=Max('updated_at'))['until']
+        if until is None:
+            return 0
+
+        items = OrderItem.objects.exclude(order__status='cancelled')
+        if full or watermark.updated_until is None:
+            days = None
+        else:
+            days = list(changed.annotate(day=TruncDate('created_at')).values_list('day', flat=True).distinct())
+            items = items.filter(order__created_at__date__in=days)
+
+        rebuilt = set()
+        for model, group_by in ROLLUPS:
+            stale = model.objects.all() if days is None else model.objects.filter(date__in=days)
+            stale.delete()
+            rows = [
+                model(
+                    date=row['day'],
+                    revenue=row['revenue'],
+                    units=row['units'],
+                    order_count=row['order_count'],
+                    **{field: row[source] for field, source in group_by.items()}
+                )
+                for row in day_totals(items, group_by.values())
+            ]
+            model.objects.bulk_create(rows, batch_size=1000)
+            rebuilt.update(row.date for row in rows)
+
+        watermark.updated_until = max(until, watermark.updated_until or until)
+        watermark.save()
+
+    return len(rebuilt) if days is None else len(days)
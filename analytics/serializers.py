@@ -0,0 +1,22 @@
+from rest_framework import serializers
+
+
+class SalesTotalsSerializer(serializers.Serializer):
+    """Revenue, units and orders summed over the requested days"""
+    revenue = serializers.DecimalField(max_digits=14, decimal_places=2)
+    units = serializers.IntegerField()
+    order_count = serializers.IntegerField()
+
+
+class DailySalesSerializer(SalesTotalsSerializer):
+    date = serializers.DateField()
+
+
+class ProductSalesSerializer(SalesTotalsSerializer):
+    product = serializers.IntegerField()
+    product_name = serializers.CharField()
+
+
+class CategorySalesSerializer(SalesTotalsSerializer):
+    category = serializers.IntegerField(allow_null=True)
+    category_name = serializers.CharField(allow_null=True)
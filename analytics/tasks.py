@@ -0,0 +1,15 @@
+import logging
+
+from celery import shared_task
+from .rollups import build_sales_rollups
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def refresh_sales_rollups():
+    """Fold orders changed since the last run into the daily rollups"""
+    days = build_sales_rollups()
+    if days:
+        logger.info("Rebuilt sales rollups for %s day(s)", days)
+    return days
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+from .models import CategorySalesDaily, ProductSalesDaily, RollupWatermark, SalesDaily
+from .rollups import build_sales_rollups
+
+MONDAY = datetime(2026, 3, 2, 10, 0, tzinfo=dt_timezone.utc)
+TUESDAY = MONDAY + timedelta(days=1)
+
+
+@override_settings(SALES_ROLLUP_LAG=0)
+class SalesRollupTest(TestCase):
+    """Test building the daily sales rollups"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='buyerpass123')
+        self.kitchen = Category.objects.create(name='Kitchen')
+        self.mug = Product.objects.create(
+            name='Mug', description='A mug', price=Decimal('8.00'), category=self.kitchen, in_stock_quantity=50
+        )
+        self.pan = Product.objects.create(
+            name='Pan', description='A pan', price=Decimal('30.00'), category=self.kitchen, in_stock_quantity=50
+        )
+        self.gift = Product.objects.create(
+            name='Gift Card', description='A gift card', price=Decimal('25.00'), in_stock_quantity=50
+        )
+
+    def order(self, created_at, *lines, status='pending'):
+        """Create an order placed at ``created_at`` with (product, quantity) lines"""
+        order = Order.objects.create(
+            user=self.user,
+            status=status,
+            total_amount=sum(product.price * quantity for product, quantity in lines)
+        )
+        for product, quantity in lines:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, price=product.price)
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        order.refresh_from_db()
+        return order
+
+    def test_full_build(self):
+        """Test product, category and daily totals, excluding cancelled orders"""
+        self.order(MONDAY, (self.mug, 2), (self.pan, 1))
+        self.order(MONDAY, (self.mug, 1), (self.gift, 1))
+        self.order(TUESDAY, (self.pan, 3))
+        self.order(TUESDAY, (self.mug, 10), status='cancelled')
+
+        self.assertEqual(build_sales_rollups(), 2)
+
+        monday = SalesDaily.objects.get(date=MONDAY.date())
+        self.assertEqual((monday.revenue, monday.units, monday.order_count), (Decimal('79.00'), 5, 2))
+        mug = ProductSalesDaily.objects.get(date=MONDAY.date(), product=self.mug)
+        self.assertEqual((mug.revenue, mug.units, mug.order_count), (Decimal('24.00'), 3, 2))
+        self.assertFalse(ProductSalesDaily.objects.filter(date=TUESDAY.date(), product=self.mug).exists())
+        kitchen = CategorySalesDaily.objects.get(date=MONDAY.date(), category=self.kitchen)
+        self.assertEqual((kitchen.revenue, kitchen.units, kitchen.order_count), (Decimal('54.00'), 4, 2))
+        self.assertEqual(CategorySalesDaily.objects.get(date=MONDAY.date(), category=None).revenue, Decimal('25.00'))
+
+    def test_incremental_build(self):
+        """Test only days with changed orders are rebuilt"""
+        self.order(MONDAY, (self.mug, 1))
+        tuesday = self.order(TUESDAY, (self.pan, 1))
+        build_sales_rollups()
+        self.assertEqual(build_sales_rollups(), 0)
+
+        # Rows for untouched days are left alone
+        SalesDaily.objects.filter(date=MONDAY.date()).update(units=99)
+        tuesday.status = 'cancelled'
+        tuesday.save()
+
+        self.assertEqual(build_sales_rollups(), 1)
+        self.assertEqual(SalesDaily.objects.get(date=MONDAY.date()).units, 99)
+        self.assertFalse(SalesDaily.objects.filter(date=TUESDAY.date()).exists())
+        self.assertEqual(RollupWatermark.objects.get().updated_until, tuesday.updated_at)
+
+        # --full recomputes everything
+        out = StringIO()
+        call_command('build_rollups', '--full', stdout=out)
+        self.assertIn('Rebuilt 1 day(s)', out.getvalue())
+        self.assertEqual(SalesDaily.objects.get(date=MONDAY.date()).units, 1)
+
+    def test_incremental_build_query_count(self):
+        """Test an incremental build does not scan orders it already folded in"""
+        for day in range(20):
+            self.order(MONDAY - timedelta(days=day), (self.mug, 1))
+        build_sales_rollups()
+        self.order(TUESDAY, (self.pan, 2))
+
+        # savepoint, watermark, changed max, dirty days, 3 x (delete, aggregate,
+        # insert), watermark update, release
+        with self.assertNumQueries(15):
+            self.assertEqual(build_sales_rollups(), 1)
+
+
+class SalesRollupAPITest(TestCase):
+    """Test the read-only dashboard endpoints"""
+
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='adminpass123', is_staff=True)
+        kitchen = Category.objects.create(name='Kitchen')
+        self.mug = Product.objects.create(name='Mug', description='A mug', price=Decimal('8.00'), category=kitchen)
+        self.pan = Product.objects.create(name='Pan', description='A pan', price=Decimal('30.00'), category=kitchen)
+        for day, product, revenue, units in [
+            (MONDAY, self.mug, '16.00', 2),
+            (MONDAY, self.pan, '30.00', 1),
+            (TUESDAY, self.mug, '80.00', 10),
+        ]:
+            ProductSalesDaily.objects.create(
+                date=day.date(), product=product, revenue=Decimal(revenue), units=units, order_count=1
+            )
+        SalesDaily.objects.create(date=MONDAY.date(), revenue=Decimal('46.00'), units=3, order_count=1)
+        SalesDaily.objects.create(date=TUESDAY.date(), revenue=Decimal('80.00'), units=10, order_count=1)
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+
+    def test_top_products(self):
+        """Test products are summed over the range and ranked by revenue"""
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/analytics/sales/products/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row['product_name'], row['revenue'], row['units']) for row in response.data['results']],
+            [('Mug', '96.00', 12), ('Pan', '30.00', 1)]
+        )
+
+        response = self.client.get(f'/api/analytics/sales/products/?date__lte={MONDAY.date()}&ordering=-units')
+        self.assertEqual(
+            [(row['product_name'], row['revenue']) for row in response.data['results']],
+            [('Mug', '16.00'), ('Pan', '30.00')]
+        )
+
+    def test_revenue_by_day(self):
+        """Test the daily series within a range"""
+        response = self.client.get(f'/api/analytics/sales/daily/?date__gte={TUESDAY.date()}')
+
+        self.assertEqual(response.data, [
+            {'revenue': '80.00', 'units': 10, 'order_count': 1, 'date': str(TUESDAY.date())},
+        ])
+
+    def test_admin_only(self):
+        """Test regular users can't read sales figures"""
+        self.client.force_authenticate(user=User.objects.create_user(username='shopper', password='shopperpass123'))
+
+        response = self.client.get('/api/analytics/sales/categories/')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,61 @@
+from django.db.models import F, Sum
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework import filters, generics
+from rest_framework.permissions import IsAdminUser
+from .models import CategorySalesDaily, ProductSalesDaily, SalesDaily
+from .serializers import CategorySalesSerializer, DailySalesSerializer, ProductSalesSerializer
+
+# Create your views here.
+
+class SalesRollupView(generics.ListAPIView):
+    """
+    Dashboard totals read from the daily rollups, never from order items
+    Filter the day range with ?date__gte= and ?date__lte=
+    """
+    permission_classes = [IsAdminUser]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
+    filterset_fields = {'date': ['gte', 'lte']}
+    ordering_fields = ['revenue', 'units', 'order_count']
+    ordering = ['-revenue']
+    model = None
+    group_by = []
+
+    def get_queryset(self):
+        """Sum the daily rows per group; the date filter applies before grouping"""
+        return self.model.objects.values(*self.group_by).annotate(
+            revenue=Sum('revenue'),
+            units=Sum('units'),
+            order_count=Sum('order_count'),
+        ).order_by()
+
+
+class DailySalesView(SalesRollupView):
+    """Revenue, units and orders per day"""
+    model = SalesDaily
+    serializer_class = DailySalesSerializer
+    pagination_class = None  # One row per day of the requested range
+    ordering_fields = SalesRollupView.ordering_fields + ['date']
+    ordering = ['date']
+
+    def get_queryset(self):
+        return self.model.objects.values('date', 'revenue', 'units', 'order_count')
+
+
+class ProductSalesView(SalesRollupView):
+    """Top products over the day range, by revenue unless ?ordering= says otherwise"""
+    model = ProductSalesDaily
+    serializer_class = ProductSalesSerializer
+    group_by = ['product']
+
+    def get_queryset(self):
+        return super().get_queryset().annotate(product_name=F('product__name'))
+
+
+class CategorySalesView(SalesRollupView):
+    """Top categories over the day range"""
+    model = CategorySalesDaily
+    serializer_class = CategorySalesSerializer
+    group_by = ['category']
+
+    def get_queryset(self):
+        return super().get_queryset().annotate(category_name=F('category__name'))
@@ -0,0 +1,140 @@
+"""
+Time the admin change lists for orders, order items and products.
+
+Seeds a large order history (1M order items by default) unless --reuse-data,
+then loads each change list as a superuser and reports median latency and
+query count per page. --naive strips list_select_related, the estimated-count
+paginator and show_full_result_count=False first, to show what they save.
+
+    DATABASE_URL=postgres://... python benchmarks/admin_changelist.py
+    DATABASE_URL=postgres://... python benchmarks/admin_changelist.py --reuse-data --naive
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.data import generate  # noqa: E402
+
+def pages(orders, order_items):
+    """Change list URLs to time, including a page halfway through each big list"""
+    # ModelAdmin.list_per_page
+    per_page = 100
+    return [
+        '/admin/orders/order/',
+        f'/admin/orders/order/?p={max(1, orders // per_page // 2)}',
+        '/admin/orders/order/?status__exact=pending',
+        '/admin/orders/orderitem/',
+        f'/admin/orders/orderitem/?p={max(1, order_items // per_page // 2)}',
+        '/admin/orders/orderitem/?order__status=shipped',
+        '/admin/products/product/',
+        '/admin/products/product/?stock=low',
+    ]
+
+
+def make_naive():
+    """Put the admins back on Django's defaults for a before/after comparison"""
+    from django.contrib import admin
+    from django.core.paginator import Paginator
+    from orders.models import Order, OrderItem
+    from products.models import Product
+
+    for model in (Order, OrderItem, Product):
+        model_admin = admin.site._registry[model]
+        model_admin.list_select_related = False
+        model_admin.paginator = Paginator
+        model_admin.show_full_result_count = True
+
+
+def measure(client, path, repeat):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    timings = []
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = client.get(path)
+            timings.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path} returned {response.status_code}')
+    return {
+        'median_ms': round(statistics.median(timings) * 1000, 1),
+        'max_ms': round(max(timings) * 1000, 1),
+        'queries': len(context.captured_queries),
+        'db_ms': round(sum(float(q['time']) for q in context.captured_queries) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--order-items', type=int, default=1_000_000)
+    parser.add_argument('--items-per-order', type=int, default=4)
+    parser.add_argument('--products', type=int, default=20_000)
+    parser.add_argument('--users', type=int, default=5_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--naive', action='store_true', help='measure with Django default admin options')
+    parser.add_argument('--reuse-data', action='store_true', help='skip seeding; DATABASE_URL is already seeded')
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.update({
+        'DJANGO_SETTINGS_MODULE': 'shopsphere_project.settings',
+        'DATABASE_URL': os.getenv('DATABASE_URL') or f'sqlite:///{tmp.name}/bench.sqlite3',
+        'ALLOWED_HOSTS': 'testserver',
+        'PERF_LOG_LEVEL': 'WARNING',
+    })
+
+    import django
+    django.setup()
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import Client
+    from orders.models import Order
+
+    if not args.reuse_data:
+        call_command('migrate', verbosity=0)
+        started = time.perf_counter()
+        generate(
+            products=args.products,
+            users=args.users,
+            orders=args.order_items // args.items_per_order,
+            items_per_order=args.items_per_order,
+        )
+        print(f'seeded in {time.perf_counter() - started:.0f}s', file=sys.stderr)
+        if connection.vendor == 'postgresql':
+            # Fresh statistics so pg_class estimates are current
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    if args.naive:
+        make_naive()
+
+    admin_user, _ = User.objects.get_or_create(
+        username='bench-admin', defaults={'is_staff': True, 'is_superuser': True}
+    )
+    client = Client()
+    client.force_login(admin_user)
+
+    report = {
+        'database': connection.vendor,
+        'naive': args.naive,
+        'order_items': args.order_items,
+        'pages': {
+            path: measure(client, path, args.repeat)
+            for path in pages(Order.objects.count(), args.order_items)
+        },
+    }
+    tmp.cleanup()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Helpers shared by the benchmark scripts."""
+import math
+import subprocess
+import time
+import urllib.request
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def latency_summary(latencies, seconds):
+    """Request count, throughput and p50/p95/p99 (ms) for one run"""
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'seconds': round(seconds, 3),
+        'requests_per_second': round(len(latencies) / seconds, 1) if seconds else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f'server at {url} did not start')
+
+
+def start_gunicorn(env, port, mode='wsgi', workers=2):
+    """Start gunicorn with the project config and wait until it answers"""
+    server_env = {**env, 'SERVER_MODE': mode, 'WEB_CONCURRENCY': str(workers)}
+    server = subprocess.Popen(
+        ['gunicorn', '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'],
+        cwd=BASE_DIR, env=server_env
+    )
+    try:
+        wait_until_up(f'http://127.0.0.1:{port}/api/categories/')
+    except Exception:
+        server.terminate()
+        raise
+    return server
@@ -0,0 +1,158 @@
+"""
+Seed a database with a synthetic catalogue, users and order history.
+
+Deterministic for a given --seed, so runs on different commits see the same
+data. Uses the database from DATABASE_URL (SQLite or PostgreSQL), which
+should be migrated and empty:
+
+    DATABASE_URL=postgres://... python benchmarks/data.py --products 100000 --orders 50000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from decimal import Decimal
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Every benchmark user shares this password
+PASSWORD = 'benchpass123'
+USERNAME = 'bench-user-{}'
+
+WORDS = [
+    'wireless', 'ergonomic', 'compact', 'premium', 'vintage', 'solar', 'smart',
+    'leather', 'bamboo', 'steel', 'ceramic', 'portable', 'waterproof', 'organic',
+    'modular', 'classic', 'deluxe', 'travel', 'studio', 'outdoor',
+]
+NOUNS = [
+    'lamp', 'chair', 'headphones', 'kettle', 'backpack', 'keyboard', 'mug',
+    'speaker', 'jacket', 'monitor', 'blender', 'notebook', 'tent', 'watch',
+    'camera', 'desk', 'bottle', 'charger', 'pillow', 'sneakers',
+]
+
+
+def batched(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def generate(categories=20, products=2000, users=100, orders=1000, items_per_order=3, seed=0, batch_size=1000):
+    """
+    Bulk-insert the requested scale and return it.
+
+    bulk_create skips model signals, so search indexing and user profiles
+    are written here explicitly.
+    """
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from orders.models import Order, OrderItem
+    from products.models import Category, Product
+    from products.search import get_search_backend
+    from users.models import Profile
+
+    rng = random.Random(seed)
+    search = get_search_backend()
+
+    category_objs = Category.objects.bulk_create(
+        [Category(name=f'Category {i}', description=f'{rng.choice(WORDS)} goods') for i in range(categories)]
+    )
+
+    prices = {}
+    for start in range(0, products, batch_size):
+        batch = Product.objects.bulk_create([
+            Product(
+                name=f'{rng.choice(WORDS).title()} {rng.choice(NOUNS)} {i}',
+                description=' '.join(rng.choices(WORDS + NOUNS, k=30)),
+                price=Decimal(rng.randint(100, 50000)) / 100,
+                category=rng.choice(category_objs) if category_objs else None,
+                # Plenty of stock so checkout scenarios keep succeeding
+                in_stock_quantity=rng.randint(10_000, 100_000),
+            )
+            for i in range(start, min(start + batch_size, products))
+        ])
+        if search is not None:
+            search.index(batch)
+        prices.update((product.pk, product.price) for product in batch)
+
+    # Hash once; every user gets the same password
+    password = make_password(PASSWORD)
+    user_objs = []
+    for batch in batched(range(users), batch_size):
+        created = User.objects.bulk_create([
+            User(username=USERNAME.format(i), email=f'bench{i}@example.com', password=password)
+            for i in batch
+        ])
+        Profile.objects.bulk_create([Profile(user=user) for user in created])
+        user_objs += created
+
+    product_ids = list(prices)
+    for batch in batched(range(orders if user_objs and product_ids else 0), batch_size):
+        lines = [
+            [(product_id, rng.randint(1, 3)) for product_id in rng.sample(product_ids, min(items_per_order, len(product_ids)))]
+            for _ in batch
+        ]
+        order_objs = Order.objects.bulk_create([
+            Order(
+                user=rng.choice(user_objs),
+                status=rng.choice(Order.STATUS_CHOICES)[0],
+                total_amount=sum(prices[product_id] * quantity for product_id, quantity in order_lines),
+                item_count=sum(quantity for _, quantity in order_lines),
+                line_items=[
+                    {'product': product_id, 'quantity': quantity, 'price': str(prices[product_id])}
+                    for product_id, quantity in order_lines
+                ],
+            )
+            for order_lines in lines
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product_id=product_id, quantity=quantity, price=prices[product_id])
+            for order, order_lines in zip(order_objs, lines)
+            for product_id, quantity in order_lines
+        ])
+
+    return {
+        'categories': categories,
+        'products': products,
+        'users': users,
+        'orders': orders,
+        'items_per_order': items_per_order,
+        'seed': seed,
+    }
+
+
+def add_scale_arguments(parser):
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--orders', type=int, default=1000)
+    parser.add_argument('--items-per-order', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def scale_from_args(args):
+    return {
+        'categories': args.categories,
+        'products': args.products,
+        'users': args.users,
+        'orders': args.orders,
+        'items_per_order': args.items_per_order,
+        'seed': args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    add_scale_arguments(parser)
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shopsphere_project.settings')
+    import django
+    django.setup()
+
+    print(json.dumps(generate(**scale_from_args(args))))
+
+
+if __name__ == '__main__':
+    main()
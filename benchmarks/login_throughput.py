@@ -0,0 +1,112 @@
+"""
+Measure password logins per second, in total and per core, at each hashing tier.
+
+For every --iterations value (PBKDF2 rounds; 0 is Django's default) a user is
+given a hash at that count, then --processes worker processes post to
+/api/auth/login/ for --seconds. Login throttling is switched off so only
+hashing, the user lookup and token issuance are measured.
+
+    python benchmarks/login_throughput.py
+    DATABASE_URL=postgres://... python benchmarks/login_throughput.py --processes 4 --iterations 0 --iterations 2000000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import latency_summary  # noqa: E402
+
+USERNAME = 'bench-login'
+PASSWORD = 'bench-login-password'
+
+
+def worker(seconds):
+    """Log in back to back for ``seconds``; returns latencies and failures"""
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    client = APIClient(raise_request_exception=False)
+    latencies, failures = [], 0
+    deadline = time.perf_counter() + seconds
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            response = client.post('/api/auth/login/', {'username': USERNAME, 'password': PASSWORD}, format='json')
+            latencies.append(time.perf_counter() - started)
+            failures += response.status_code != 200
+    finally:
+        connection.close()
+    return latencies, failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--iterations', type=int, action='append', help='repeatable; default 0 and 600000')
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.update({
+        'DJANGO_SETTINGS_MODULE': 'shopsphere_project.settings',
+        'DATABASE_URL': os.getenv('DATABASE_URL') or f'sqlite:///{tmp.name}/bench.sqlite3',
+        'ALLOWED_HOSTS': 'testserver',
+        'PERF_LOG_LEVEL': 'WARNING',
+        'LOGIN_RATE_PER_IP': '',
+        'LOGIN_RATE_PER_USERNAME': '',
+        'PASSWORD_HASH_FAST_TIER': 'True',
+    })
+
+    import django
+    from django.conf import settings
+    django.setup()
+    if settings.DATABASES['default']['ENGINE'].endswith('sqlite3'):
+        # Queue token INSERTs from the workers on the lock instead of failing
+        settings.DATABASES['default'].setdefault('OPTIONS', {}).update(transaction_mode='IMMEDIATE', timeout=60)
+    from django.contrib.auth.hashers import get_hasher
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import connection, connections
+
+    call_command('migrate', verbosity=0)
+    user, _ = User.objects.get_or_create(username=USERNAME)
+
+    tiers = {}
+    for iterations in args.iterations or [0, 600_000]:
+        # Workers fork from here and inherit the tier
+        settings.PASSWORD_HASH_ITERATIONS = iterations
+        user.set_password(PASSWORD)
+        user.save()
+        connections.close_all()
+
+        started = time.perf_counter()
+        with multiprocessing.get_context('fork').Pool(args.processes) as pool:
+            results = pool.map(worker, [args.seconds] * args.processes)
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for worker_latencies, _ in results for latency in worker_latencies]
+        summary = latency_summary(latencies, elapsed)
+        tiers[f'iterations={get_hasher().iterations}'] = {
+            **summary,
+            'logins_per_second_per_core': round(summary['requests_per_second'] / args.processes, 1),
+            'failures': sum(failures for _, failures in results),
+        }
+
+    report = {
+        'database': connection.vendor,
+        'processes': args.processes,
+        'seconds': args.seconds,
+        'tiers': tiers,
+    }
+    tmp.cleanup()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
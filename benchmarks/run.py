@@ -0,0 +1,206 @@
+"""
+Run scripted API scenarios and report latency, throughput and queries.
+
+Seeds a database at the requested scale (a temporary SQLite file unless
+DATABASE_URL is set), then runs each scenario -- browse, search, paginate,
+login, checkout, order_history -- through the Django test client, or with
+--server against a real gunicorn process. Prints one JSON report with
+p50/p95/p99 latency, requests/second and queries per request per scenario.
+
+    python benchmarks/run.py --products 5000 --orders 5000
+    python benchmarks/run.py --server --concurrency 16 --output head.json
+    python benchmarks/run.py --baseline main.json --tolerance 0.25
+
+With --baseline the exit status is 1 if any scenario's p95 grew by more than
+the tolerance or its queries per request went up.
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import BASE_DIR, latency_summary, start_gunicorn  # noqa: E402
+from benchmarks.data import PASSWORD, USERNAME, add_scale_arguments, generate, scale_from_args  # noqa: E402
+from benchmarks.scenarios import SCENARIOS, HTTPDriver, Session, TestClientDriver  # noqa: E402
+
+
+def load_fixtures(users):
+    """Ids the scenarios pick from, read once from the seeded database"""
+    from products.models import Category, Product
+
+    product_ids = list(Product.objects.values_list('id', flat=True))
+    return {
+        'product_ids': product_ids,
+        'category_ids': list(Category.objects.values_list('id', flat=True)),
+        'pages': max(2, min(len(product_ids) // 10, 50)),
+        'users': users,
+    }
+
+
+def login_all(driver, users):
+    """Access tokens per virtual user, fetched before timing starts"""
+    tokens = []
+    for i in range(users):
+        status, body, _, _ = driver.request(
+            'post', '/api/auth/login/', {'username': USERNAME.format(i), 'password': PASSWORD}
+        )
+        if status != 200:
+            raise RuntimeError(f'login for {USERNAME.format(i)} failed with {status}')
+        tokens.append(body['tokens']['access'])
+    return tokens
+
+
+def run_scenario(driver, scenario, fixtures, tokens, iterations, concurrency, seed):
+    def run_one(i):
+        session = Session(driver, fixtures, i % len(tokens), tokens[i % len(tokens)])
+        scenario(session, random.Random(seed * 100_003 + i))
+        return session.samples
+
+    started = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            sessions = list(pool.map(run_one, range(iterations)))
+    else:
+        sessions = [run_one(i) for i in range(iterations)]
+    elapsed = time.perf_counter() - started
+
+    samples = [sample for session in sessions for sample in session]
+    queries = [sample['queries'] for sample in samples if sample['queries'] is not None]
+    return {
+        **latency_summary([sample['seconds'] for sample in samples], elapsed),
+        'errors': sum(1 for sample in samples if sample['status'] >= 400),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        'max_queries': max(queries, default=None),
+    }
+
+
+def run(driver, scale, scenarios, iterations, concurrency=1, seed=0):
+    """Run the named scenarios against seeded data and return their results"""
+    fixtures = load_fixtures(scale['users'])
+    tokens = login_all(driver, min(scale['users'], max(concurrency, 1) * 4))
+    results = {}
+    for name in scenarios:
+        # Warm up connections and caches outside the measurement
+        run_scenario(driver, SCENARIOS[name], fixtures, tokens, min(iterations, 5), 1, seed)
+        results[name] = run_scenario(driver, SCENARIOS[name], fixtures, tokens, iterations, concurrency, seed)
+    return results
+
+
+def regressions(report, baseline, tolerance):
+    """Scenarios whose p95 or queries per request got worse than the baseline"""
+    found = []
+    for name, result in report['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        if result['p95_ms'] > before['p95_ms'] * (1 + tolerance):
+            found.append(f"{name}: p95 {before['p95_ms']}ms -> {result['p95_ms']}ms")
+        if (result['queries_per_request'] or 0) > (before['queries_per_request'] or 0):
+            found.append(
+                f"{name}: queries/request {before['queries_per_request']} -> {result['queries_per_request']}"
+            )
+    return found
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    add_scale_arguments(parser)
+    parser.add_argument('--scenario', action='append', choices=list(SCENARIOS), help='repeatable; default all')
+    parser.add_argument('--iterations', type=int, default=50, help='sessions per scenario')
+    parser.add_argument('--server', action='store_true', help='drive a real gunicorn process over HTTP')
+    parser.add_argument('--server-mode', choices=['wsgi', 'asgi'], default='wsgi')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8770)
+    parser.add_argument('--concurrency', type=int, default=8, help='parallel sessions with --server')
+    parser.add_argument('--cache', action='store_true', help='keep the catalogue response cache on')
+    parser.add_argument('--reuse-data', action='store_true', help='skip seeding; DATABASE_URL is already seeded')
+    parser.add_argument('--output', help='write the report here as well as stdout')
+    parser.add_argument('--baseline', help='earlier report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 growth vs the baseline')
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.update({
+        'DJANGO_SETTINGS_MODULE': 'shopsphere_project.settings',
+        'DATABASE_URL': os.getenv('DATABASE_URL') or f'sqlite:///{tmp.name}/bench.sqlite3',
+        'CATALOGUE_CACHE_TIMEOUT': '300' if args.cache else '0',
+        'ALLOWED_HOSTS': 'localhost,127.0.0.1,testserver',
+        'PERF_SERVER_TIMING': 'True',
+        'PERF_LOG_LEVEL': 'WARNING',
+        # Every scripted session logs in from one address
+        'LOGIN_RATE_PER_IP': '',
+        'LOGIN_RATE_PER_USERNAME': '',
+    })
+    os.environ.pop('ASYNC_CATALOGUE_VIEWS', None)
+
+    import django
+    from django.core.management import call_command
+    from django.db import connection
+    django.setup()
+
+    scale = scale_from_args(args)
+    if not args.reuse_data:
+        call_command('migrate', verbosity=0)
+        generate(**scale)
+
+    server = None
+    if args.server:
+        server = start_gunicorn(dict(os.environ), args.port, args.server_mode, args.workers)
+        driver = HTTPDriver(f'http://127.0.0.1:{args.port}')
+    else:
+        driver = TestClientDriver()
+    try:
+        results = run(
+            driver,
+            scale,
+            args.scenario or list(SCENARIOS),
+            args.iterations,
+            args.concurrency if args.server else 1,
+            args.seed,
+        )
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+        tmp.cleanup()
+
+    report = {
+        'commit': git_commit(),
+        'database': connection.vendor,
+        'driver': driver.name if not args.server else f'http-{args.server_mode}',
+        'concurrency': args.concurrency if args.server else 1,
+        'cache': args.cache,
+        'scale': scale,
+        'scenarios': results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        Path(args.output).write_text(output + '\n')
+
+    if args.baseline:
+        found = regressions(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in found:
+            print(f'REGRESSION {line}', file=sys.stderr)
+        sys.exit(1 if found else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Scripted API sessions and the drivers that send their requests.
+
+A scenario is a function ``(session, rng)`` that makes a few requests the way
+a client would. The session records latency, status and query count (from
+the ``Server-Timing`` header) for every request, and the same scenario runs
+in-process through the Django test client or over HTTP against gunicorn.
+"""
+import json
+import re
+import time
+import urllib.error
+import urllib.request
+
+from .data import NOUNS, PASSWORD, USERNAME, WORDS
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+def queries_from(server_timing):
+    match = QUERIES.search(server_timing or '')
+    return int(match.group(1)) if match else None
+
+
+class TestClientDriver:
+    """Requests through the Django test client in this process"""
+    name = 'test_client'
+
+    def __init__(self):
+        from rest_framework.test import APIClient
+        self.client = APIClient()
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'} if token else {}
+        started = time.perf_counter()
+        response = getattr(self.client, method)(path, data, format='json', **headers)
+        elapsed = time.perf_counter() - started
+        body = response.json() if response.get('Content-Type') == 'application/json' else None
+        return response.status_code, body, elapsed, queries_from(response.get('Server-Timing'))
+
+
+class HTTPDriver:
+    """Requests over HTTP to a running server"""
+    name = 'http'
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def request(self, method, path, data=None, token=None):
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        body = json.dumps(data).encode() if data is not None else None
+        url = path if path.startswith('http') else self.base_url + path
+        request = urllib.request.Request(url, data=body, headers=headers, method=method.upper())
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                status, payload, server_timing = response.status, response.read(), response.headers.get('Server-Timing')
+        except urllib.error.HTTPError as e:
+            status, payload, server_timing = e.code, e.read(), e.headers.get('Server-Timing')
+        elapsed = time.perf_counter() - started
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            payload = None
+        return status, payload, elapsed, queries_from(server_timing)
+
+
+class Session:
+    """One virtual user running a scenario; collects a sample per request"""
+
+    def __init__(self, driver, fixtures, user_index, token=None):
+        self.driver = driver
+        self.fixtures = fixtures
+        self.username = USERNAME.format(user_index)
+        self.token = token
+        self.samples = []
+
+    def request(self, method, path, data=None, authenticated=False):
+        status, body, elapsed, queries = self.driver.request(
+            method, path, data, self.token if authenticated else None
+        )
+        self.samples.append({'path': path, 'status': status, 'seconds': elapsed, 'queries': queries})
+        return body
+
+    def get(self, path, **kwargs):
+        return self.request('get', path, **kwargs)
+
+    def post(self, path, data, **kwargs):
+        return self.request('post', path, data, **kwargs)
+
+
+def browse(session, rng):
+    """Catalogue landing page, a deeper page, a category, sorted, then a product"""
+    fixtures = session.fixtures
+    session.get('/api/products/')
+    session.get(f'/api/products/?page={rng.randint(2, fixtures["pages"])}')
+    session.get(f'/api/products/?category={rng.choice(fixtures["category_ids"])}')
+    session.get(f'/api/products/?ordering={rng.choice(["price", "-price", "name"])}')
+    session.get(f'/api/products/{rng.choice(fixtures["product_ids"])}/')
+    session.get('/api/categories/')
+
+
+def search(session, rng):
+    """Full-text searches of one and two words"""
+    session.get(f'/api/products/?search={rng.choice(NOUNS)}')
+    session.get(f'/api/products/?search={rng.choice(WORDS)}+{rng.choice(NOUNS)}')
+
+
+def paginate(session, rng):
+    """Follow keyset cursors several pages deep"""
+    body = session.get(f'/api/products/?pagination=cursor&ordering={rng.choice(["price", "-date_created"])}')
+    for _ in range(4):
+        if not body or not body.get('next'):
+            break
+        body = session.get(body['next'])
+
+
+def login(session, rng):
+    session.post('/api/auth/login/', {'username': session.username, 'password': PASSWORD})
+
+
+def checkout(session, rng):
+    """Place an order of one to three products, then view it"""
+    product_ids = rng.sample(session.fixtures['product_ids'], rng.randint(1, 3))
+    body = session.post(
+        '/api/orders/',
+        {'items': [{'product': product_id, 'quantity': 1} for product_id in product_ids]},
+        authenticated=True
+    )
+    if body and 'order' in body:
+        session.get(f"/api/orders/{body['order']['id']}/", authenticated=True)
+
+
+def order_history(session, rng):
+    """Profile, then order history by page and by cursor"""
+    session.get('/api/auth/profile/', authenticated=True)
+    session.get('/api/orders/', authenticated=True)
+    body = session.get('/api/orders/?pagination=cursor', authenticated=True)
+    if body and body.get('next'):
+        session.get(body['next'], authenticated=True)
+
+
+SCENARIOS = {
+    'browse': browse,
+    'search': search,
+    'paginate': paginate,
+    'login': login,
+    'checkout': checkout,
+    'order_history': order_history,
+}
@@ -0,0 +1,144 @@
+"""
+Race many buyers for one product, with and without sharded stock.
+
+Every thread places single-unit orders for the same product through the
+orders API, first against a plain ``in_stock_quantity`` row and then with the
+stock split over each --shards count. Reports orders/second, p50/p95/p99
+latency, failures, and whether stock went negative or was oversold.
+
+    DATABASE_URL=postgres://... python benchmarks/stock_contention.py --threads 64
+    DATABASE_URL=postgres://... python benchmarks/stock_contention.py --shards 0 --shards 8 --shards 32
+
+SQLite takes one write lock for the whole database, so only PostgreSQL shows
+what sharding buys; on SQLite the runs are a correctness check.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import latency_summary  # noqa: E402
+
+
+def reset_stock(product_id, stock, shards):
+    """Put ``stock`` units back on the product, split over ``shards`` rows"""
+    from products.inventory import shard_stock
+    from products.models import Product
+
+    shard_stock(product_id, 0)
+    Product.objects.filter(pk=product_id).update(in_stock_quantity=stock)
+    if shards:
+        shard_stock(product_id, shards)
+
+
+def race(product_id, users, orders_per_thread):
+    """Every user places ``orders_per_thread`` orders at once; returns samples and wall time"""
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    barrier = threading.Barrier(len(users) + 1)
+    samples = []
+
+    def buyer(user):
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user=user)
+        barrier.wait()
+        try:
+            for _ in range(orders_per_thread):
+                started = time.perf_counter()
+                response = client.post(
+                    '/api/orders/', {'items': [{'product': product_id, 'quantity': 1}]}, format='json'
+                )
+                samples.append((time.perf_counter() - started, response.status_code))
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=buyer, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--orders-per-thread', type=int, default=20)
+    parser.add_argument('--stock', type=int, help='units on sale per run; default threads x orders, so it sells out')
+    parser.add_argument('--shards', type=int, action='append', help='repeatable; 0 is unsharded; default 0 and 16')
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.update({
+        'DJANGO_SETTINGS_MODULE': 'shopsphere_project.settings',
+        'DATABASE_URL': os.getenv('DATABASE_URL') or f'sqlite:///{tmp.name}/bench.sqlite3',
+        'ALLOWED_HOSTS': 'testserver',
+        'PERF_LOG_LEVEL': 'WARNING',
+    })
+
+    import django
+    from django.conf import settings
+    django.setup()
+    if settings.DATABASES['default']['ENGINE'].endswith('sqlite3'):
+        # Queue writers on the lock instead of failing, as the test settings do
+        settings.DATABASES['default'].setdefault('OPTIONS', {}).update(transaction_mode='IMMEDIATE', timeout=60)
+    from django.contrib.auth.hashers import make_password
+    from django.contrib.auth.models import User
+    from django.core.management import call_command
+    from django.db import connection
+    from orders.models import OrderItem
+    from products.inventory import stock_totals
+    from products.models import Product, StockShard
+
+    call_command('migrate', verbosity=0)
+    password = make_password(None)
+    users = [
+        User.objects.get_or_create(username=f'contention-{i}', defaults={'password': password})[0]
+        for i in range(args.threads)
+    ]
+    product, _ = Product.objects.get_or_create(
+        name='Contention bench product', defaults={'description': 'One hot SKU', 'price': 10}
+    )
+    stock = args.stock or args.threads * args.orders_per_thread
+
+    runs = {}
+    for shards in args.shards or [0, 16]:
+        reset_stock(product.pk, stock, shards)
+        sold_before = OrderItem.objects.filter(product=product).count()
+        samples, elapsed = race(product.pk, users, args.orders_per_thread)
+
+        product.refresh_from_db()
+        remaining = stock_totals([product.pk], fresh=True)[product.pk] if shards else product.in_stock_quantity
+        sold = OrderItem.objects.filter(product=product).count() - sold_before
+        runs[f'shards={shards}'] = {
+            **latency_summary([seconds for seconds, _ in samples], elapsed),
+            'orders_per_second': round(sold / elapsed, 1) if elapsed else None,
+            'sold': sold,
+            'sold_out_rejections': sum(1 for _, code in samples if code == 400),
+            'errors': sum(1 for _, code in samples if code >= 500),
+            'remaining': remaining,
+            'consistent': sold + remaining == stock and not StockShard.objects.filter(quantity__lt=0).exists(),
+        }
+
+    report = {
+        'database': connection.vendor,
+        'threads': args.threads,
+        'orders_per_thread': args.orders_per_thread,
+        'stock': stock,
+        'runs': runs,
+    }
+    tmp.cleanup()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
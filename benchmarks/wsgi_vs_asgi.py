@@ -0,0 +1,108 @@
+"""
+Compare catalogue read throughput under WSGI and ASGI.
+
+Seeds one SQLite database, then serves it with gunicorn twice -- sync
+workers on the WSGI app, and uvicorn workers on the ASGI app with the async
+catalogue views -- and fires the same concurrent GETs at each. Prints one
+JSON object with requests/second and latency percentiles per mode.
+
+    python benchmarks/wsgi_vs_asgi.py --products 5000 --concurrency 64
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.common import BASE_DIR, latency_summary, start_gunicorn  # noqa: E402
+
+
+def seed(env, products, categories):
+    subprocess.run(
+        [sys.executable, 'manage.py', 'migrate', '--verbosity', '0'],
+        cwd=BASE_DIR, env=env, check=True
+    )
+    subprocess.run(
+        [
+            sys.executable, 'benchmarks/data.py',
+            '--products', str(products), '--categories', str(categories),
+            '--users', '0', '--orders', '0',
+        ],
+        cwd=BASE_DIR, env=env, check=True, stdout=subprocess.DEVNULL
+    )
+
+
+def fetch(url):
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=60) as response:
+        response.read()
+    return time.perf_counter() - start
+
+
+def run_load(base_url, paths, requests, concurrency):
+    urls = [base_url + paths[i % len(paths)] for i in range(requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(fetch, urls))
+    return latency_summary(latencies, time.perf_counter() - start)
+
+
+def benchmark(mode, env, args, port):
+    server = start_gunicorn(env, port, mode, args.workers)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        paths = [
+            '/api/products/',
+            '/api/products/?ordering=price&page=3',
+            '/api/products/?category=1',
+            '/api/products/1/',
+            '/api/categories/',
+        ]
+        run_load(base_url, paths, min(args.requests, 100), args.concurrency)  # warm up
+        return run_load(base_url, paths, args.requests, args.concurrency)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--categories', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--cache', action='store_true', help='keep the catalogue response cache on')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'shopsphere_project.settings',
+            'DATABASE_URL': f'sqlite:///{tmp}/bench.sqlite3',
+            'CATALOGUE_CACHE_TIMEOUT': '300' if args.cache else '0',
+        }
+        env.pop('ASYNC_CATALOGUE_VIEWS', None)
+        seed(env, args.products, args.categories)
+
+        results = {
+            'products': args.products,
+            'concurrency': args.concurrency,
+            'workers': args.workers,
+            'cache': args.cache,
+            'wsgi': benchmark('wsgi', env, args, args.port),
+            'asgi': benchmark('asgi', env, args, args.port + 1),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
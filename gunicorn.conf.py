@@ -0,0 +1,17 @@
+"""
+Gunicorn configuration.
+
+WSGI with sync workers by default. SERVER_MODE=asgi serves the ASGI
+application on uvicorn workers, so slow clients and async catalogue reads
+don't pin a worker each.
+"""
+import multiprocessing
+import os
+
+if os.getenv('SERVER_MODE') == 'asgi':
+    wsgi_app = 'shopsphere_project.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'shopsphere_project.wsgi:application'
+
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Order, OrderItem
+from shopsphere_project.pagination import EstimatedCountPaginator
+from .models import Order, OrderItem, OutboxEvent, StockHold
 
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
@@ -7,11 +8,21 @@ class OrderItemInline(admin.TabularInline):
     readonly_fields = ('product', 'quantity', 'price')  # Changed from price_at_purchase
     can_delete = False
 
+    def get_queryset(self, request):
+        # Each row shows its product's name
+        return super().get_queryset(request).select_related('product')
+
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'total_amount', 'status', 'created_at')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+    # Large table: estimate the unfiltered total, skip the second COUNT(*)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_filter = ('status', 'created_at')
     search_fields = ('user__username', 'user__email')
+    ordering = ('-created_at',)
     readonly_fields = ('total_amount', 'created_at', 'updated_at')
     inlines = [OrderItemInline]
     
@@ -30,9 +41,35 @@ class OrderAdmin(admin.ModelAdmin):
 @admin.register(OrderItem)
 class OrderItemAdmin(admin.ModelAdmin):
     list_display = ('id', 'order', 'product', 'quantity', 'price')  # Changed from price_at_purchase
+    # Order.__str__ reads the user, OrderItem.__str__ the product and order
+    list_select_related = ('order__user', 'product')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     list_filter = ('order__status',)
     search_fields = ('product__name', 'order__user__username')
     readonly_fields = ('order', 'product', 'quantity', 'price')  # Changed from price_at_purchase
     
     def has_add_permission(self, request):
-        return False
\ No newline at end of file
+        return False
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ('id', 'topic', 'created_at', 'processed_at')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_filter = ('topic',)
+    readonly_fields = ('topic', 'payload', 'created_at', 'processed_at')
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(StockHold)
+class StockHoldAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'product', 'quantity', 'expires_at')
+    list_select_related = ('user', 'product')
+    search_fields = ('user__username', 'product__name')
+    readonly_fields = ('user', 'product', 'quantity', 'created_at', 'expires_at')
+
+    def has_add_permission(self, request):
+        return False
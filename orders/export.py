@@ -0,0 +1,77 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+from django.http import StreamingHttpResponse
+from .models import OrderItem
+
+ORDER_FIELDS = ['id', 'created_at', 'status', 'total_amount']
+ITEM_FIELDS = ['product_id', 'product_name', 'quantity', 'price']
+CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """File-like object that hands each line written by csv.writer back"""
+
+    def write(self, value):
+        return value
+
+
+def iter_orders(queryset, chunk_size, include_user=False):
+    """
+    Yield ``(order, items)`` pairs as plain dicts in bounded memory.
+
+    Orders stream from one cursor (server-side on PostgreSQL); the items for
+    each chunk of orders are fetched with a single join on the product.
+    """
+    extra = {'username': F('user__username')} if include_user else {}
+    orders = (
+        queryset.order_by('created_at', 'id')
+        .values(*ORDER_FIELDS, **extra)
+        .iterator(chunk_size=chunk_size)
+    )
+
+    while chunk := list(islice(orders, chunk_size)):
+        items = {}
+        for item in (
+            OrderItem.objects.filter(order_id__in=[order['id'] for order in chunk])
+            .order_by('order_id', 'id')
+            .values('order_id', 'product_id', 'quantity', 'price', product_name=F('product__name'))
+        ):
+            items.setdefault(item.pop('order_id'), []).append(item)
+        for order in chunk:
+            yield order, items.get(order['id'], [])
+
+
+def csv_lines(rows, include_user=False):
+    """One CSV line per order item; orders without items get one line"""
+    writer = csv.writer(Echo())
+    order_fields = ORDER_FIELDS + (['username'] if include_user else [])
+    yield writer.writerow(order_fields + ITEM_FIELDS)
+    for order, items in rows:
+        order['created_at'] = order['created_at'].isoformat()
+        values = [order[field] for field in order_fields]
+        for item in items or [{}]:
+            yield writer.writerow(values + [item.get(field, '') for field in ITEM_FIELDS])
+
+
+def ndjson_lines(rows, include_user=False):
+    """One JSON object per order with its items nested"""
+    for order, items in rows:
+        yield json.dumps({**order, 'items': items}, cls=DjangoJSONEncoder) + '\n'
+
+
+def export_response(queryset, fmt, chunk_size, include_user=False, filename='orders'):
+    """Stream an order export; nothing is loaded before the client starts reading"""
+    rows = iter_orders(queryset, chunk_size, include_user)
+    lines = csv_lines if fmt == 'csv' else ndjson_lines
+    return StreamingHttpResponse(
+        lines(rows, include_user),
+        content_type=CONTENT_TYPES[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}.{fmt}"'}
+    )
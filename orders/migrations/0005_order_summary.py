@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:34
+
+from django.db import migrations, models
+
+
+def backfill_order_summary(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    orders = Order.objects.prefetch_related('items').order_by('pk')
+    batch = []
+    for order in orders.iterator(chunk_size=500):
+        items = list(order.items.all())
+        order.item_count = sum(item.quantity for item in items)
+        order.line_items = [
+            {'product': item.product_id, 'quantity': item.quantity, 'price': str(item.price)}
+            for item in items
+        ]
+        batch.append(order)
+        if len(batch) == 500:
+            Order.objects.bulk_update(batch, ['item_count', 'line_items'])
+            batch = []
+    Order.objects.bulk_update(batch, ['item_count', 'line_items'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_order_status_created_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='line_items',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(backfill_order_summary, migrations.RunPython.noop),
+    ]
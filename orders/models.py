@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
 from django.contrib.auth.models import User
 from products.models import Product
 
@@ -16,10 +17,52 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)  # Add this field
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
+    # Summary of the items, written at placement so order lists skip the item tables
+    item_count = models.PositiveIntegerField(default=0)
+    line_items = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        indexes = [
+            # A user's order history, newest first, with keyset pagination
+            models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_id_idx'),
+            # Admin changelist filtered by status and/or date, newest first
+            models.Index(fields=['status', '-created_at', '-id'], name='order_status_created_idx'),
+            models.Index(fields=['-created_at', '-id'], name='order_created_idx'),
+            # Orders changed since the analytics rollup watermark
+            models.Index(fields=['updated_at'], name='order_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        order = super().from_db(db, field_names, values)
+        order._loaded_status = order.__dict__.get('status')
+        return order
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None or 'status' in fields:
+            self._loaded_status = self.__dict__.get('status')
+
+    def save(self, *args, **kwargs):
+        """Record status transitions in the outbox in the same transaction"""
+        previous = getattr(self, '_loaded_status', None)
+        if self._state.adding or previous is None or previous == self.status:
+            super().save(*args, **kwargs)
+        else:
+            with transaction.atomic(using=kwargs.get('using')):
+                super().save(*args, **kwargs)
+                OutboxEvent.publish(
+                    'order.status_changed',
+                    order_id=self.pk,
+                    from_status=previous,
+                    to_status=self.status
+                )
+        # The stored status, for new instances too
+        self._loaded_status = self.__dict__.get('status')
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, related_name='items', on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -28,3 +71,69 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.quantity}x {self.product.name} in Order {self.order.id}"
+
+
+class StockHoldQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(expires_at__gt=timezone.now())
+
+
+class StockHold(models.Model):
+    """
+    Stock set aside for one user's cart until ``expires_at``.
+
+    Expired holds are ignored wherever stock is counted and deleted by the
+    sweeper task; see ``orders.stock``.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='stock_holds')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_holds')
+    quantity = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    objects = StockHoldQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'product'], name='stockhold_user_product_uniq'),
+        ]
+        indexes = [
+            # Active holds per product when counting available stock
+            models.Index(fields=['product', 'expires_at'], name='stockhold_product_expires_idx'),
+            # The sweeper's oldest-first scan of expired holds
+            models.Index(fields=['expires_at'], name='stockhold_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity}x product {self.product_id} held for user {self.user_id}"
+
+
+class OutboxEvent(models.Model):
+    """
+    An event written in the same transaction as the change that caused it.
+
+    The relay task turns pending events into background jobs after commit
+    (and periodically, for anything a crash left behind), so no event is lost
+    and none is sent for a rolled-back change.
+    """
+    topic = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], name='outbox_pending_idx', condition=models.Q(processed_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"{self.topic} #{self.id}"
+
+    @classmethod
+    def publish(cls, topic, **payload):
+        """Record an event; call inside the transaction that causes it"""
+        from .tasks import relay_outbox
+
+        event = cls.objects.create(topic=topic, payload=payload)
+        transaction.on_commit(relay_outbox.delay)
+        return event
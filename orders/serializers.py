@@ -1,24 +1,78 @@
+from django.db import transaction
 from rest_framework import serializers
-from .models import Order, OrderItem
+from .models import Order, OrderItem, StockHold
+from .stock import check_sharded_holds, create_order, held_quantities
+from products.inventory import stock_totals
 from products.models import Product
+from shopsphere_project.fieldsets import SparseFieldsMixin
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """The product of an order line, nested with ?expand=items.product"""
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'price', 'image']
+        read_only_fields = fields
+
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = ['id', 'product', 'quantity', 'price']
+        expandable_fields = {'product': (OrderItemProductSerializer, {'read_only': True})}
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
     
     class Meta:
         model = Order
-        fields = ['id', 'user', 'created_at', 'status', 'total_amount', 'items']
-        read_only_fields = ['user']
+        fields = ['id', 'user', 'created_at', 'status', 'total_amount', 'item_count', 'items']
+        read_only_fields = ['user', 'item_count']
+
+class OrderListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Order summary served from the orders_order row alone"""
+    items = serializers.JSONField(source='line_items', read_only=True)
+    
+    class Meta:
+        model = Order
+        fields = ['id', 'user', 'created_at', 'status', 'total_amount', 'item_count', 'items']
+        read_only_fields = fields
+
+class OrderItemListSerializer(serializers.ListSerializer):
+    """Look up every product an order references in one query"""
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            ids = set()
+            for item in data:
+                try:
+                    ids.add(int(item['product']))
+                except (KeyError, TypeError, ValueError):
+                    pass
+            self.known_products = Product.objects.order_by().in_bulk(ids)
+        return super().to_internal_value(data)
+
+class OrderProductField(serializers.PrimaryKeyRelatedField):
+    """Resolve the product from the list's batch lookup instead of a query per line"""
+
+    def to_internal_value(self, data):
+        known_products = getattr(self.parent.parent, 'known_products', None)
+        if known_products is None:
+            return super().to_internal_value(data)
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            return known_products[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
 
 class OrderItemCreateSerializer(serializers.ModelSerializer):
+    product = OrderProductField(queryset=Product.objects.all())
+
     class Meta:
         model = OrderItem
         fields = ['product', 'quantity']
+        list_serializer_class = OrderItemListSerializer
 
 class OrderCreateSerializer(serializers.ModelSerializer):
     items = OrderItemCreateSerializer(many=True)
@@ -34,41 +88,65 @@ class OrderCreateSerializer(serializers.ModelSerializer):
         
     def create(self, validated_data):
         items_data = validated_data.pop('items')
-        total_amount = 0
-        
-        # Calculate total amount and validate stock
-        for item_data in items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
-            
-            if product.stock < quantity:
-                raise serializers.ValidationError(
-                    f"Not enough stock for {product.name}. Available: {product.stock}"
-                )
-            
-            total_amount += product.price * quantity
-        
-        # Create order
-        order = Order.objects.create(
-            user=self.context['request'].user,
-            total_amount=total_amount
-        )
-        
-        # Create order items and update stock
+        user = self.context['request'].user
+
+        # Merge repeated lines so each product is locked and checked once
+        quantities = {}
         for item_data in items_data:
-            product = item_data['product']
-            quantity = item_data['quantity']
-            
-            OrderItem.objects.create(
-                order=order,
-                product=product,
-                quantity=quantity,
-                price=product.price
-            )
-            
-            # Update product stock
-            product.stock -= quantity
-            product.save()
-        
+            product_id = item_data['product'].pk
+            quantities[product_id] = quantities.get(product_id, 0) + item_data['quantity']
+
+        with transaction.atomic():
+            # Lock every unsharded product row in one query, in id order to avoid deadlocks
+            products = {item_data['product'].pk: item_data['product'] for item_data in items_data}
+            unsharded = [product_id for product_id, product in products.items() if not product.stock_shards]
+            if unsharded:
+                locked = Product.objects.select_for_update().filter(pk__in=unsharded).order_by('id')
+                if len(locked) != len(unsharded):
+                    raise serializers.ValidationError("One or more products no longer exist.")
+                products.update((product.pk, product) for product in locked)
+
+            # Validate against the locked rows and current shard sums, less
+            # what other carts are holding
+            sharded = [product_id for product_id, product in products.items() if product.stock_shards]
+            totals = stock_totals(sharded, fresh=True) if sharded else {}
+            held, own_holds = held_quantities(quantities, user)
+            for product_id, quantity in quantities.items():
+                product = products[product_id]
+                stock = totals[product_id] if product.stock_shards else product.in_stock_quantity
+                available = stock - held.get(product_id, 0)
+                if available < quantity:
+                    raise serializers.ValidationError(
+                        f"Not enough stock for {product.name}. "
+                        f"Available: {max(available, 0)}"
+                    )
+
+            if own_holds:
+                # The order covers what the buyer had reserved for these products
+                StockHold.objects.filter(user=user, product_id__in=own_holds).delete()
+
+            order = create_order(user, [
+                (products[item_data['product'].pk], item_data['quantity'])
+                for item_data in items_data
+            ])
+            if sharded:
+                # The check above read unlocked shard sums
+                check_sharded_holds(sharded, user)
+
         return order
 
+
+class StockHoldSerializer(serializers.ModelSerializer):
+    """One line of the cart: the stock held and until when"""
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    price = serializers.DecimalField(source='product.price', max_digits=10, decimal_places=2, read_only=True)
+
+    class Meta:
+        model = StockHold
+        fields = ['product', 'product_name', 'price', 'quantity', 'expires_at']
+        read_only_fields = fields
+
+class CartItemSerializer(serializers.Serializer):
+    """Reserve ``quantity`` of a product, replacing any earlier hold on it"""
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
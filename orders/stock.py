@@ -0,0 +1,209 @@
+"""
+Stock accounting for orders and cart reservations.
+
+A cart is the set of a user's ``StockHold`` rows. A hold keeps stock aside
+until it expires, so the stock on sale is ``in_stock_quantity`` minus the
+active holds of everyone else. Reserving locks the one product row being
+reserved, and checkout then converts the holds into an order with a single
+guarded UPDATE instead of locking every product again.
+
+Products with sharded stock (see ``products.inventory``) are not locked
+up front: their stock is taken shard by shard, and the shard guards are what
+stop an oversell. Reserving one locks its shards before its row, so no hold
+can appear while an order keeps the shard it took; a direct order that then
+finds other carts holding the product queues on the row and checks that
+the holds are still covered (``check_sharded_holds``).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rest_framework import serializers
+from products.inventory import add_stock, stock_expression, stock_totals, take_stock
+from products.models import Product, StockShard
+from .models import Order, OrderItem, OutboxEvent, StockHold
+
+
+def available_stock(product_ids, exclude_user=None):
+    """
+    Stock on sale per product id: units in stock less active holds, in one
+    aggregate query. ``exclude_user``'s own holds count as available
+    to them.
+    """
+    active = Q(stock_holds__expires_at__gt=timezone.now())
+    if exclude_user is not None:
+        active &= ~Q(stock_holds__user=exclude_user)
+    rows = (
+        Product.objects.filter(pk__in=product_ids)
+        .order_by()
+        .annotate(
+            stock=stock_expression(),
+            held=Coalesce(Sum('stock_holds__quantity', filter=active), 0),
+        )
+        .values_list('pk', 'stock', 'held')
+    )
+    return {pk: in_stock - held for pk, in_stock, held in rows}
+
+
+def held_quantities(product_ids, user):
+    """
+    Active holds on the products in one query: the quantity other users hold
+    per product id, and the set of product ids ``user`` holds.
+    """
+    rows = (
+        StockHold.objects.active()
+        .filter(product_id__in=product_ids)
+        .order_by()
+        .values('product_id')
+        .annotate(
+            held=Coalesce(Sum('quantity', filter=~Q(user=user)), 0),
+            own=Count('pk', filter=Q(user=user)),
+        )
+        .values_list('product_id', 'held', 'own')
+    )
+    held, own = {}, set()
+    for product_id, quantity, own_holds in rows:
+        held[product_id] = quantity
+        if own_holds:
+            own.add(product_id)
+    return held, own
+
+
+def decrement_stock(quantities, shards=None):
+    """
+    Apply every stock decrement in one UPDATE, refusing to go below zero.
+    Products in ``shards`` (id to shard count) are taken from their shards.
+    """
+    shards = shards or {}
+    for product_id in sorted(shards):
+        if not take_stock(product_id, quantities[product_id], shards[product_id]):
+            raise serializers.ValidationError(
+                "Stock changed while placing the order. Please try again."
+            )
+    quantities = {product_id: quantity for product_id, quantity in quantities.items() if product_id not in shards}
+    if quantities and not add_stock({product_id: -quantity for product_id, quantity in quantities.items()}):
+        raise serializers.ValidationError(
+            "Stock changed while placing the order. Please try again."
+        )
+
+
+def check_sharded_holds(product_ids, user):
+    """
+    Fail a direct order whose shard takes ate into stock other carts hold.
+
+    Runs after the stock is taken. Orders that find holds lock the product
+    rows in id order, so each sees the shard sums of the ones before it.
+    """
+    held, _ = held_quantities(product_ids, user)
+    held = {product_id: quantity for product_id, quantity in held.items() if quantity}
+    if not held:
+        return
+    list(Product.objects.select_for_update().filter(pk__in=held).order_by('id').values_list('pk', flat=True))
+    totals = stock_totals(held, fresh=True)
+    if any(totals[product_id] < quantity for product_id, quantity in held.items()):
+        raise serializers.ValidationError(
+            "Stock changed while placing the order. Please try again."
+        )
+
+
+def create_order(user, lines):
+    """
+    Write an order for ``(product, quantity)`` lines and take its stock.
+
+    The caller has already checked availability; this runs inside its
+    transaction and publishes ``order.placed`` to the outbox.
+    """
+    quantities = {}
+    for product, quantity in lines:
+        quantities[product.pk] = quantities.get(product.pk, 0) + quantity
+
+    # Create order with its item summary in the same INSERT
+    order = Order.objects.create(
+        user=user,
+        total_amount=sum(product.price * quantity for product, quantity in lines),
+        item_count=sum(quantity for _, quantity in lines),
+        line_items=[
+            {'product': product.pk, 'quantity': quantity, 'price': str(product.price)}
+            for product, quantity in lines
+        ]
+    )
+
+    # Create order items in a single INSERT
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, product=product, quantity=quantity, price=product.price)
+        for product, quantity in lines
+    ])
+
+    # Decrement stock for all products in a single conditional UPDATE
+    decrement_stock(quantities, {product.pk: product.stock_shards for product, _ in lines if product.stock_shards})
+
+    # Notifications, stock alerts and cache invalidation run after commit
+    OutboxEvent.publish('order.placed', order_id=order.pk)
+    return order
+
+
+def reserve(user, product_id, quantity):
+    """
+    Set the user's hold on a product to ``quantity`` for ``CART_HOLD_TTL``
+    seconds, if that much is available.
+    """
+    with transaction.atomic():
+        # Shards before the row, the order a sharded sale takes them in
+        list(StockShard.objects.select_for_update().filter(product_id=product_id).order_by('index'))
+        # Serialize reservations and orders of this product on its row
+        product = Product.objects.select_for_update().filter(pk=product_id).first()
+        if product is None:
+            raise serializers.ValidationError({'product': ["Product not found."]})
+        available = available_stock([product_id], exclude_user=user)[product_id]
+        if quantity > available:
+            raise serializers.ValidationError({'quantity': [f"Only {max(available, 0)} available."]})
+        hold, _ = StockHold.objects.update_or_create(
+            user=user,
+            product=product,
+            defaults={
+                'quantity': quantity,
+                'expires_at': timezone.now() + timedelta(seconds=settings.CART_HOLD_TTL),
+            },
+        )
+    return hold
+
+
+def release(user, product_id):
+    """Drop the user's hold on a product; returns whether there was one"""
+    deleted, _ = StockHold.objects.filter(user=user, product_id=product_id).delete()
+    return bool(deleted)
+
+
+def checkout(user):
+    """Turn the user's active holds into an order without locking product rows"""
+    with transaction.atomic():
+        now = timezone.now()
+        holds = list(StockHold.objects.filter(user=user, expires_at__gt=now).select_related('product').order_by('id'))
+        if not holds:
+            raise serializers.ValidationError("Your cart is empty or its reservations have expired.")
+
+        # Claim the holds; a concurrent checkout of the same cart deletes nothing
+        claimed, _ = StockHold.objects.filter(pk__in=[hold.pk for hold in holds], expires_at__gt=now).delete()
+        if claimed != len(holds):
+            raise serializers.ValidationError("Your cart changed during checkout. Please try again.")
+
+        # The holds kept this stock aside, so the guarded UPDATE is enough
+        return create_order(user, [(hold.product, hold.quantity) for hold in holds])
+
+
+def sweep_expired_holds(batch_size=1000):
+    """Delete expired holds in batches; returns how many were removed"""
+    removed = 0
+    while True:
+        batch = list(
+            StockHold.objects.filter(expires_at__lte=timezone.now())
+            .order_by('expires_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return removed
+        deleted, _ = StockHold.objects.filter(pk__in=batch, expires_at__lte=timezone.now()).delete()
+        removed += deleted
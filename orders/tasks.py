@@ -0,0 +1,113 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.core.mail import mail_admins, send_mail
+from django.db import transaction
+from django.utils import timezone
+from products.cache import bump_catalogue_version
+from products.inventory import stock_expression
+from products.models import Product
+from .models import Order, OutboxEvent
+from .stock import sweep_expired_holds
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def send_order_confirmation(order_id):
+    """Email the buyer a summary of the order they just placed"""
+    order = Order.objects.select_related('user').get(pk=order_id)
+    if not order.user.email:
+        return
+    lines = '\n'.join(
+        f"{item['quantity']} x product {item['product']} @ {item['price']}"
+        for item in order.line_items
+    )
+    send_mail(
+        f"Your ShopSphere order #{order.id}",
+        f"Thanks for your order!\n\n{lines}\n\nTotal: {order.total_amount}",
+        None,
+        [order.user.email]
+    )
+
+
+@shared_task
+def send_order_status_update(order_id, from_status, to_status):
+    """Email the buyer when their order moves to a new status"""
+    order = Order.objects.select_related('user').get(pk=order_id)
+    if not order.user.email:
+        return
+    send_mail(
+        f"Your ShopSphere order #{order.id} is {order.get_status_display().lower()}",
+        f"Order #{order.id} changed from {from_status} to {to_status}.",
+        None,
+        [order.user.email]
+    )
+
+
+@shared_task
+def check_stock_levels(order_id):
+    """Alert admins about products an order left at or below the threshold"""
+    order = Order.objects.get(pk=order_id)
+    product_ids = {item['product'] for item in order.line_items}
+    low = list(
+        Product.objects.annotate(stock=stock_expression()).filter(
+            pk__in=product_ids,
+            stock__lte=settings.LOW_STOCK_THRESHOLD
+        ).values_list('name', 'stock')
+    )
+    if not low:
+        return
+    report = '\n'.join(f"{name}: {quantity} left" for name, quantity in low)
+    logger.warning("Low stock after order %s:\n%s", order_id, report)
+    mail_admins("Low stock alert", report)
+
+
+@shared_task
+def invalidate_catalogue(**payload):
+    """Drop cached catalogue responses that show stock an order just sold"""
+    bump_catalogue_version()
+
+
+# Jobs to run for each outbox topic; each receives the event payload
+EVENT_HANDLERS = {
+    'order.placed': [send_order_confirmation, check_stock_levels, invalidate_catalogue],
+    'order.status_changed': [send_order_status_update],
+}
+
+
+@shared_task
+def relay_outbox(batch_size=100):
+    """Turn pending outbox events into background jobs, oldest first"""
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(processed_at__isnull=True)
+            .order_by('id')[:batch_size]
+        )
+        for event in events:
+            for handler in EVENT_HANDLERS.get(event.topic, []):
+                handler.delay(**event.payload)
+        OutboxEvent.objects.filter(pk__in=[event.pk for event in events]).update(
+            processed_at=timezone.now()
+        )
+    return len(events)
+
+
+@shared_task
+def purge_outbox(days=7):
+    """Delete relayed events older than ``days``"""
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted, _ = OutboxEvent.objects.filter(processed_at__lt=cutoff).delete()
+    return deleted
+
+
+@shared_task
+def sweep_stock_holds():
+    """Delete cart reservations that have expired"""
+    removed = sweep_expired_holds()
+    if removed:
+        logger.info("Released %s expired stock hold(s)", removed)
+    return removed
@@ -1,3 +1,842 @@
-from django.test import TestCase
+import json
+import threading
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from analytics.models import SalesDaily
+from products.inventory import shard_stock, stock_totals, take_stock
+from products.models import Category, Product, StockShard
+from shopsphere_project.testing import QueryPlanTestMixin
+from .models import Order, OrderItem, OutboxEvent, StockHold
+from .stock import available_stock
+from .tasks import purge_outbox, relay_outbox, sweep_stock_holds
+from .views import OrderViewSet
+
+
+class OrderCreateAPITest(TestCase):
+    """Test order placement"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.user = User.objects.create_user(
+            username='buyer',
+            password='buyerpass123'
+        )
+        self.category = Category.objects.create(name='Electronics')
+        self.laptop = Product.objects.create(
+            name='Laptop',
+            description='A laptop',
+            price=Decimal('1000.00'),
+            category=self.category,
+            in_stock_quantity=5
+        )
+        self.mouse = Product.objects.create(
+            name='Mouse',
+            description='A mouse',
+            price=Decimal('25.00'),
+            category=self.category,
+            in_stock_quantity=10
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_retry_with_idempotency_key(self):
+        """Test a retried order is replayed instead of placed and charged again"""
+        data = {'items': [{'product': self.laptop.id, 'quantity': 2}]}
+        first = self.client.post('/api/orders/', data, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+
+        with self.assertNumQueries(1):
+            retry = self.client.post('/api/orders/', data, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(Order.objects.count(), 1)
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.in_stock_quantity, 3)
+
+        # The same key from another user is a different request
+        other = User.objects.create_user(username='other', password='otherpass123')
+        self.client.force_authenticate(user=other)
+        response = self.client.post('/api/orders/', data, format='json', HTTP_IDEMPOTENCY_KEY='order-1')
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Order.objects.count(), 2)
+
+    def test_idempotency_key_reused_for_another_order(self):
+        """Test a key cannot replay a response to a different body"""
+        self.client.post(
+            '/api/orders/', {'items': [{'product': self.laptop.id, 'quantity': 1}]},
+            format='json', HTTP_IDEMPOTENCY_KEY='order-1'
+        )
+
+        response = self.client.post(
+            '/api/orders/', {'items': [{'product': self.mouse.id, 'quantity': 1}]},
+            format='json', HTTP_IDEMPOTENCY_KEY='order-1'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_create_order(self):
+        """Test placing an order with several items"""
+        data = {'items': [
+            {'product': self.laptop.id, 'quantity': 2},
+            {'product': self.mouse.id, 'quantity': 3},
+        ]}
+
+        response = self.client.post('/api/orders/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get()
+        self.assertEqual(order.total_amount, Decimal('2075.00'))
+        self.assertEqual(order.items.count(), 2)
+        self.laptop.refresh_from_db()
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.laptop.in_stock_quantity, 3)
+        self.assertEqual(self.mouse.in_stock_quantity, 7)
+
+    def test_create_order_with_repeated_product(self):
+        """Test that repeated lines for one product share its stock"""
+        data = {'items': [
+            {'product': self.laptop.id, 'quantity': 3},
+            {'product': self.laptop.id, 'quantity': 3},
+        ]}
+
+        response = self.client.post('/api/orders/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.laptop.refresh_from_db()
+        self.assertEqual(self.laptop.in_stock_quantity, 5)
+
+    def test_create_order_insufficient_stock_rolls_back(self):
+        """Test that a failing line leaves no order and no stock change behind"""
+        data = {'items': [
+            {'product': self.mouse.id, 'quantity': 1},
+            {'product': self.laptop.id, 'quantity': 6},
+        ]}
+
+        response = self.client.post('/api/orders/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.mouse.refresh_from_db()
+        self.assertEqual(self.mouse.in_stock_quantity, 10)
+
+    def test_create_order_query_count(self):
+        """Test that placement cost does not grow with the number of items"""
+        products = [
+            Product.objects.create(
+                name=f'Cable {i}',
+                description='A cable',
+                price=Decimal('5.00'),
+                category=self.category,
+                in_stock_quantity=10
+            )
+            for i in range(10)
+        ]
+        data = {'items': [{'product': p.id, 'quantity': 1} for p in products]}
+
+        # items validation (1 for all lines) + savepoint, lock, other carts'
+        # holds, order, items, stock update, outbox event, release + response
+        with self.assertNumQueries(10):
+            response = self.client.post('/api/orders/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class OrderConcurrencyTest(TransactionTestCase):
+    """Test that parallel checkouts never oversell a product"""
+
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Limited Edition',
+            description='Only a few available',
+            price=Decimal('50.00'),
+            in_stock_quantity=5
+        )
+        self.users = [
+            User.objects.create_user(username=f'buyer{i}', password='buyerpass123')
+            for i in range(10)
+        ]
+
+    def test_parallel_orders_same_product(self):
+        """Test that ten buyers racing for five units sell exactly five"""
+        barrier = threading.Barrier(len(self.users))
+        results = []
+
+        def place_order(user):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            barrier.wait()
+            try:
+                response = client.post(
+                    '/api/orders/',
+                    {'items': [{'product': self.product.id, 'quantity': 1}]},
+                    format='json'
+                )
+                results.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=place_order, args=(user,)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.product.refresh_from_db()
+        self.assertEqual(results.count(status.HTTP_201_CREATED), 5)
+        self.assertEqual(results.count(status.HTTP_400_BAD_REQUEST), 5)
+        self.assertEqual(self.product.in_stock_quantity, 0)
+        self.assertEqual(OrderItem.objects.count(), 5)
+
+    def test_parallel_reservations_and_orders(self):
+        """Test that holds and direct orders racing for five units never exceed five"""
+        barrier = threading.Barrier(len(self.users))
+        results = []
+
+        def buy(index, user):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            barrier.wait()
+            try:
+                if index % 2:
+                    response = client.post('/api/cart/', {'product': self.product.id, 'quantity': 1}, format='json')
+                else:
+                    response = client.post(
+                        '/api/orders/',
+                        {'items': [{'product': self.product.id, 'quantity': 1}]},
+                        format='json'
+                    )
+                results.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buy, args=pair) for pair in enumerate(self.users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.product.refresh_from_db()
+        self.assertEqual(results.count(status.HTTP_201_CREATED), 5)
+        sold = OrderItem.objects.count()
+        self.assertEqual(self.product.in_stock_quantity, 5 - sold)
+        self.assertEqual(StockHold.objects.count(), 5 - sold)
+
+    def test_parallel_orders_sharded_product(self):
+        """Test that buyers racing for sharded stock take every unit exactly once"""
+        shard_stock(self.product.id, 3)
+        barrier = threading.Barrier(len(self.users))
+        results = []
+
+        def place_order(user):
+            client = APIClient()
+            client.force_authenticate(user=user)
+            barrier.wait()
+            try:
+                response = client.post(
+                    '/api/orders/',
+                    {'items': [{'product': self.product.id, 'quantity': 1}]},
+                    format='json'
+                )
+                results.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=place_order, args=(user,)) for user in self.users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count(status.HTTP_201_CREATED), 5)
+        self.assertEqual(OrderItem.objects.count(), 5)
+        self.assertEqual(stock_totals([self.product.id], fresh=True), {self.product.id: 0})
+        self.assertFalse(StockShard.objects.filter(quantity__lt=0).exists())
+
+
+    def test_concurrent_duplicates_place_one_order(self):
+        """Test requests racing with one Idempotency-Key place a single order"""
+        user = self.users[0]
+        barrier = threading.Barrier(4)
+        responses = []
+
+        def place_order():
+            client = APIClient()
+            client.force_authenticate(user=user)
+            barrier.wait()
+            try:
+                responses.append(client.post(
+                    '/api/orders/',
+                    {'items': [{'product': self.product.id, 'quantity': 1}]},
+                    format='json',
+                    HTTP_IDEMPOTENCY_KEY='checkout-42'
+                ))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=place_order) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([response.status_code for response in responses], [201] * 4)
+        self.assertEqual({response.data['order']['id'] for response in responses}, {Order.objects.get().id})
+        self.assertEqual(sum(1 for response in responses if 'Idempotent-Replayed' in response), 3)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.in_stock_quantity, 4)
+
+class OrderListAPITest(TestCase):
+    """Test listing a user's orders"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='buyerpass123')
+        other = User.objects.create_user(username='other', password='otherpass123')
+        for _ in range(12):
+            Order.objects.create(user=self.user, total_amount=Decimal('10.00'))
+        Order.objects.create(user=other, total_amount=Decimal('10.00'))
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_list_orders_from_summary(self):
+        """Test the list is served from the order rows alone"""
+        product = Product.objects.create(
+            name='Widget', description='A widget', price=Decimal('2.50'), in_stock_quantity=50
+        )
+        self.client.post(
+            '/api/orders/',
+            {'items': [{'product': product.id, 'quantity': 3}, {'product': product.id, 'quantity': 1}]},
+            format='json'
+        )
+
+        # COUNT + page, no item or product queries
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/orders/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        newest = response.data['results'][0]
+        self.assertEqual(newest['item_count'], 4)
+        self.assertEqual(newest['items'], [
+            {'product': product.id, 'quantity': 3, 'price': '2.50'},
+            {'product': product.id, 'quantity': 1, 'price': '2.50'},
+        ])
+
+        # The detail view still expands the stored items
+        response = self.client.get(f"/api/orders/{newest['id']}/")
+        self.assertEqual(len(response.data['items']), 2)
+        self.assertIn('id', response.data['items'][0])
+
+    def test_list_orders_cursor_mode(self):
+        """Test cursor mode pages through only the user's orders, newest first"""
+        response = self.client.get('/api/orders/?pagination=cursor')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        ids = [o['id'] for o in response.data['results']]
+
+        response = self.client.get(response.data['next'])
+        ids += [o['id'] for o in response.data['results']]
+        self.assertIsNone(response.data['next'])
+
+        expected = list(
+            Order.objects.filter(user=self.user)
+            .order_by('-created_at', '-id')
+            .values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+
+class OrderQueryPlanTest(QueryPlanTestMixin, TestCase):
+    """Test hot order queries are served by indexes"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='buyerpass123')
+        self.admin = User.objects.create_user(
+            username='admin',
+            password='adminpass123',
+            is_staff=True,
+            is_superuser=True
+        )
+        product = Product.objects.create(
+            name='Widget',
+            description='A widget',
+            price=Decimal('5.00'),
+            in_stock_quantity=100
+        )
+        for i in range(20):
+            order = Order.objects.create(
+                user=self.user if i < 15 else self.admin,
+                total_amount=Decimal('5.00'),
+                status=['pending', 'shipped'][i % 2]
+            )
+            OrderItem.objects.create(order=order, product=product, quantity=1, price=Decimal('5.00'))
+
+        self.client = APIClient()
+
+    def get(self, url):
+        with self.assertQueriesUseIndexes(tables=['orders_order']):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_order_list(self):
+        """Test a user's order history, paged by number and by cursor"""
+        self.client.force_authenticate(user=self.user)
+        self.get('/api/orders/')
+        response = self.get('/api/orders/?pagination=cursor')
+        self.get(response.data['next'])
+
+    def test_admin_order_changelist(self):
+        """Test the admin order list and its status/date filters"""
+        self.client.force_login(self.admin)
+        self.get('/admin/orders/order/')
+        self.get('/admin/orders/order/?status__exact=shipped')
+        self.get('/admin/orders/order/?created_at__gte=2000-01-01+00%3A00%3A00%2B00%3A00')
+        self.get(
+            '/admin/orders/order/?status__exact=pending'
+            '&created_at__gte=2000-01-01+00%3A00%3A00%2B00%3A00'
+        )
+
+
+@override_settings(ADMINS=[('Ops', 'ops@shopsphere.com')], LOW_STOCK_THRESHOLD=2)
+class OrderOutboxTest(TestCase):
+    """Test post-order side effects go through the outbox"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='buyer',
+            email='buyer@example.com',
+            password='buyerpass123'
+        )
+        self.product = Product.objects.create(
+            name='Lamp',
+            description='A lamp',
+            price=Decimal('30.00'),
+            in_stock_quantity=5
+        )
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def place_order(self, quantity):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                '/api/orders/',
+                {'items': [{'product': self.product.id, 'quantity': quantity}]},
+                format='json'
+            )
+
+    def test_placement_relays_side_effects(self):
+        """Test an order sends its confirmation and low stock alert after commit"""
+        response = self.place_order(3)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.topic, 'order.placed')
+        self.assertIsNotNone(event.processed_at)
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            ['buyer@example.com', 'ops@shopsphere.com']
+        )
+        # Rollups are left to the beat job, off the order's path
+        self.assertFalse(SalesDaily.objects.exists())
+
+    def test_failed_placement_publishes_nothing(self):
+        """Test a rolled-back order leaves no event and sends no mail"""
+        response = self.place_order(50)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(mail.outbox, [])
+
+    def test_status_transition_publishes_event(self):
+        """Test a status change notifies the buyer; other saves don't"""
+        self.place_order(1)
+        order = Order.objects.get()
+        mail.outbox.clear()
+
+        order.total_amount = Decimal('31.00')
+        order.save()
+        self.assertEqual(OutboxEvent.objects.filter(topic='order.status_changed').count(), 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = 'shipped'
+            order.save()
+
+        event = OutboxEvent.objects.get(topic='order.status_changed')
+        self.assertEqual(event.payload, {'order_id': order.id, 'from_status': 'pending', 'to_status': 'shipped'})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('shipped', mail.outbox[0].subject)
+
+    def test_status_transition_of_created_and_refreshed_orders(self):
+        """Test status changes publish on an order just created or refreshed, not only one loaded"""
+        order = Order.objects.create(user=self.user, total_amount=Decimal('30.00'))
+        order.status = 'processing'
+        order.save()
+
+        Order.objects.filter(pk=order.pk).update(status='shipped')
+        order.refresh_from_db()
+        order.status = 'delivered'
+        order.save()
+
+        events = OutboxEvent.objects.filter(topic='order.status_changed').order_by('id')
+        self.assertEqual(
+            list(events.values_list('payload', flat=True)),
+            [
+                {'order_id': order.id, 'from_status': 'pending', 'to_status': 'processing'},
+                {'order_id': order.id, 'from_status': 'shipped', 'to_status': 'delivered'},
+            ]
+        )
+
+    def test_relay_picks_up_pending_events(self):
+        """Test the periodic relay sends events whose trigger was lost, once"""
+        self.place_order(1)
+        mail.outbox.clear()
+        OutboxEvent.objects.update(processed_at=None)
+
+        self.assertEqual(relay_outbox(), 1)
+        self.assertEqual(relay_outbox(), 0)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_purge_outbox(self):
+        """Test old relayed events are deleted and pending ones kept"""
+        OutboxEvent.objects.create(topic='order.placed', processed_at=timezone.now() - timedelta(days=8))
+        OutboxEvent.objects.create(topic='order.placed', processed_at=timezone.now())
+        OutboxEvent.objects.create(topic='order.placed')
+
+        self.assertEqual(purge_outbox(), 1)
+        self.assertEqual(OutboxEvent.objects.count(), 2)
+
+
+class OrderExportAPITest(TestCase):
+    """Test streaming order exports"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='buyerpass123')
+        self.other = User.objects.create_user(username='other', password='otherpass123')
+        self.admin = User.objects.create_user(username='admin', password='adminpass123', is_staff=True)
+        self.mug = Product.objects.create(name='Mug', description='A mug', price=Decimal('8.00'), in_stock_quantity=50)
+        self.pen = Product.objects.create(name='Pen', description='A pen', price=Decimal('1.50'), in_stock_quantity=50)
+
+        for i in range(5):
+            order = Order.objects.create(
+                user=self.user if i < 4 else self.other,
+                total_amount=Decimal('9.50'),
+                status='shipped' if i % 2 else 'pending'
+            )
+            OrderItem.objects.create(order=order, product=self.mug, quantity=1, price=Decimal('8.00'))
+            OrderItem.objects.create(order=order, product=self.pen, quantity=1, price=Decimal('1.50'))
+        self.empty = Order.objects.create(user=self.user, total_amount=Decimal('0.00'))
+
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_export_csv(self):
+        """Test a CSV line per item for the user's own orders only"""
+        response = self.client.get('/api/orders/export/')
+
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertIn('attachment; filename="orders.csv"', response['Content-Disposition'])
+        lines = self.read(response).splitlines()
+        self.assertEqual(lines[0], 'id,created_at,status,total_amount,product_id,product_name,quantity,price')
+        # 4 orders x 2 items, plus one line for the order without items
+        self.assertEqual(len(lines), 1 + 8 + 1)
+        self.assertTrue(lines[-1].startswith(f'{self.empty.id},'))
+        self.assertTrue(lines[-1].endswith(',,,,'))
+        self.assertIn(',Mug,1,8.00', lines[1])
+
+    def test_export_ndjson(self):
+        """Test one JSON object per order with nested items"""
+        lines = self.read(self.client.get('/api/orders/export/?output=ndjson')).splitlines()
+
+        orders = [json.loads(line) for line in lines]
+        expected = list(Order.objects.filter(user=self.user).order_by('created_at', 'id').values_list('id', flat=True))
+        self.assertEqual([order['id'] for order in orders], expected)
+        self.assertEqual(
+            orders[0]['items'],
+            [
+                {'product_id': self.mug.id, 'quantity': 1, 'price': '8.00', 'product_name': 'Mug'},
+                {'product_id': self.pen.id, 'quantity': 1, 'price': '1.50', 'product_name': 'Pen'},
+            ]
+        )
+        self.assertEqual(orders[-1]['items'], [])
+
+    def test_export_queries_per_chunk(self):
+        """Test items are fetched with one query per chunk of orders"""
+        with mock.patch.object(OrderViewSet, 'export_chunk_size', 2):
+            response = self.client.get('/api/orders/export/?output=ndjson')
+            # orders cursor + items for 3 chunks of 2 orders
+            with self.assertNumQueries(4):
+                self.read(response)
+
+    def test_admin_export_filters(self):
+        """Test the admin export covers every user and filters by status and date"""
+        self.client.force_authenticate(user=self.admin)
+        since = (timezone.now() - timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%S')
+
+        response = self.client.get(f'/api/orders/export/all/?output=ndjson&status=shipped&created_at__gte={since}')
+
+        orders = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(orders), 2)
+        self.assertEqual({order['status'] for order in orders}, {'shipped'})
+        self.assertEqual({order['username'] for order in orders}, {'buyer'})
+
+        response = self.client.get('/api/orders/export/all/?created_at__lt=2000-01-01T00:00:00')
+        self.assertEqual(len(self.read(response).splitlines()), 1)
+
+    def test_admin_export_validation(self):
+        """Test bad filters and formats are rejected, and users can't export all"""
+        response = self.client.get('/api/orders/export/all/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/orders/export/all/?created_at__gte=yesterday')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/orders/export/all/?output=xlsx')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class CartAPITest(TestCase):
+    """Test cart reservations, their expiry and checkout"""
+
+    def setUp(self):
+        self.alice = User.objects.create_user(username='alice', password='alicepass123')
+        self.bob = User.objects.create_user(username='bob', password='bobpass123')
+        self.category = Category.objects.create(name='Consoles')
+        self.console = Product.objects.create(
+            name='Console', description='A console', price=Decimal('300.00'),
+            category=self.category, in_stock_quantity=5
+        )
+        self.game = Product.objects.create(
+            name='Game', description='A game', price=Decimal('60.00'),
+            category=self.category, in_stock_quantity=10
+        )
+        self.client = APIClient()
+
+    def reserve(self, user, product, quantity):
+        self.client.force_authenticate(user=user)
+        return self.client.post('/api/cart/', {'product': product.pk, 'quantity': quantity}, format='json')
+
+    def test_reservations_hold_stock_from_other_carts(self):
+        """Test a hold reduces what everyone else can reserve"""
+        self.assertEqual(self.reserve(self.alice, self.console, 3).status_code, status.HTTP_201_CREATED)
+
+        response = self.reserve(self.bob, self.console, 3)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['quantity'], ['Only 2 available.'])
+        self.assertEqual(self.reserve(self.bob, self.console, 2).status_code, status.HTTP_201_CREATED)
+
+        # Re-reserving replaces the user's own hold rather than adding to it
+        self.assertEqual(self.reserve(self.alice, self.console, 3).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(StockHold.objects.get(user=self.alice).quantity, 3)
+
+    def test_direct_orders_respect_holds(self):
+        """Test stock held in carts cannot be bought outside them"""
+        self.reserve(self.alice, self.console, 4)
+
+        self.client.force_authenticate(user=self.bob)
+        data = {'items': [{'product': self.console.pk, 'quantity': 2}]}
+        response = self.client.post('/api/orders/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Available: 1', str(response.data))
+
+        # Alice's own hold does not block her
+        self.client.force_authenticate(user=self.alice)
+        response = self.client.post('/api/orders/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_direct_order_releases_own_holds(self):
+        """Test ordering a held product directly frees the buyer's hold on it"""
+        self.reserve(self.alice, self.console, 4)
+        self.reserve(self.alice, self.game, 1)
+
+        self.client.force_authenticate(user=self.alice)
+        data = {'items': [{'product': self.console.pk, 'quantity': 2}]}
+        self.assertEqual(self.client.post('/api/orders/', data, format='json').status_code, status.HTTP_201_CREATED)
+
+        self.assertEqual(list(StockHold.objects.filter(user=self.alice).values_list('product', flat=True)), [self.game.pk])
+        # The 3 consoles left are all available to other shoppers again
+        self.assertEqual(self.reserve(self.bob, self.console, 3).status_code, status.HTTP_201_CREATED)
+
+    def test_expired_holds_are_ignored_and_swept(self):
+        """Test lapsed holds free their stock at once and the sweeper deletes them"""
+        self.reserve(self.alice, self.console, 5)
+        StockHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(available_stock([self.console.pk]), {self.console.pk: 5})
+        self.assertEqual(self.reserve(self.bob, self.console, 5).status_code, status.HTTP_201_CREATED)
+        self.client.force_authenticate(user=self.alice)
+        self.assertEqual(self.client.get('/api/cart/').data['items'], [])
+
+        self.assertEqual(sweep_stock_holds(), 1)
+        self.assertEqual(list(StockHold.objects.values_list('user__username', flat=True)), ['bob'])
+
+    def test_available_stock_in_one_query(self):
+        """Test available stock is in_stock_quantity less active holds, in a single query"""
+        self.reserve(self.alice, self.console, 2)
+        self.reserve(self.bob, self.console, 1)
+        self.reserve(self.bob, self.game, 4)
+
+        with self.assertNumQueries(1):
+            available = available_stock([self.console.pk, self.game.pk])
+        self.assertEqual(available, {self.console.pk: 2, self.game.pk: 6})
+        self.assertEqual(available_stock([self.console.pk], exclude_user=self.bob), {self.console.pk: 3})
+
+    def test_cart_contents(self):
+        """Test the cart lists active holds with prices and a total"""
+        self.reserve(self.alice, self.console, 1)
+        self.reserve(self.alice, self.game, 2)
+
+        response = self.client.get('/api/cart/')
+
+        self.assertEqual([item['product_name'] for item in response.data['items']], ['Console', 'Game'])
+        self.assertEqual(response.data['total_amount'], '420.00')
+        self.assertIsNotNone(response.data['items'][0]['expires_at'])
+
+        self.assertEqual(self.client.delete(f'/api/cart/{self.game.pk}/').status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.delete(f'/api/cart/{self.game.pk}/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_checkout_converts_holds_without_locking_products(self):
+        """Test checkout places the order, takes the stock and empties the cart"""
+        self.reserve(self.alice, self.console, 2)
+        self.reserve(self.alice, self.game, 3)
+
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.post('/api/cart/checkout/')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get()
+        self.assertEqual(order.total_amount, Decimal('780.00'))
+        self.assertEqual(order.item_count, 5)
+        self.console.refresh_from_db()
+        self.game.refresh_from_db()
+        self.assertEqual((self.console.in_stock_quantity, self.game.in_stock_quantity), (3, 7))
+        self.assertFalse(StockHold.objects.exists())
+        self.assertTrue(OutboxEvent.objects.filter(topic='order.placed').exists())
+        # Products are read through the holds' join only, never selected on their own
+        self.assertFalse([
+            q['sql'] for q in context.captured_queries
+            if q['sql'].startswith('SELECT') and 'FROM "products_product"' in q['sql']
+        ])
+
+        response = self.client.post('/api/cart/checkout/')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_checkout_of_expired_cart(self):
+        """Test an expired reservation cannot be checked out"""
+        self.reserve(self.alice, self.console, 1)
+        StockHold.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = self.client.post('/api/cart/checkout/')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+    def test_sharded_product_holds_and_checkout(self):
+        """Test holds and checkout of a sharded product count and take shard stock"""
+        shard_stock(self.console.pk, 4)
+        self.reserve(self.alice, self.console, 3)
+
+        response = self.reserve(self.bob, self.console, 3)
+        self.assertEqual(response.data['quantity'], ['Only 2 available.'])
+
+        self.client.force_authenticate(user=self.bob)
+        data = {'items': [{'product': self.console.pk, 'quantity': 3}]}
+        self.assertEqual(self.client.post('/api/orders/', data, format='json').status_code, 400)
+        data = {'items': [{'product': self.console.pk, 'quantity': 2}]}
+        self.assertEqual(self.client.post('/api/orders/', data, format='json').status_code, 201)
+
+        self.client.force_authenticate(user=self.alice)
+        response = self.client.post('/api/cart/checkout/')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(stock_totals([self.console.pk], fresh=True), {self.console.pk: 0})
+        # The product row itself is never written by a sale
+        self.console.refresh_from_db()
+        self.assertEqual(self.console.in_stock_quantity, 5)
+
+    def test_sharded_direct_order_racing_a_reservation(self):
+        """Test a hold placed after a direct order's stock check still keeps its units"""
+        shard_stock(self.console.pk, 4)
+
+        def reserve_then_take(product_id, quantity, shards):
+            # Alice reserves between Bob's availability check and his shard take
+            StockHold.objects.create(
+                user=self.alice, product_id=product_id, quantity=4,
+                expires_at=timezone.now() + timedelta(minutes=5)
+            )
+            return take_stock(product_id, quantity, shards)
+
+        self.client.force_authenticate(user=self.bob)
+        data = {'items': [{'product': self.console.pk, 'quantity': 2}]}
+        with mock.patch('orders.stock.take_stock', side_effect=reserve_then_take):
+            response = self.client.post('/api/orders/', data, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+        self.assertEqual(stock_totals([self.console.pk], fresh=True), {self.console.pk: 5})
+
+        # Without the hold in the way the same order goes through
+        StockHold.objects.all().delete()
+        self.assertEqual(self.client.post('/api/orders/', data, format='json').status_code, 201)
+
+
+class OrderSparseFieldsetTest(TestCase):
+    """Test ?fields= and ?expand= on orders"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='buyer', password='buyerpass123')
+        self.product = Product.objects.create(
+            name='Widget', description='A widget', price=Decimal('2.50'), in_stock_quantity=50
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            '/api/orders/', {'items': [{'product': self.product.id, 'quantity': 3}]}, format='json'
+        )
+        self.order_id = response.data['order']['id']
+
+    def test_detail_without_items(self):
+        """Test leaving out items skips the item query"""
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/orders/{self.order_id}/?fields=id,status,total_amount')
+
+        self.assertEqual(response.data, {'id': self.order_id, 'status': 'pending', 'total_amount': '7.50'})
+
+    def test_expand_item_products(self):
+        """Test ?expand=items.product nests each line's product in one extra query"""
+        url = f'/api/orders/{self.order_id}/?fields=id,items.quantity,items.product.name&expand=items.product'
+        # order + items + products
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+
+        self.assertEqual(len(queries), 3)
+        self.assertNotIn('description', queries[2]['sql'])
+        self.assertEqual(response.data, {'id': self.order_id, 'items': [{'quantity': 3, 'product': {'name': 'Widget'}}]})
+
+    def test_list_fields(self):
+        """Test the list takes ?fields= and rejects expanding the item snapshot"""
+        response = self.client.get('/api/orders/?fields=id,item_count')
+        self.assertEqual(response.data['results'], [{'id': self.order_id, 'item_count': 3}])
+
+        response = self.client.get('/api/orders/?expand=items')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
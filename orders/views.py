@@ -1,25 +1,75 @@
+from django.db.models import Prefetch
 from django.shortcuts import render
+from django_filters import rest_framework as filters
+from django_filters.utils import translate_validation
 from rest_framework import viewsets, status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from .models import Order
-from .serializers import OrderSerializer, OrderCreateSerializer
+from shopsphere_project.fieldsets import SparseFieldsetMixin, nested_serializer, selected_columns
+from shopsphere_project.pagination import OptInCursorPagination
+from products.models import Product
+from users.idempotency import idempotent
+from .export import CONTENT_TYPES, export_response
+from .models import Order, OrderItem, StockHold
+from .serializers import (
+    CartItemSerializer,
+    OrderCreateSerializer,
+    OrderListSerializer,
+    OrderSerializer,
+    StockHoldSerializer,
+)
+from . import stock
 
 
-class OrderViewSet(viewsets.ModelViewSet):
-    """ViewSet for Order operations"""
+class OrderExportFilter(filters.FilterSet):
+    """?status= and a ?created_at__gte= / ?created_at__lt= range for admin exports"""
+
+    class Meta:
+        model = Order
+        fields = {
+            'status': ['exact'],
+            'created_at': ['gte', 'lt'],
+        }
+
+
+class OrderViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
+    """ViewSet for Order operations; reads take ?fields= and ?expand=items.product"""
     queryset = Order.objects.all()  # Add this line
     permission_classes = [IsAuthenticated]
+    pagination_class = OptInCursorPagination  # ?pagination=cursor for keyset paging
+    export_chunk_size = 1000
     
     def get_queryset(self):
-        """Users can only see their own orders"""
-        return Order.objects.filter(user=self.request.user).prefetch_related('items__product')
+        """Users can only see their own orders, newest first"""
+        queryset = Order.objects.filter(user=self.request.user).order_by('-created_at')
+        if self.action == 'list':
+            # The list is served from the line_items snapshot on the order
+            return queryset
+        items = nested_serializer(self.fieldset_serializer.fields.get('items'))
+        if items is None:
+            return queryset
+        
+        lines = OrderItem.objects.all()
+        columns = selected_columns(items)
+        if columns is not None:
+            lines = lines.only('order', *columns)
+        product = nested_serializer(items.fields.get('product'))
+        if product is not None:
+            lines = lines.prefetch_related(
+                Prefetch('product', queryset=Product.objects.only(*selected_columns(product)))
+            )
+        return queryset.prefetch_related(Prefetch('items', queryset=lines))
     
     def get_serializer_class(self):
         if self.action == 'create':
             return OrderCreateSerializer
+        if self.action == 'list':
+            return OrderListSerializer
         return OrderSerializer
     
+    @idempotent
     def create(self, request, *args, **kwargs):
         """Create a new order"""
         serializer = self.get_serializer(data=request.data, context={'request': request})
@@ -29,4 +79,68 @@ class OrderViewSet(viewsets.ModelViewSet):
         return Response({
             'order': OrderSerializer(order).data,
             'message': 'Order created successfully'
-        }, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        }, status=status.HTTP_201_CREATED)
+    
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Stream the user's full order history (?output=csv or ?output=ndjson)"""
+        return self.export_response(Order.objects.filter(user=request.user))
+    
+    @action(detail=False, methods=['get'], url_path='export/all', permission_classes=[IsAdminUser])
+    def export_all(self, request):
+        """Stream every order, optionally filtered by status and created_at range"""
+        filterset = OrderExportFilter(request.query_params, queryset=Order.objects.all())
+        if not filterset.is_valid():
+            raise translate_validation(filterset.errors)
+        return self.export_response(filterset.qs, include_user=True, filename='orders-all')
+    
+    def export_response(self, queryset, include_user=False, filename='orders'):
+        # Not ?format=, which DRF reserves for picking a renderer
+        fmt = self.request.query_params.get('output', 'csv')
+        if fmt not in CONTENT_TYPES:
+            raise ValidationError({'output': [f'Choose one of: {", ".join(CONTENT_TYPES)}.']})
+        return export_response(queryset, fmt, self.export_chunk_size, include_user, filename)
+
+
+class CartViewSet(viewsets.ViewSet):
+    """
+    The user's cart: products reserved for ``CART_HOLD_TTL`` seconds.
+
+    POST reserves a quantity of a product, DELETE /cart/<product id>/ releases
+    it, and POST /cart/checkout/ turns the reservations into an order.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        holds = StockHold.objects.active().filter(user=request.user).select_related('product').order_by('id')
+        items = StockHoldSerializer(holds, many=True).data
+        return Response({
+            'items': items,
+            'total_amount': str(sum(hold.product.price * hold.quantity for hold in holds)),
+        })
+
+    def create(self, request):
+        serializer = CartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        hold = stock.reserve(
+            request.user, serializer.validated_data['product'], serializer.validated_data['quantity']
+        )
+        return Response(StockHoldSerializer(hold).data, status=status.HTTP_201_CREATED)
+
+    def destroy(self, request, pk=None):
+        try:
+            product_id = int(pk)
+        except ValueError:
+            product_id = None
+        if product_id is None or not stock.release(request.user, product_id):
+            return Response({'detail': 'Not in your cart.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['post'])
+    def checkout(self, request):
+        """Place an order for everything still reserved in the cart"""
+        order = stock.checkout(request.user)
+        return Response({
+            'order': OrderSerializer(order).data,
+            'message': 'Order created successfully'
+        }, status=status.HTTP_201_CREATED)
@@ -1,10 +1,32 @@
 from django.contrib import admin
 
 # Register your models here.
+from django.conf import settings
 from django.contrib import admin
+from shopsphere_project.pagination import EstimatedCountPaginator
+from .cache import bump_catalogue_version
+from .inventory import set_stock
 from .models import Category, Product
 
 
+class StockLevelFilter(admin.SimpleListFilter):
+    """Out of stock / low / in stock, instead of one choice per distinct quantity"""
+    title = 'stock level'
+    parameter_name = 'stock'
+
+    def lookups(self, request, model_admin):
+        return [('out', 'Out of stock'), ('low', 'Low stock'), ('in', 'In stock')]
+
+    def queryset(self, request, queryset):
+        if self.value() == 'out':
+            return queryset.filter(in_stock_quantity=0)
+        if self.value() == 'low':
+            return queryset.filter(in_stock_quantity__gt=0, in_stock_quantity__lte=settings.LOW_STOCK_THRESHOLD)
+        if self.value() == 'in':
+            return queryset.filter(in_stock_quantity__gt=0)
+        return queryset
+
+
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
     """Admin interface for categories"""
@@ -18,18 +40,22 @@ class CategoryAdmin(admin.ModelAdmin):
 class ProductAdmin(admin.ModelAdmin):
     """Admin interface for products"""
     list_display = ('id', 'name', 'category', 'price', 'in_stock_quantity', 'date_created')
-    list_filter = ('category', 'date_created', 'in_stock_quantity')
+    list_filter = ('category', 'date_created', StockLevelFilter)
+    list_select_related = ('category',)
+    autocomplete_fields = ('category',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     search_fields = ('name', 'description')
     list_editable = ('price', 'in_stock_quantity')  # Edit directly in list view
     ordering = ('-date_created',)
-    readonly_fields = ('date_created', 'updated_at')
+    readonly_fields = ('stock_shards', 'date_created', 'updated_at')
     
     fieldsets = (
         ('Basic Information', {
             'fields': ('name', 'description', 'category')
         }),
         ('Pricing & Stock', {
-            'fields': ('price', 'in_stock_quantity')
+            'fields': ('price', 'in_stock_quantity', 'stock_shards')
         }),
         ('Media', {
             'fields': ('image',)
@@ -39,4 +65,16 @@ class ProductAdmin(admin.ModelAdmin):
             'classes': ('collapse',)  # Collapsible section
         }),
     )
-    
\ No newline at end of file
+    
+    def save_model(self, request, obj, form, change):
+        """Spread edited stock of a sharded product over its shards"""
+        super().save_model(request, obj, form, change)
+        if obj.stock_shards and 'in_stock_quantity' in form.changed_data:
+            set_stock(obj, obj.in_stock_quantity)
+    
+    def changelist_view(self, request, extra_context=None):
+        """Invalidate cached catalogue responses after list_editable bulk edits"""
+        response = super().changelist_view(request, extra_context)
+        if request.method == 'POST':
+            bump_catalogue_version()
+        return response
@@ -0,0 +1,165 @@
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from shopsphere_project.fieldsets import EXPAND_PARAM, FIELDS_PARAM
+from .cache import CatalogueCacheMixin, catalogue_cache_key, is_not_modified, validators
+from .inventory import load_stock_totals
+from .models import Category, Product
+from .serializers import CategorySerializer, ProductDetailSerializer, ProductListSerializer
+from .views import CategoryViewSet, ProductViewSet
+
+
+def json_response(data, status_code=status.HTTP_200_OK, headers=None):
+    """Render like DRF's JSONRenderer so both paths return identical bodies"""
+    return HttpResponse(
+        JSONRenderer().render(data),
+        status=status_code,
+        headers=headers,
+        content_type='application/json'
+    )
+
+
+class InvalidPage(Exception):
+    pass
+
+
+async def paginate(request, queryset):
+    """Async equivalent of PageNumberPagination for a filtered queryset"""
+    page_size = api_settings.PAGE_SIZE
+    try:
+        number = int(request.GET.get('page', 1))
+    except ValueError:
+        raise InvalidPage
+    if number < 1:
+        raise InvalidPage
+
+    count = await queryset.acount()
+    offset = (number - 1) * page_size
+    if number > 1 and offset >= count:
+        raise InvalidPage
+    page = [obj async for obj in queryset[offset:offset + page_size]]
+
+    url = request.build_absolute_uri()
+    if number == 1:
+        previous = None
+    elif number == 2:
+        previous = remove_query_param(url, 'page')
+    else:
+        previous = replace_query_param(url, 'page', number - 1)
+    following = replace_query_param(url, 'page', number + 1) if offset + page_size < count else None
+    return page, {'count': count, 'next': following, 'previous': previous}
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncCatalogueView(View):
+    """
+    Serve catalogue reads on the async ORM.
+
+    GET requests are handled without holding a worker thread; writes and
+    the read variants the async path doesn't implement (cursor pagination,
+    ?fields= and ?expand=) fall back to the sync DRF viewset in a worker thread.
+    """
+    viewset = None
+    actions = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD') and self.handles(request):
+            try:
+                return await self.get(request, *args, **kwargs)
+            except InvalidPage:
+                return json_response({'detail': 'Invalid page.'}, status.HTTP_404_NOT_FOUND)
+            except ValidationError as exc:
+                return json_response(exc.detail, status.HTTP_400_BAD_REQUEST)
+        sync_view = self.viewset.as_view(self.actions)
+        return await sync_to_async(sync_view)(request, *args, **kwargs)
+
+    def handles(self, request):
+        return request.GET.get('pagination') != 'cursor' and not (
+            request.GET.get(FIELDS_PARAM) or request.GET.get(EXPAND_PARAM)
+        )
+
+    async def get(self, request, *args, **kwargs):
+        raise NotImplementedError
+
+    def filter_queryset(self, request, action):
+        """Build the queryset with the viewset's own filter backends"""
+        view = self.viewset(request=Request(request), format_kwarg=None, args=(), kwargs={}, action=action)
+        return view.filter_queryset(view.get_queryset())
+
+
+class CachedCatalogueView(AsyncCatalogueView):
+    """Share the sync viewset's versioned response cache and validators"""
+    basename = None
+    get_cache_timeout = CatalogueCacheMixin.get_cache_timeout
+
+    async def cached(self, request, action, render, lookup=''):
+        key = await sync_to_async(catalogue_cache_key)(request, self.basename, action, lookup)
+        cached = await cache.aget(key)
+        if cached is None:
+            cached = await render()
+            if cached is None:
+                return json_response({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+            await cache.aset(key, cached, self.get_cache_timeout())
+        data, last_modified = cached
+
+        etag, timestamp, headers = validators(key, last_modified)
+        if is_not_modified(request, etag, timestamp):
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return json_response(data, headers=headers)
+
+
+class ProductListAsyncView(CachedCatalogueView):
+    viewset = ProductViewSet
+    actions = {'get': 'list', 'post': 'create'}
+    basename = 'product'
+
+    async def get(self, request):
+        async def render():
+            queryset = await sync_to_async(self.filter_queryset)(request, 'list')
+            page, links = await paginate(request, queryset)
+            # Serializers can't query from here, so load sharded stock first
+            await sync_to_async(load_stock_totals)(page)
+            data = {**links, 'results': ProductListSerializer(page, many=True, context={'request': request}).data}
+            return data, max((product.updated_at for product in page), default=None)
+
+        return await self.cached(request, 'list', render)
+
+
+class ProductDetailAsyncView(CachedCatalogueView):
+    viewset = ProductViewSet
+    actions = {'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}
+    basename = 'product'
+
+    async def get(self, request, pk):
+        async def render():
+            queryset = Product.objects.prefetch_related(
+                Prefetch('category', queryset=Category.objects.with_product_count())
+            )
+            try:
+                product = await queryset.aget(pk=pk)
+            except Product.DoesNotExist:
+                return None
+            await sync_to_async(load_stock_totals)([product])
+            return ProductDetailSerializer(product, context={'request': request}).data, product.updated_at
+
+        return await self.cached(request, 'retrieve', render, lookup=pk)
+
+
+class CategoryListAsyncView(AsyncCatalogueView):
+    viewset = CategoryViewSet
+    actions = {'get': 'list', 'post': 'create'}
+
+    async def get(self, request):
+        queryset = await sync_to_async(self.filter_queryset)(request, 'list')
+        page, links = await paginate(request, queryset)
+        return json_response({**links, 'results': CategorySerializer(page, many=True, context={'request': request}).data})
@@ -0,0 +1,125 @@
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+from shopsphere_project.routers import read_from_primary
+
+VERSION_KEY = 'catalogue:version'
+
+
+def catalogue_version():
+    """Current catalogue version; every cached response key embeds it"""
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Seed from the clock so an evicted counter never reuses an old version
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _incr_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        catalogue_version()
+
+
+def bump_catalogue_version():
+    """
+    Invalidate every cached catalogue response in O(1).
+
+    Bumps now so the writing request never reads its own stale entries, and
+    again on commit so nothing cached from pre-commit data outlives the write.
+    """
+    _incr_version()
+    transaction.on_commit(_incr_version)
+
+
+def catalogue_cache_key(request, basename, action, lookup=''):
+    """Cache key for one catalogue response under the current version"""
+    params = sorted(
+        (key, value)
+        for key, values in request.GET.lists()
+        for value in values
+    )
+    digest = hashlib.md5(
+        f'{request.get_host()}?{urlencode(params)}'.encode()
+    ).hexdigest()
+    return f'catalogue:{catalogue_version()}:{basename}:{action}:{lookup}:{digest}'
+
+
+def validators(key, last_modified):
+    """Return the ETag, Last-Modified timestamp and headers for a cached entry"""
+    stamp = last_modified.isoformat() if last_modified else ''
+    etag = quote_etag(hashlib.md5(f'{key}:{stamp}'.encode()).hexdigest())
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    headers = {'ETag': etag}
+    if timestamp is not None:
+        headers['Last-Modified'] = http_date(timestamp)
+    return etag, timestamp, headers
+
+
+def is_not_modified(request, etag, timestamp):
+    return get_conditional_response(request, etag=etag, last_modified=timestamp) is not None
+
+
+class CatalogueCacheMixin:
+    """
+    Cache list/retrieve payloads under the catalogue version.
+
+    Responses are keyed on the action, object pk and normalized query params,
+    and carry an ETag and Last-Modified (from ``updated_at``) so clients can
+    revalidate with a 304.
+    """
+
+    def get_cache_timeout(self):
+        """Seconds to keep a response, read per request so setting changes apply"""
+        return settings.CATALOGUE_CACHE_TIMEOUT
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_object(self):
+        obj = super().get_object()
+        self.last_modified = obj.updated_at
+        return obj
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None:
+            self.last_modified = max((obj.updated_at for obj in page), default=None)
+        return page
+
+    def get_cache_key(self, request):
+        lookup = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field, '')
+        return catalogue_cache_key(request, self.basename, self.action, lookup)
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            if self.get_cache_timeout():
+                # A lagging replica would cache pre-write rows under the new version
+                read_from_primary()
+            self.last_modified = None
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cached = (response.data, self.last_modified)
+            cache.set(key, cached, self.get_cache_timeout())
+        data, last_modified = cached
+
+        etag, timestamp, headers = validators(key, last_modified)
+        if is_not_modified(request, etag, timestamp):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(data, headers=headers)
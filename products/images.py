@@ -0,0 +1,93 @@
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+from .cache import bump_catalogue_version
+
+# Pillow format name and MIME type for each configured output format
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+
+def variants_dir(product_id):
+    return f'products/variants/{product_id}'
+
+
+def clear_variant_files(storage, product_id):
+    """Delete every derivative previously written for a product"""
+    folder = variants_dir(product_id)
+    if storage.exists(folder):
+        _, files = storage.listdir(folder)
+        for name in files:
+            storage.delete(posixpath.join(folder, name))
+
+
+def encode(image, fmt):
+    """Encode an image in one of FORMATS, flattening alpha for JPEG"""
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    buffer = BytesIO()
+    image.save(buffer, FORMATS[fmt][0], quality=settings.PRODUCT_IMAGE_QUALITY)
+    return ContentFile(buffer.getvalue())
+
+
+def build_variants(image_field, product_id):
+    """
+    Write every configured derivative of an image and describe them.
+
+    Returns ``{'source': name, '<variant>': [{'width', 'height', '<fmt>': name}]}``
+    with one entry per width, smallest first. Widths above the original's
+    are capped to it rather than upscaled.
+    """
+    storage = image_field.storage
+    with image_field.open('rb') as f:
+        original = ImageOps.exif_transpose(Image.open(f))
+        original.load()
+
+    clear_variant_files(storage, product_id)
+    stem = posixpath.splitext(posixpath.basename(image_field.name))[0]
+    variants = {'source': image_field.name}
+    for variant, widths in settings.PRODUCT_IMAGE_VARIANTS.items():
+        entries = []
+        for width in sorted({min(width, original.width) for width in widths}):
+            height = max(1, round(original.height * width / original.width))
+            resized = original.resize((width, height), Image.Resampling.LANCZOS)
+            entry = {'width': width, 'height': height}
+            for fmt in settings.PRODUCT_IMAGE_FORMATS:
+                name = f'{variants_dir(product_id)}/{stem}-{variant}-{width}.{fmt}'
+                entry[fmt] = storage.save(name, encode(resized, fmt))
+            entries.append(entry)
+        variants[variant] = entries
+    return variants
+
+
+def generate_product_variants(product_id):
+    """
+    Render and store the derivatives for a product's current image.
+
+    Safe to run in any process: the result is only saved if the product
+    still has the image it was rendered from.
+    """
+    from .models import Product
+
+    product = Product.objects.only('id', 'image').filter(pk=product_id).first()
+    if product is None:
+        return False
+    if not product.image:
+        clear_variant_files(product.image.storage, product_id)
+        return False
+
+    variants = build_variants(product.image, product.pk)
+    updated = Product.objects.filter(pk=product.pk, image=product.image.name).update(image_variants=variants)
+    if updated:
+        # Cached list/detail responses predate the thumbnails
+        bump_catalogue_version()
+    return bool(updated)
@@ -0,0 +1,202 @@
+"""
+Sharded stock counters for hot products.
+
+A product with ``stock_shards`` set keeps its stock in that many
+``StockShard`` rows instead of ``in_stock_quantity``, so concurrent orders
+update different rows rather than queueing on one row lock. A sale takes
+from a random shard with a guarded UPDATE, and only when no shard it tries
+has enough does it lock them all and drain them in turn.
+
+The stock on sale is the sum of the shards, cached for
+``STOCK_SHARD_CACHE_TIMEOUT`` seconds and dropped when a sale commits.
+``in_stock_quantity`` is refreshed from the shards by ``sync_sharded_stock``
+so filters, the admin and exports stay close.
+"""
+import random
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .cache import bump_catalogue_version
+from .models import Product, StockShard
+
+# Random shards a sale tries before locking every shard of the product
+ATTEMPTS = 2
+
+
+def _key(product_id):
+    return f'stock:total:{product_id}'
+
+
+def _invalidate(product_ids):
+    keys = [_key(product_id) for product_id in product_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _split(product_id, quantity, shards):
+    return [
+        StockShard(product_id=product_id, index=index, quantity=quantity // shards + (index < quantity % shards))
+        for index in range(shards)
+    ]
+
+
+def shard_total():
+    """Subquery of the shard sum for the outer product"""
+    return Subquery(
+        StockShard.objects.filter(product=OuterRef('pk'))
+        .order_by()
+        .values('product')
+        .annotate(total=Sum('quantity'))
+        .values('total')
+    )
+
+
+def held_total():
+    """Units of the outer product held by active carts (see ``orders.stock``)"""
+    holds = Product._meta.get_field('stock_holds').related_model
+    return Coalesce(
+        Subquery(
+            holds.objects.filter(product=OuterRef('pk'), expires_at__gt=timezone.now())
+            .order_by()
+            .values('product')
+            .annotate(total=Sum('quantity'))
+            .values('total')
+        ),
+        0,
+    )
+
+
+def stock_expression():
+    """Units in stock as a product expression, summing shards where sharded"""
+    return Case(
+        When(stock_shards__gt=0, then=Coalesce(shard_total(), 0)),
+        default=F('in_stock_quantity'),
+    )
+
+
+def stock_totals(product_ids, fresh=False):
+    """
+    Shard sums per product id, from the cache where possible and one
+    aggregate query for the rest. ``fresh`` skips the cache both ways, for
+    reads that must see this transaction's writes.
+    """
+    product_ids = set(product_ids)
+    totals = {}
+    if not fresh:
+        cached = cache.get_many([_key(product_id) for product_id in product_ids])
+        totals = {product_id: cached[_key(product_id)] for product_id in product_ids if _key(product_id) in cached}
+    missing = product_ids - set(totals)
+    if missing:
+        rows = dict(
+            StockShard.objects.filter(product_id__in=missing)
+            .order_by()
+            .values('product_id')
+            .annotate(total=Sum('quantity'))
+            .values_list('product_id', 'total')
+        )
+        loaded = {product_id: rows.get(product_id, 0) for product_id in missing}
+        if not fresh:
+            cache.set_many(
+                {_key(product_id): total for product_id, total in loaded.items()},
+                settings.STOCK_SHARD_CACHE_TIMEOUT
+            )
+        totals.update(loaded)
+    return totals
+
+
+def load_stock_totals(products):
+    """Fill ``stock_quantity`` for every sharded product in one go"""
+    pending = [product for product in products if product.stock_shards and not hasattr(product, '_stock_total')]
+    if pending:
+        totals = stock_totals(product.pk for product in pending)
+        for product in pending:
+            product._stock_total = totals[product.pk]
+
+
+def add_stock(deltas, floors=None):
+    """
+    Add signed ``deltas`` to unsharded products' ``in_stock_quantity`` in one
+    guarded UPDATE. A decrement must leave at least the product's ``floors``
+    entry (default 0); returns False if any would not, for the caller to
+    roll back.
+    """
+    floors = floors or {}
+    in_range = Q()
+    for product_id, delta in deltas.items():
+        if delta >= 0:
+            in_range |= Q(pk=product_id)
+        else:
+            in_range |= Q(pk=product_id, in_stock_quantity__gte=floors.get(product_id, 0) - delta)
+    
+    updated = Product.objects.filter(in_range).update(
+        in_stock_quantity=Case(
+            *[When(pk=product_id, then=F('in_stock_quantity') + delta) for product_id, delta in deltas.items()],
+            output_field=IntegerField()
+        ),
+        updated_at=timezone.now()
+    )
+    # Backends without row locks (SQLite) rely on the WHERE clause instead
+    return updated == len(deltas)
+
+
+def take_stock(product_id, quantity, shards):
+    """
+    Take ``quantity`` units of a sharded product inside the caller's
+    transaction; returns False, taking nothing, if the shards hold fewer.
+    """
+    rows = StockShard.objects.filter(product_id=product_id)
+    for index in random.sample(range(shards), min(ATTEMPTS, shards)):
+        if rows.filter(index=index, quantity__gte=quantity).update(quantity=F('quantity') - quantity):
+            break
+    else:
+        # No shard tried has enough on its own; lock them all, in index order
+        locked = list(rows.select_for_update().order_by('index'))
+        if sum(shard.quantity for shard in locked) < quantity:
+            return False
+        remaining = quantity
+        for shard in locked:
+            taken = min(shard.quantity, remaining)
+            shard.quantity -= taken
+            remaining -= taken
+        StockShard.objects.bulk_update(locked, ['quantity'])
+    _invalidate([product_id])
+    return True
+
+
+def set_stock(product, quantity):
+    """Replace a sharded product's stock, spreading it evenly over the shards"""
+    with transaction.atomic():
+        product.shards.all().delete()
+        StockShard.objects.bulk_create(_split(product.pk, quantity, product.stock_shards))
+        Product.objects.filter(pk=product.pk).update(in_stock_quantity=quantity)
+        _invalidate([product.pk])
+        bump_catalogue_version()
+    product.in_stock_quantity = product._stock_total = quantity
+
+
+def shard_stock(product_id, shards):
+    """
+    Split a product's stock over ``shards`` counters, re-split it, or with
+    ``shards=0`` fold it back into ``in_stock_quantity``.
+    """
+    with transaction.atomic():
+        product = Product.objects.select_for_update().get(pk=product_id)
+        if product.stock_shards:
+            total = stock_totals([product.pk], fresh=True)[product.pk]
+        else:
+            total = product.in_stock_quantity
+        product.shards.all().delete()
+        if shards:
+            StockShard.objects.bulk_create(_split(product.pk, total, shards))
+        Product.objects.filter(pk=product.pk).update(stock_shards=shards, in_stock_quantity=total)
+        _invalidate([product.pk])
+        bump_catalogue_version()
+    return total
+
+
+def sync_sharded_stock():
+    """Copy every sharded product's shard sum into ``in_stock_quantity``"""
+    return Product.objects.filter(stock_shards__gt=0).update(in_stock_quantity=Coalesce(shard_total(), 0))
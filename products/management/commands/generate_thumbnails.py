@@ -0,0 +1,59 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+from products.images import generate_product_variants
+from products.models import Product
+
+
+def init_worker():
+    # Forked workers must not share the parent's database connections
+    django.setup()
+    for connection in connections.all(initialized_only=True):
+        connection.close()
+
+
+def render(product_id):
+    try:
+        return product_id, generate_product_variants(product_id), None
+    except Exception as e:
+        return product_id, False, f'{type(e).__name__}: {e}'
+
+
+class Command(BaseCommand):
+    help = 'Render thumbnail variants for existing product images across a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-render products that already have thumbnails')
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes; 1 renders in this process'
+        )
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            products = products.filter(image_variants={})
+        product_ids = list(products.order_by('id').values_list('id', flat=True))
+
+        started = time.monotonic()
+        if options['workers'] > 1 and len(product_ids) > 1:
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=init_worker) as pool:
+                results = list(pool.map(render, product_ids, chunksize=16))
+        else:
+            results = [render(product_id) for product_id in product_ids]
+
+        failed = [(product_id, error) for product_id, _, error in results if error]
+        for product_id, error in failed:
+            self.stderr.write(f'Product {product_id}: {error}')
+        rendered = sum(1 for _, ok, _ in results if ok)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rendered thumbnails for {rendered} of {len(product_ids)} products '
+            f'in {time.monotonic() - started:.2f}s ({len(failed)} failed)'
+        ))
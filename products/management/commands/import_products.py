@@ -0,0 +1,126 @@
+import csv
+import json
+import sys
+import time
+from contextlib import nullcontext
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from products.cache import bump_catalogue_version
+from products.inventory import set_stock
+from products.models import Category, Product
+from products.search import get_search_backend
+from .export_products import FORMATS, detect_format
+
+UPDATE_FIELDS = ['name', 'description', 'price', 'category', 'in_stock_quantity', 'updated_at']
+
+
+def read_rows(stream, fmt):
+    """Yield one dict per record without reading the whole file"""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+
+
+class Command(BaseCommand):
+    help = (
+        'Upsert products from CSV or JSON Lines in batches. Rows with an id '
+        'update that product, rows without one are created; categories are '
+        'matched by name and created when missing.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or '-' for stdin")
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension, else csv')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows written per INSERT')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or detect_format(path)
+        batch_size = options['batch_size']
+
+        # Every known category in one query; new names are added per batch
+        categories = dict(Category.objects.values_list('name', 'id'))
+
+        if path == '-':
+            source = nullcontext(sys.stdin)
+        else:
+            source = open(path, newline='', encoding='utf-8')
+
+        started = time.monotonic()
+        count = 0
+        try:
+            with source as stream:
+                rows = enumerate(read_rows(stream, fmt), start=1)
+                while batch := list(islice(rows, batch_size)):
+                    self.resolve_categories([row.get('category') for _, row in batch], categories)
+                    products = [self.build_product(number, row, categories) for number, row in batch]
+                    self.upsert(products)
+                    count += len(products)
+                    if options['verbosity'] >= 2:
+                        self.stdout.write(f'{count} rows...')
+        finally:
+            # Batches commit as they go, so finish up even if a later row fails
+            if count:
+                self.reset_sequences()
+                # bulk_create sends no post_save, so invalidate cached responses here
+                bump_catalogue_version()
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {count} products in {elapsed:.2f}s ({count / elapsed if elapsed else count:.0f} rows/s)'
+        ))
+
+    def resolve_categories(self, names, categories):
+        """Create any unseen category names and add their ids to the cache"""
+        missing = {name for name in names if name and name not in categories}
+        if missing:
+            Category.objects.bulk_create([Category(name=name) for name in missing], ignore_conflicts=True)
+            categories.update(Category.objects.filter(name__in=missing).values_list('name', 'id'))
+
+    def build_product(self, number, row, categories):
+        fields = Product._meta
+        try:
+            return Product(
+                id=fields.pk.to_python(row.get('id') or None),
+                name=fields.get_field('name').to_python(row['name']),
+                description=row.get('description') or '',
+                price=fields.get_field('price').to_python(row['price']),
+                category_id=categories.get(row.get('category')),
+                in_stock_quantity=fields.get_field('in_stock_quantity').to_python(row.get('in_stock_quantity') or 0),
+            )
+        except KeyError as e:
+            raise CommandError(f'Row {number}: missing {e.args[0]!r}')
+        except ValidationError as e:
+            raise CommandError(f'Row {number}: {"; ".join(e.messages)}')
+
+    def upsert(self, products):
+        with transaction.atomic():
+            Product.objects.bulk_create(
+                products,
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=UPDATE_FIELDS
+            )
+            # The upsert wrote in_stock_quantity; sharded products keep their stock in the shards
+            quantities = {product.pk: product.in_stock_quantity for product in products}
+            for product in Product.objects.filter(pk__in=quantities, stock_shards__gt=0).only('pk', 'stock_shards'):
+                set_stock(product, quantities[product.pk])
+            # bulk_create skips the signal that keeps the search index in sync
+            backend = get_search_backend(connection.alias)
+            if backend is not None:
+                backend.index(products)
+
+    def reset_sequences(self):
+        """Move the id sequence past explicitly imported ids (PostgreSQL)"""
+        statements = connection.ops.sequence_reset_sql(no_style(), [Product])
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
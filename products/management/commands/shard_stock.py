@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from products.inventory import shard_stock
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Split hot products\' stock across counter rows, or fold it back with --shards 0'
+
+    def add_arguments(self, parser):
+        parser.add_argument('product_ids', nargs='+', type=int)
+        parser.add_argument('--shards', type=int, default=16, help='Counter rows per product; 0 unshards')
+
+    def handle(self, *args, **options):
+        shards = options['shards']
+        if not 0 <= shards <= 1000:
+            raise CommandError('--shards must be between 0 and 1000')
+        for product_id in options['product_ids']:
+            try:
+                total = shard_stock(product_id, shards)
+            except Product.DoesNotExist:
+                raise CommandError(f'Product {product_id} does not exist')
+            if shards:
+                self.stdout.write(f'Product {product_id}: {total} units over {shards} shards')
+            else:
+                self.stdout.write(f'Product {product_id}: {total} units, unsharded')
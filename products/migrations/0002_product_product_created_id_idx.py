@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 15:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['date_created', 'id'], name='product_created_id_idx'),
+        ),
+    ]
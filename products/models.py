@@ -1,11 +1,26 @@
-from django.db import models
+from functools import partial
+
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .cache import bump_catalogue_version
+from .search import get_search_backend
+from .tasks import generate_image_variants
 
 # Create your models here.
+class CategoryQuerySet(models.QuerySet):
+    def with_product_count(self):
+        """Annotate product_count so serializers don't COUNT per category"""
+        return self.annotate(product_count=models.Count('products'))
+
+
 class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = CategoryQuerySet.as_manager()
+    
     class Meta:
         verbose_name_plural = "Categories"
         ordering = ['name']
@@ -17,20 +32,106 @@ class Product(models.Model):
     name = models.CharField(max_length=200)
     description = models.TextField()
     price = models.DecimalField(max_digits=10, decimal_places=2)
-    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='products')
+    # Indexed by the composite category indexes below, which all lead with it
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, related_name='products', db_index=False
+    )
     in_stock_quantity = models.IntegerField(default=0)
+    # Hot products split their stock across this many StockShard rows (see inventory.py)
+    stock_shards = models.PositiveSmallIntegerField(default=0)
     image = models.ImageField(upload_to='products/', blank=True, null=True)
+    # Thumbnails of the image, written by the derivative pipeline (see images.py)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     date_created = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         ordering = ['-date_created']  # Newest first
+        indexes = [
+            # Keyset pagination seeks on (date_created, id)
+            models.Index(fields=['date_created', 'id'], name='product_created_id_idx'),
+            # Catalogue ordered by price or name, also as keyset (field, id)
+            models.Index(fields=['price', 'id'], name='product_price_id_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_id_idx'),
+            # Category browsing, newest first or by price; without an in-stock
+            # filter the partial index below can't serve the price ordering
+            models.Index(fields=['category', '-date_created'], name='product_category_created_idx'),
+            models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+            # In-stock products by category and price
+            models.Index(
+                fields=['category', 'price'],
+                name='product_in_stock_cat_price_idx',
+                condition=models.Q(in_stock_quantity__gt=0),
+            ),
+        ]
     
     def __str__(self):
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        product = super().from_db(db, field_names, values)
+        product._loaded_image = product.__dict__.get('image')
+        return product
+    
+    def save(self, *args, **kwargs):
+        """Drop stale thumbnails and render new ones when the image changes"""
+        image_changed = 'image' in self.__dict__ and (
+            (self.image.name or None) != (getattr(self, '_loaded_image', None) or None)
+        )
+        if image_changed:
+            self.image_variants = {}
+        super().save(*args, **kwargs)
+        if image_changed:
+            self._loaded_image = self.image.name
+            transaction.on_commit(partial(generate_image_variants.delay, self.pk), using=kwargs.get('using'))
+    
+    @property
+    def stock_quantity(self):
+        """Units in stock; for sharded products the cached sum of the shards"""
+        if not self.stock_shards:
+            return self.in_stock_quantity
+        if not hasattr(self, '_stock_total'):
+            from .inventory import load_stock_totals
+            load_stock_totals([self])
+        return self._stock_total
+    
     @property
     def in_stock(self):
-        return self.in_stock_quantity > 0
+        return self.stock_quantity > 0
+
+
+class StockShard(models.Model):
+    """One of the counters a sharded product's stock is split across"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='shards')
+    index = models.PositiveSmallIntegerField()
+    quantity = models.IntegerField(default=0)
     
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'index'], name='stock_shard_product_index_uniq'),
+        ]
     
+    def __str__(self):
+        return f"{self.product_id}#{self.index}: {self.quantity}"
+
+
+# Signal to invalidate cached catalogue responses on any product/category change
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_catalogue_cache(sender, **kwargs):
+    bump_catalogue_version()
+
+
+# Signals to keep search indexes that the database doesn't maintain in sync
+@receiver(post_save, sender=Product)
+def index_product_for_search(sender, instance, using, **kwargs):
+    backend = get_search_backend(using)
+    if backend is not None:
+        backend.index([instance])
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search(sender, instance, using, **kwargs):
+    backend = get_search_backend(using)
+    if backend is not None:
+        backend.remove([instance.pk])
@@ -0,0 +1,135 @@
+import re
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from rest_framework import filters
+
+FTS_TABLE = 'products_product_fts'
+
+
+def search_tokens(terms):
+    """Split search terms into plain word tokens safe for any query syntax"""
+    return re.findall(r'\w+', ' '.join(terms))
+
+
+class SearchBackend:
+    """
+    A full-text search implementation for products.
+
+    ``search`` filters a product queryset and annotates ``search_rank``
+    (higher is more relevant); ``index``/``remove`` keep the index in sync
+    for backends that are not maintained by the database itself.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def is_available(self):
+        return True
+
+    def search(self, queryset, tokens):
+        raise NotImplementedError
+
+    def index(self, products):
+        pass
+
+    def remove(self, product_ids):
+        pass
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Ranked search over the stored, GIN-indexed ``search_vector`` column"""
+    config = 'english'
+
+    def search(self, queryset, tokens):
+        table = queryset.model._meta.db_table
+        query = ' & '.join(f'{token}:*' for token in tokens)
+        tsquery = 'to_tsquery(%s::regconfig, %s)'
+        return queryset.filter(
+            RawSQL(f'"{table}"."search_vector" @@ {tsquery}', [self.config, query], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f'ts_rank("{table}"."search_vector", {tsquery})', [self.config, query], output_field=FloatField())
+        )
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """Ranked search over an FTS5 table that signals keep in sync"""
+
+    def is_available(self):
+        with connections[self.alias].cursor() as cursor:
+            return FTS_TABLE in connections[self.alias].introspection.table_names(cursor)
+
+    def search(self, queryset, tokens):
+        table = queryset.model._meta.db_table
+        query = ' '.join(f'"{token}"*' for token in tokens)
+        return queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [query])
+        ).annotate(
+            # bm25 is lower-is-better; names weigh ten times the description
+            search_rank=RawSQL(
+                f'(SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id")',
+                [query],
+                output_field=FloatField()
+            )
+        )
+
+    def index(self, products):
+        rows = [(product.pk, product.name, product.description) for product in products]
+        with connections[self.alias].cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(row[0],) for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, description) VALUES (%s, %s, %s)', rows
+            )
+
+    def remove(self, product_ids):
+        with connections[self.alias].cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in product_ids])
+
+
+SEARCH_BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+_backends = {}
+
+
+def get_search_backend(alias='default'):
+    """
+    Return the full-text backend for a database alias, or None to fall back
+    to DRF's substring search. ``PRODUCT_SEARCH_BACKEND`` overrides the
+    per-vendor choice with a dotted path.
+    """
+    if alias not in _backends:
+        backend_path = getattr(settings, 'PRODUCT_SEARCH_BACKEND', None)
+        if backend_path:
+            backend_class = import_string(backend_path)
+        else:
+            backend_class = SEARCH_BACKENDS.get(connections[alias].vendor)
+        backend = backend_class(alias) if backend_class else None
+        _backends[alias] = backend if backend and backend.is_available() else None
+    return _backends[alias]
+
+
+class ProductSearchFilter(filters.SearchFilter):
+    """``?search=`` through the full-text backend, ranked by relevance"""
+
+    def filter_queryset(self, request, queryset, view):
+        backend = get_search_backend(queryset.db)
+        tokens = search_tokens(self.get_search_terms(request))
+        if backend is None or not tokens:
+            return super().filter_queryset(request, queryset, view)
+        return backend.search(queryset, tokens)
+
+
+class ProductOrderingFilter(filters.OrderingFilter):
+    """Order search results by relevance unless ``?ordering=`` is given"""
+
+    def get_ordering(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param) and 'search_rank' in queryset.query.annotations:
+            return ['-search_rank', *(self.get_default_ordering(view) or ())]
+        return super().get_ordering(request, queryset, view)
@@ -1,8 +1,53 @@
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+from shopsphere_project.fieldsets import SparseFieldsMixin
+from .cache import bump_catalogue_version
+from .images import FORMATS
+from .inventory import add_stock, held_total, load_stock_totals, set_stock
 from .models import Category, Product
+from .search import get_search_backend
 
 
-class CategorySerializer(serializers.ModelSerializer):
+class ImageVariantField(serializers.Field):
+    """
+    One thumbnail variant of the product image with its dimensions and a
+    ``srcset`` per MIME type; null until the derivatives have been rendered.
+    """
+    
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        kwargs['source'] = 'image_variants'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def to_representation(self, variants):
+        entries = variants.get(self.variant)
+        if not entries:
+            return None
+        storage = Product._meta.get_field('image').storage
+        request = self.context.get('request')
+        
+        def url(name):
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        
+        formats = [fmt for fmt in FORMATS if fmt in entries[0]]
+        # The largest JPEG (or last format) is the fallback src for old clients
+        default = entries[-1]
+        return {
+            'url': url(default[formats[-1]]),
+            'width': default['width'],
+            'height': default['height'],
+            'srcset': {
+                FORMATS[fmt][1]: ', '.join(f"{url(entry[fmt])} {entry['width']}w" for entry in entries)
+                for fmt in formats
+            },
+        }
+
+
+class CategorySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for product categories"""
     product_count = serializers.SerializerMethodField()
     
@@ -10,23 +55,57 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id', 'name', 'description', 'created_at', 'product_count']
         read_only_fields = ['id', 'created_at']
+        field_columns = {'product_count': []}  # an annotation, added by the view
     
     def get_product_count(self, obj):
         """Count how many products in this category"""
+        if hasattr(obj, 'product_count'):
+            # Annotated by Category.objects.with_product_count()
+            return obj.product_count
         return obj.products.count()
 
 
-class ProductListSerializer(serializers.ModelSerializer):
-    """Lightweight serializer for product listings"""
+class StockTotalsListSerializer(serializers.ListSerializer):
+    """Load the stock totals of every sharded product on the page at once"""
+    
+    def to_representation(self, data):
+        products = list(data.all() if hasattr(data, 'all') else data)
+        if 'in_stock' in self.child.fields:
+            load_stock_totals(products)
+        return super().to_representation(products)
+
+
+class ProductListSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Lightweight serializer for product listings; ``?expand=category`` nests the category"""
     category_name = serializers.CharField(source='category.name', read_only=True)
     in_stock = serializers.BooleanField(read_only=True)
+    thumbnail = ImageVariantField('list')
     
     class Meta:
         model = Product
-        fields = ['id', 'name', 'price', 'category_name', 'in_stock', 'image', 'date_created']
+        fields = ['id', 'name', 'price', 'category_name', 'in_stock', 'image', 'thumbnail', 'date_created']
+        list_serializer_class = StockTotalsListSerializer
+        field_columns = {'in_stock': ['in_stock_quantity', 'stock_shards']}
+        expandable_fields = {'category': (CategorySerializer, {'read_only': True})}
 
 
-class ProductDetailSerializer(serializers.ModelSerializer):
+class ProductValidationMixin:
+    """Field rules shared by single and bulk product writes"""
+    
+    def validate_price(self, value):
+        """Ensure price is positive"""
+        if value <= 0:
+            raise serializers.ValidationError("Price must be greater than zero.")
+        return value
+    
+    def validate_in_stock_quantity(self, value):
+        """Ensure quantity is not negative"""
+        if value < 0:
+            raise serializers.ValidationError("Stock quantity cannot be negative.")
+        return value
+
+
+class ProductDetailSerializer(SparseFieldsMixin, ProductValidationMixin, serializers.ModelSerializer):
     """Detailed serializer for single product view"""
     category = CategorySerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
@@ -34,24 +113,199 @@ class ProductDetailSerializer(serializers.ModelSerializer):
         source='category',
         write_only=True
     )
+    thumbnail = ImageVariantField('detail')
     
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'description', 'price', 
             'category', 'category_id', 'in_stock_quantity', 
-            'image', 'in_stock', 'date_created', 'updated_at'
+            'image', 'thumbnail', 'in_stock', 'date_created', 'updated_at'
         ]
         read_only_fields = ['id', 'date_created', 'updated_at', 'in_stock']
+        field_columns = {
+            'in_stock_quantity': ['in_stock_quantity', 'stock_shards'],
+            'in_stock': ['in_stock_quantity', 'stock_shards'],
+        }
     
-    def validate_price(self, value):
-        """Ensure price is positive"""
-        if value <= 0:
-            raise serializers.ValidationError("Price must be greater than zero.")
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'in_stock_quantity' in data:
+            # Sharded products report the sum of their shards
+            data['in_stock_quantity'] = instance.stock_quantity
+        return data
+    
+    def update(self, instance, validated_data):
+        """Spread a new stock level over the shards of a sharded product"""
+        quantity = validated_data.pop('in_stock_quantity', None) if instance.stock_shards else None
+        instance = super().update(instance, validated_data)
+        if quantity is not None:
+            set_stock(instance, quantity)
+        return instance
+
+
+class ProductBulkListSerializer(serializers.ListSerializer):
+    """
+    Validate and apply a batch of product writes in a fixed number of queries.
+    
+    Referenced products and categories are looked up with one query each, and
+    the whole batch is applied in one transaction: a bulk INSERT, a
+    ``bulk_update`` and a single conditional UPDATE of ``F()`` stock deltas.
+    """
+    
+    def to_internal_value(self, data):
+        # Look up every referenced product and category once; rows check against these
+        if isinstance(data, list) and (self.max_length is None or len(data) <= self.max_length):
+            self.known_products = self._existing_ids(Product, data, 'id')
+            self.known_categories = self._existing_ids(Category, data, 'category_id')
+        return super().to_internal_value(data)
+    
+    @staticmethod
+    def _existing_ids(model, rows, key):
+        ids = set()
+        for row in rows:
+            try:
+                ids.add(int(row[key]))
+            except (KeyError, TypeError, ValueError):
+                pass
+        if not ids:
+            return set()
+        return set(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+    
+    def create(self, validated_data):
+        """Apply every row atomically and return one status per row"""
+        results = [None] * len(validated_data)
+        
+        with transaction.atomic():
+            # Lock every product the batch touches in one query, in id order
+            products = {
+                product.pk: product
+                for product in Product.objects.select_for_update()
+                .filter(pk__in={row['id'] for row in validated_data if 'id' in row})
+                .annotate(held=held_total())
+                .order_by('id')
+            }
+            
+            # Absolute field updates, applied to the locked instances
+            updated, fields = {}, set()
+            for index, row in enumerate(validated_data):
+                if row['op'] == 'update':
+                    product = products[row['id']]
+                    for field, value in row.items():
+                        if field not in ('op', 'id'):
+                            setattr(product, field, value)
+                            fields.add('category' if field == 'category_id' else field)
+                    updated[product.pk] = product
+                    results[index] = {'status': 'updated', 'id': product.pk}
+            
+            # Stock deltas, merged per product and checked against the result;
+            # a decrement may not take units that carts hold
+            deltas = {}
+            for row in validated_data:
+                if row['op'] == 'adjust_stock':
+                    deltas[row['id']] = deltas.get(row['id'], 0) + row['delta']
+            errors = []
+            for row in validated_data:
+                error = {}
+                if row['op'] != 'create' and products[row['id']].stock_shards and (
+                    row['op'] == 'adjust_stock' or 'in_stock_quantity' in row
+                ):
+                    error['id'] = ["Stock of this product is sharded; set it on the product itself."]
+                elif row['op'] == 'adjust_stock' and deltas[row['id']] < 0 and (
+                    products[row['id']].in_stock_quantity + deltas[row['id']] < products[row['id']].held
+                ):
+                    available = products[row['id']].in_stock_quantity - products[row['id']].held
+                    error['delta'] = [
+                        f"Stock cannot go below zero or below what carts hold. Available: {max(available, 0)}"
+                    ]
+                errors.append(error)
+            if any(errors):
+                raise serializers.ValidationError(errors)
+            
+            if updated:
+                now = timezone.now()
+                for product in updated.values():
+                    product.updated_at = now
+                Product.objects.bulk_update(updated.values(), [*fields, 'updated_at'])
+            
+            creates = [
+                (index, Product(**{field: value for field, value in row.items() if field != 'op'}))
+                for index, row in enumerate(validated_data)
+                if row['op'] == 'create'
+            ]
+            if creates:
+                Product.objects.bulk_create([product for _, product in creates])
+                for index, product in creates:
+                    results[index] = {'status': 'created', 'id': product.pk}
+            
+            if deltas:
+                if not add_stock(deltas, {product_id: products[product_id].held for product_id in deltas}):
+                    raise serializers.ValidationError({
+                        api_settings.NON_FIELD_ERRORS_KEY: ["Stock changed while applying the batch. Please try again."]
+                    })
+                for index, row in enumerate(validated_data):
+                    if row['op'] == 'adjust_stock':
+                        results[index] = {'status': 'adjusted', 'id': row['id']}
+            
+            # Bulk writes send no signals; sync search and the response cache here
+            backend = get_search_backend()
+            if backend is not None:
+                backend.index([*updated.values(), *(product for _, product in creates)])
+            bump_catalogue_version()
+        
+        return results
+
+
+class ProductBulkSerializer(ProductValidationMixin, serializers.ModelSerializer):
+    """
+    One row of a bulk product write.
+    
+    ``create`` takes the product fields, ``update`` an ``id`` plus the fields
+    to change and ``adjust_stock`` an ``id`` and a signed ``delta``.
+    """
+    OPS = ['create', 'update', 'adjust_stock']
+    
+    op = serializers.ChoiceField(choices=OPS)
+    id = serializers.IntegerField(required=False)
+    category_id = serializers.IntegerField(required=False, allow_null=True)
+    delta = serializers.IntegerField(required=False)
+    
+    class Meta:
+        model = Product
+        fields = ['op', 'id', 'name', 'description', 'price', 'category_id', 'in_stock_quantity', 'delta']
+        extra_kwargs = {
+            'name': {'required': False},
+            'description': {'required': False},
+            'price': {'required': False},
+        }
+        list_serializer_class = ProductBulkListSerializer
+    
+    def validate_id(self, value):
+        if value not in self.parent.known_products:
+            raise serializers.ValidationError("Product not found.")
         return value
     
-    def validate_in_stock_quantity(self, value):
-        """Ensure quantity is not negative"""
-        if value < 0:
-            raise serializers.ValidationError("Stock quantity cannot be negative.")
-        return value
\ No newline at end of file
+    def validate_category_id(self, value):
+        if value is not None and value not in self.parent.known_categories:
+            raise serializers.ValidationError("Category not found.")
+        return value
+    
+    def validate(self, attrs):
+        op = attrs['op']
+        fields = set(attrs) - {'op', 'id', 'delta'}
+        if op == 'create':
+            if 'id' in attrs or 'delta' in attrs:
+                raise serializers.ValidationError("create takes product fields only.")
+            missing = {'name', 'description', 'price'} - fields
+            if missing:
+                raise serializers.ValidationError(
+                    {field: ["This field is required."] for field in sorted(missing)}
+                )
+        else:
+            if 'id' not in attrs:
+                raise serializers.ValidationError({'id': ["This field is required."]})
+            if op == 'update' and ('delta' in attrs or not fields):
+                raise serializers.ValidationError("update takes an id and the fields to change.")
+            if op == 'adjust_stock' and ('delta' not in attrs or fields):
+                raise serializers.ValidationError("adjust_stock takes an id and a delta only.")
+        return attrs
\ No newline at end of file
@@ -0,0 +1,15 @@
+from celery import shared_task
+from .images import generate_product_variants
+
+
+@shared_task
+def generate_image_variants(product_id):
+    """Render list/detail thumbnails for a newly uploaded product image"""
+    return generate_product_variants(product_id)
+
+
+@shared_task
+def sync_sharded_stock():
+    """Refresh in_stock_quantity of sharded products from their shards"""
+    from .inventory import sync_sharded_stock
+    return sync_sharded_stock()
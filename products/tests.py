@@ -1,10 +1,28 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from PIL import Image
 
 # Create your tests here.
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import Category, Product
+from rest_framework_simplejwt.tokens import RefreshToken
+from shopsphere_project.testing import QueryPlanTestMixin
+from .async_views import CategoryListAsyncView, ProductDetailAsyncView, ProductListAsyncView
+from .cache import catalogue_version
+from .inventory import shard_stock, sync_sharded_stock, take_stock
+from .models import Category, Product, StockShard
 
 
 class ProductAPITest(TestCase):
@@ -97,4 +115,953 @@ class ProductAPITest(TestCase):
         
         response = self.client.post('/api/products/', data)
         
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+class CategoryQueryCountTest(TestCase):
+    """Test that category product counts don't cost a query per row"""
+    
+    def setUp(self):
+        """Create categories that each hold a few products"""
+        for i in range(5):
+            category = Category.objects.create(name=f'Category {i}')
+            for j in range(3):
+                Product.objects.create(
+                    name=f'Product {i}-{j}',
+                    description='A product',
+                    price=10,
+                    category=category,
+                    in_stock_quantity=1
+                )
+        
+        self.client = APIClient()
+    
+    def test_category_list_query_count(self):
+        """Test category list uses a fixed number of queries"""
+        # COUNT for pagination + annotated page
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/categories/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertTrue(all(c['product_count'] == 3 for c in response.data['results']))
+    
+    def test_product_detail_query_count(self):
+        """Test product detail fetches the nested category count with the category"""
+        product = Product.objects.first()
+        
+        # product + annotated category
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/products/{product.id}/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['category']['product_count'], 3)
+
+
+class ProductCursorPaginationTest(TestCase):
+    """Test opt-in keyset pagination of the product catalogue"""
+    
+    def setUp(self):
+        """Create products with plenty of duplicate prices and names"""
+        self.category = Category.objects.create(name='Books')
+        for i in range(25):
+            Product.objects.create(
+                name=f'Book {i % 4}',
+                description='A book',
+                price=10 + i % 3,
+                category=self.category,
+                in_stock_quantity=1
+            )
+        
+        self.client = APIClient()
+    
+    def walk(self, url):
+        """Follow next links, returning all ids seen and the responses"""
+        ids, responses = [], []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            responses.append(response)
+            ids.extend(p['id'] for p in response.data['results'])
+            url = response.data['next']
+        return ids, responses
+    
+    def test_cursor_mode_has_no_count(self):
+        """Test cursor mode returns cursor links instead of a page count"""
+        response = self.client.get('/api/products/?pagination=cursor')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.data)
+        self.assertIsNone(response.data['previous'])
+        self.assertIn('pagination=cursor', response.data['next'])
+    
+    def test_cursor_mode_is_stable_for_every_ordering(self):
+        """Test walking all pages yields each product once, in order"""
+        all_ids = set(Product.objects.values_list('id', flat=True))
+        
+        for ordering in ['-date_created', 'price', '-price', 'name', '-name']:
+            ids, _ = self.walk(f'/api/products/?pagination=cursor&ordering={ordering}')
+            self.assertEqual(len(ids), len(all_ids), ordering)
+            self.assertEqual(set(ids), all_ids, ordering)
+            
+            field = ordering.lstrip('-')
+            expected = list(
+                Product.objects.order_by(ordering, '-id' if ordering.startswith('-') else 'id')
+                .values_list('id', flat=True)
+            )
+            self.assertEqual(ids, expected, field)
+    
+    def test_cursor_mode_previous_link(self):
+        """Test following previous returns to the earlier page"""
+        first = self.client.get('/api/products/?pagination=cursor&ordering=price')
+        second = self.client.get(first.data['next'])
+        back = self.client.get(second.data['previous'])
+        
+        self.assertEqual(
+            [p['id'] for p in back.data['results']],
+            [p['id'] for p in first.data['results']]
+        )
+    
+    def test_deep_page_costs_same_as_first_page(self):
+        """Test later pages run a single seek query and no COUNT"""
+        _, responses = self.walk('/api/products/?pagination=cursor&ordering=price')
+        cache.clear()  # measure the database, not the response cache
+        
+        with self.assertNumQueries(1):
+            self.client.get('/api/products/?pagination=cursor&ordering=price')
+        with self.assertNumQueries(1):
+            self.client.get(responses[-2].data['next'])
+    
+    def test_invalid_cursor(self):
+        """Test a tampered cursor is rejected"""
+        response = self.client.get('/api/products/?pagination=cursor&cursor=cD1nYXJiYWdl')
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+
+class ProductCacheTest(TestCase):
+    """Test cached product list/detail responses"""
+    
+    def setUp(self):
+        """Set up test data"""
+        cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin',
+            password='adminpass123',
+            is_staff=True,
+            is_superuser=True
+        )
+        self.category = Category.objects.create(name='Electronics')
+        self.product = Product.objects.create(
+            name='Test Laptop',
+            description='A test laptop',
+            price=999.99,
+            category=self.category,
+            in_stock_quantity=10
+        )
+        
+        self.client = APIClient()
+    
+    def test_list_is_served_from_cache(self):
+        """Test repeated list requests skip the database"""
+        self.client.get('/api/products/?search=laptop&ordering=price')
+        
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/?ordering=price&search=laptop')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['name'], 'Test Laptop')
+    
+    def test_timeout_read_per_request(self):
+        """Test CATALOGUE_CACHE_TIMEOUT changes apply without a restart"""
+        with self.settings(CATALOGUE_CACHE_TIMEOUT=0):
+            self.client.get('/api/products/')
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get('/api/products/')
+            self.assertGreater(len(queries), 0)
+    
+    def test_save_invalidates_cache(self):
+        """Test saving a product or category serves fresh data"""
+        self.client.get(f'/api/products/{self.product.id}/')
+        
+        self.product.name = 'Renamed Laptop'
+        self.product.save()
+        response = self.client.get(f'/api/products/{self.product.id}/')
+        self.assertEqual(response.data['name'], 'Renamed Laptop')
+        
+        self.category.name = 'Computers'
+        self.category.save()
+        response = self.client.get(f'/api/products/{self.product.id}/')
+        self.assertEqual(response.data['category']['name'], 'Computers')
+    
+    def test_delete_invalidates_cache(self):
+        """Test deleting a product drops it from the cached list"""
+        self.client.get('/api/products/')
+        
+        self.product.delete()
+        response = self.client.get('/api/products/')
+        
+        self.assertEqual(response.data['count'], 0)
+    
+    def test_order_placement_invalidates_cache(self):
+        """Test stock sold through an order shows up in the catalogue"""
+        self.client.get(f'/api/products/{self.product.id}/')
+        
+        self.client.force_authenticate(user=self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                '/api/orders/',
+                {'items': [{'product': self.product.id, 'quantity': 4}]},
+                format='json'
+            )
+        response = self.client.get(f'/api/products/{self.product.id}/')
+        
+        self.assertEqual(response.data['in_stock_quantity'], 6)
+    
+    def test_admin_list_editable_invalidates_cache(self):
+        """Test bulk edits in the admin changelist serve fresh data"""
+        self.client.get('/api/products/')
+        
+        self.client.force_login(self.admin)
+        response = self.client.post('/admin/products/product/', {
+            'form-TOTAL_FORMS': '1',
+            'form-INITIAL_FORMS': '1',
+            'form-0-id': str(self.product.id),
+            'form-0-price': '19.99',
+            'form-0-in_stock_quantity': '3',
+            '_save': 'Save',
+        })
+        self.assertEqual(response.status_code, 302)
+        self.client.logout()
+        
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.data['results'][0]['price'], '19.99')
+    
+    def test_etag_not_modified(self):
+        """Test revalidating with the ETag returns 304"""
+        response = self.client.get(f'/api/products/{self.product.id}/')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        
+        response = self.client.get(
+            f'/api/products/{self.product.id}/',
+            HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_if_modified_since_not_modified(self):
+        """Test revalidating with Last-Modified returns 304"""
+        response = self.client.get('/api/products/')
+        
+        response = self.client.get(
+            '/api/products/',
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class ProductSearchTest(TestCase):
+    """Test full-text product search"""
+    
+    def setUp(self):
+        """Set up products whose names and descriptions overlap"""
+        self.category = Category.objects.create(name='Electronics')
+        self.cable = Product.objects.create(
+            name='USB Cable',
+            description='Connects your laptop to a monitor',
+            price=9.99,
+            category=self.category,
+            in_stock_quantity=10
+        )
+        self.laptop = Product.objects.create(
+            name='Gaming Laptop',
+            description='A fast laptop with a big screen',
+            price=1499.00,
+            category=self.category,
+            in_stock_quantity=3
+        )
+        self.chair = Product.objects.create(
+            name='Office Chair',
+            description='Ergonomic seating',
+            price=199.00,
+            category=self.category,
+            in_stock_quantity=5
+        )
+        
+        self.client = APIClient()
+    
+    def search(self, query):
+        response = self.client.get('/api/products/', {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [p['id'] for p in response.data['results']]
+    
+    def test_results_ranked_by_relevance(self):
+        """Test a name match ranks above a description-only match"""
+        self.assertEqual(self.search('laptop'), [self.laptop.id, self.cable.id])
+    
+    def test_explicit_ordering_overrides_rank(self):
+        """Test ?ordering= still applies to search results"""
+        response = self.client.get('/api/products/', {'search': 'laptop', 'ordering': 'price'})
+        
+        self.assertEqual([p['id'] for p in response.data['results']], [self.cable.id, self.laptop.id])
+    
+    def test_prefix_and_multiple_terms(self):
+        """Test partial words match and every term must match"""
+        self.assertEqual(self.search('ergo'), [self.chair.id])
+        self.assertEqual(self.search('fast laptop'), [self.laptop.id])
+    
+    def test_query_syntax_is_not_interpreted(self):
+        """Test punctuation in the search string is treated as plain text"""
+        self.assertEqual(self.search('"chair* ('), [self.chair.id])
+    
+    def test_index_follows_saves_and_deletes(self):
+        """Test renamed and deleted products are reflected in search"""
+        self.chair.name = 'Standing Desk'
+        self.chair.description = 'Adjustable height'
+        self.chair.save()
+        self.assertEqual(self.search('chair'), [])
+        self.assertEqual(self.search('desk'), [self.chair.id])
+        
+        self.chair.delete()
+        self.assertEqual(self.search('desk'), [])
+
+
+class ProductQueryPlanTest(QueryPlanTestMixin, TestCase):
+    """Test hot catalogue queries are served by indexes"""
+    
+    def setUp(self):
+        """Set up a few products across categories"""
+        self.categories = [Category.objects.create(name=f'Category {i}') for i in range(3)]
+        for i in range(30):
+            Product.objects.create(
+                name=f'Product {i}',
+                description='A product',
+                price=5 + i,
+                category=self.categories[i % 3],
+                in_stock_quantity=i % 4
+            )
+        
+        self.client = APIClient()
+    
+    def get(self, url):
+        cache.clear()  # plan the database queries, not cache hits
+        with self.assertQueriesUseIndexes(tables=['products_product']) as plans:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.plans = plans
+        return response
+    
+    def test_product_list(self):
+        """Test newest-first list and each exposed ordering"""
+        self.get('/api/products/')
+        for ordering in ['price', '-price', 'name', '-name', 'date_created']:
+            self.get(f'/api/products/?ordering={ordering}')
+    
+    def test_product_list_by_category(self):
+        """Test category browsing, newest first and by price"""
+        category = self.categories[0].id
+        self.get(f'/api/products/?category={category}')
+        for ordering in ['price', '-price']:
+            self.get(f'/api/products/?category={category}&ordering={ordering}')
+            
+            [plan] = [plan for sql, plan in self.plans if 'ORDER BY' in sql]
+            if connection.vendor == 'sqlite':
+                # Only the full (category, price) index reads in this order
+                self.assertIn('SEARCH products_product USING INDEX product_category_price_idx (category_id=?)', plan)
+    
+    def test_in_stock_products_by_category(self):
+        """Test in-stock products by category and price"""
+        category = self.categories[0].id
+        self.get(f'/api/products/?category={category}&in_stock_quantity__gt=0&ordering=price')
+    
+    def test_product_list_cursor_mode(self):
+        """Test keyset pages seek through the composite indexes"""
+        for ordering in ['-date_created', 'price', 'name']:
+            response = self.get(f'/api/products/?pagination=cursor&ordering={ordering}')
+            self.get(response.data['next'])
+            
+            [(sql, plan)] = self.plans
+            if connection.vendor == 'sqlite':
+                # A range seek into the index, not a scan from its start
+                self.assertTrue(plan[0].startswith('SEARCH products_product USING INDEX'), plan)
+    
+    def test_product_detail(self):
+        """Test retrieving one product"""
+        self.get(f'/api/products/{Product.objects.first().id}/')
+
+
+class AsyncCatalogueViewTest(TestCase):
+    """Test the async catalogue read path against the sync viewsets"""
+    
+    def setUp(self):
+        """Set up test data"""
+        self.admin = User.objects.create_user(
+            username='admin',
+            password='adminpass123',
+            is_staff=True
+        )
+        self.category = Category.objects.create(name='Electronics')
+        for i in range(12):
+            Product.objects.create(
+                name=f'Laptop {i}',
+                description='A laptop',
+                price=100 + i,
+                category=self.category,
+                in_stock_quantity=i
+            )
+        
+        self.factory = AsyncRequestFactory()
+        self.client = APIClient()
+    
+    async def assertSameAsSync(self, view, url, **kwargs):
+        """Compare an async view's response with the router's sync viewset"""
+        await cache.aclear()
+        response = await view.as_view()(self.factory.get(url), **kwargs)
+        await cache.aclear()
+        expected = await sync_to_async(self.client.get)(url)
+        
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(json.loads(response.content), expected.json())
+        return response
+    
+    async def test_product_list(self):
+        """Test filters, search, ordering and pages match the sync list"""
+        category = self.category.id
+        await self.assertSameAsSync(ProductListAsyncView, '/api/products/')
+        await self.assertSameAsSync(ProductListAsyncView, '/api/products/?page=2')
+        await self.assertSameAsSync(ProductListAsyncView, f'/api/products/?category={category}&ordering=-price')
+        await self.assertSameAsSync(ProductListAsyncView, '/api/products/?search=laptop&in_stock_quantity__gt=5')
+        await self.assertSameAsSync(ProductListAsyncView, '/api/products/?page=9')
+        await self.assertSameAsSync(ProductListAsyncView, '/api/products/?category=999')
+    
+    async def test_product_detail(self):
+        """Test detail and missing products match the sync view"""
+        product = await Product.objects.afirst()
+        
+        response = await self.assertSameAsSync(
+            ProductDetailAsyncView, f'/api/products/{product.id}/', pk=product.id
+        )
+        self.assertIn('ETag', response)
+        await self.assertSameAsSync(ProductDetailAsyncView, '/api/products/999/', pk=999)
+    
+    async def test_category_list(self):
+        """Test the category list matches the sync view"""
+        await self.assertSameAsSync(CategoryListAsyncView, '/api/categories/')
+    
+    async def test_writes_fall_back_to_sync_viewset(self):
+        """Test POST through the async view is handled by the DRF viewset"""
+        token = await sync_to_async(lambda: str(RefreshToken.for_user(self.admin).access_token))()
+        request = self.factory.post(
+            '/api/products/',
+            {'name': 'Tablet', 'description': 'A tablet', 'price': '299.00',
+             'category_id': self.category.id, 'in_stock_quantity': 4},
+            content_type='application/json',
+            headers={'Authorization': f'Bearer {token}'}
+        )
+        
+        response = await ProductListAsyncView.as_view()(request)
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(await Product.objects.filter(name='Tablet').aexists())
+
+
+class ProductImportExportTest(TestCase):
+    """Test the bulk catalogue import/export commands"""
+    
+    def setUp(self):
+        self.category = Category.objects.create(name='Electronics')
+        self.lamp = Product.objects.create(
+            name='Desk Lamp',
+            description='A lamp',
+            price=25.00,
+            category=self.category,
+            in_stock_quantity=4
+        )
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+    
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        return path
+    
+    def import_products(self, path, **options):
+        out = StringIO()
+        call_command('import_products', path, stdout=out, **options)
+        return out.getvalue()
+    
+    def test_import_csv_upserts(self):
+        """Test rows with an id update, rows without one insert, categories resolve by name"""
+        path = self.write('products.csv', (
+            'id,name,description,price,category,in_stock_quantity\n'
+            f'{self.lamp.id},Desk Lamp,A brighter lamp,27.50,Electronics,9\n'
+            ',Walnut Table,Solid walnut,450.00,Furniture,2\n'
+            ',Gift Card,,10.00,,100\n'
+        ))
+        
+        output = self.import_products(path, batch_size=2)
+        
+        self.assertIn('Imported 3 products', output)
+        self.assertIn('rows/s', output)
+        self.lamp.refresh_from_db()
+        self.assertEqual((self.lamp.description, self.lamp.in_stock_quantity), ('A brighter lamp', 9))
+        table = Product.objects.get(name='Walnut Table')
+        self.assertEqual(table.category.name, 'Furniture')
+        self.assertIsNone(Product.objects.get(name='Gift Card').category)
+        self.assertEqual(Product.objects.count(), 3)
+    
+    def test_import_sets_sharded_stock(self):
+        """Test an imported stock level on a sharded product is spread over its shards"""
+        shard_stock(self.lamp.pk, 3)
+        path = self.write('products.csv', (
+            'id,name,description,price,category,in_stock_quantity\n'
+            f'{self.lamp.id},Desk Lamp,A lamp,25.00,Electronics,12\n'
+        ))
+        
+        self.import_products(path)
+        
+        self.assertEqual(sorted(self.lamp.shards.values_list('quantity', flat=True)), [4, 4, 4])
+        # The next sync keeps the imported level
+        sync_sharded_stock()
+        self.lamp.refresh_from_db()
+        self.assertEqual(self.lamp.in_stock_quantity, 12)
+    
+    def test_import_indexes_and_invalidates(self):
+        """Test imported products are searchable and cached responses are dropped"""
+        version = catalogue_version()
+        path = self.write('products.jsonl', json.dumps(
+            {'name': 'Espresso Machine', 'description': 'Makes coffee', 'price': '199.00', 'category': 'Kitchen'}
+        ) + '\n')
+        
+        self.import_products(path)
+        
+        self.assertGreater(catalogue_version(), version)
+        response = APIClient().get('/api/products/?search=espresso')
+        self.assertEqual([p['name'] for p in response.data['results']], ['Espresso Machine'])
+    
+    def test_import_reports_bad_row(self):
+        """Test an invalid value names the offending row"""
+        path = self.write('products.csv', 'name,description,price\nKettle,A kettle,cheap\n')
+        
+        with self.assertRaisesMessage(CommandError, 'Row 1:'):
+            self.import_products(path)
+        self.assertFalse(Product.objects.filter(name='Kettle').exists())
+    
+    def test_export_round_trip(self):
+        """Test an export in either format imports back unchanged"""
+        Product.objects.create(name='Plain Mug', description='A mug', price=8.00, in_stock_quantity=30)
+        expected = list(Product.objects.order_by('id').values_list('id', 'name', 'price', 'category', 'in_stock_quantity'))
+        
+        for name in ['catalogue.csv', 'catalogue.jsonl']:
+            path = os.path.join(self.tmp.name, name)
+            call_command('export_products', output=path, stderr=StringIO())
+            self.import_products(path)
+            
+            actual = list(Product.objects.order_by('id').values_list('id', 'name', 'price', 'category', 'in_stock_quantity'))
+            self.assertEqual(actual, expected)
+    
+    def test_export_to_stdout(self):
+        """Test CSV export to stdout with a header row"""
+        out = StringIO()
+        call_command('export_products', stdout=out, stderr=StringIO())
+        
+        lines = out.getvalue().splitlines()
+        self.assertEqual(lines[0], 'id,name,description,price,category,in_stock_quantity')
+        self.assertEqual(lines[1], f'{self.lamp.id},Desk Lamp,A lamp,25.00,Electronics,4')
+
+
+class ProductBulkAPITest(TestCase):
+    """Test the bulk product write endpoint"""
+    
+    def setUp(self):
+        self.admin = User.objects.create_user(username='admin', password='adminpass123', is_staff=True)
+        self.category = Category.objects.create(name='Electronics')
+        self.phone = Product.objects.create(
+            name='Phone', description='A phone', price=500.00, category=self.category, in_stock_quantity=10
+        )
+        self.tablet = Product.objects.create(
+            name='Tablet', description='A tablet', price=300.00, category=self.category, in_stock_quantity=2
+        )
+        
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.admin)
+    
+    def bulk(self, rows):
+        return self.client.post('/api/products/bulk/', rows, format='json')
+    
+    def test_mixed_batch(self):
+        """Test creates, updates and stock deltas apply together"""
+        version = catalogue_version()
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.bulk([
+                {'op': 'create', 'name': 'Smartwatch', 'description': 'A watch', 'price': '199.00',
+                 'category_id': self.category.id, 'in_stock_quantity': 5},
+                {'op': 'update', 'id': self.phone.id, 'price': '479.00', 'name': 'Phone Pro'},
+                {'op': 'adjust_stock', 'id': self.phone.id, 'delta': -4},
+                {'op': 'adjust_stock', 'id': self.tablet.id, 'delta': 8},
+                {'op': 'adjust_stock', 'id': self.phone.id, 'delta': 1},
+            ])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        watch = Product.objects.get(name='Smartwatch')
+        self.assertEqual(response.data['results'], [
+            {'status': 'created', 'id': watch.id},
+            {'status': 'updated', 'id': self.phone.id},
+            {'status': 'adjusted', 'id': self.phone.id},
+            {'status': 'adjusted', 'id': self.tablet.id},
+            {'status': 'adjusted', 'id': self.phone.id},
+        ])
+        self.phone.refresh_from_db()
+        self.tablet.refresh_from_db()
+        self.assertEqual((self.phone.name, str(self.phone.price), self.phone.in_stock_quantity), ('Phone Pro', '479.00', 7))
+        self.assertEqual(self.tablet.in_stock_quantity, 10)
+        self.assertGreater(catalogue_version(), version)
+        
+        response = self.client.get('/api/products/?search=smartwatch')
+        self.assertEqual([p['id'] for p in response.data['results']], [watch.id])
+    
+    def test_invalid_rows_reject_the_batch(self):
+        """Test per-row errors are reported and nothing is applied"""
+        response = self.bulk([
+            {'op': 'update', 'id': self.phone.id, 'price': '450.00'},
+            {'op': 'update', 'id': 9999, 'price': '1.00'},
+            {'op': 'create', 'name': 'Cable', 'price': '-5.00'},
+        ])
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        results = response.data['results']
+        self.assertEqual(results[0], {'status': 'skipped'})
+        self.assertEqual(results[1]['status'], 'rejected')
+        self.assertIn('id', results[1]['errors'])
+        self.assertEqual(set(results[2]['errors']), {'price'})
+        self.phone.refresh_from_db()
+        self.assertEqual(str(self.phone.price), '500.00')
+    
+    def test_stock_cannot_go_negative(self):
+        """Test a delta taking stock below zero rolls back the whole batch"""
+        response = self.bulk([
+            {'op': 'update', 'id': self.phone.id, 'price': '450.00'},
+            {'op': 'adjust_stock', 'id': self.tablet.id, 'delta': -1},
+            {'op': 'adjust_stock', 'id': self.tablet.id, 'delta': -2},
+        ])
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['results'][0], {'status': 'skipped'})
+        self.assertIn('delta', response.data['results'][2]['errors'])
+        self.phone.refresh_from_db()
+        self.tablet.refresh_from_db()
+        self.assertEqual((str(self.phone.price), self.tablet.in_stock_quantity), ('500.00', 2))
+    
+    def test_stock_cannot_go_below_held_units(self):
+        """Test a negative delta leaves the units active carts hold"""
+        shopper = User.objects.create_user(username='shopper', password='shopperpass123')
+        self.client.force_authenticate(user=shopper)
+        self.client.post('/api/cart/', {'product': self.phone.id, 'quantity': 6}, format='json')
+        self.client.force_authenticate(user=self.admin)
+        
+        response = self.bulk([{'op': 'adjust_stock', 'id': self.phone.id, 'delta': -5}])
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Available: 4', str(response.data['results'][0]['errors']['delta']))
+        self.assertEqual(self.bulk([{'op': 'adjust_stock', 'id': self.phone.id, 'delta': -4}]).status_code, 200)
+        self.phone.refresh_from_db()
+        self.assertEqual(self.phone.in_stock_quantity, 6)
+    
+    def test_requires_admin(self):
+        """Test regular users cannot write in bulk"""
+        user = User.objects.create_user(username='shopper', password='shopperpass123')
+        self.client.force_authenticate(user=user)
+        
+        response = self.bulk([{'op': 'adjust_stock', 'id': self.phone.id, 'delta': 1}])
+        
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_query_count_independent_of_rows(self):
+        """Test a batch costs the same number of queries at any size"""
+        def batch(size):
+            return [
+                row
+                for i in range(size)
+                for row in (
+                    {'op': 'create', 'name': f'Cable {size}-{i}', 'description': 'A cable', 'price': '5.00',
+                     'category_id': self.category.id},
+                    {'op': 'update', 'id': self.phone.id, 'price': f'{400 + i}.00'},
+                    {'op': 'adjust_stock', 'id': self.tablet.id, 'delta': 1},
+                )
+            ]
+        
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.bulk(batch(1)).status_code, status.HTTP_200_OK)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.bulk(batch(20)).status_code, status.HTTP_200_OK)
+        
+        self.assertEqual(len(large), len(small))
+
+
+class ProductThumbnailTest(TestCase):
+    """Test the product image derivative pipeline"""
+    
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.category = Category.objects.create(name='Photos')
+        self.product = Product.objects.create(
+            name='Poster', description='A poster', price=12.00, category=self.category, in_stock_quantity=3
+        )
+    
+    def upload(self, product, size=(2000, 1000), name='poster.png'):
+        buffer = BytesIO()
+        Image.new('RGBA', size, (200, 30, 30, 128)).save(buffer, 'PNG')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.image = SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+            product.save()
+        product.refresh_from_db()
+        return product
+    
+    def test_upload_renders_variants(self):
+        """Test list and detail thumbnails are written in each format with their sizes"""
+        product = self.upload(self.product)
+        
+        variants = product.image_variants
+        self.assertEqual(variants['source'], product.image.name)
+        self.assertEqual([(v['width'], v['height']) for v in variants['list']], [(160, 80), (320, 160)])
+        self.assertEqual([(v['width'], v['height']) for v in variants['detail']], [(640, 320), (1280, 640)])
+        storage = product.image.storage
+        for entry in variants['list'] + variants['detail']:
+            for fmt, pillow_format in [('webp', 'WEBP'), ('jpeg', 'JPEG')]:
+                with storage.open(entry[fmt]) as f:
+                    image = Image.open(f)
+                    self.assertEqual((image.format, image.size), (pillow_format, (entry['width'], entry['height'])))
+    
+    def test_small_image_is_not_upscaled(self):
+        """Test widths beyond the original collapse onto its size"""
+        product = self.upload(self.product, size=(300, 200))
+        
+        self.assertEqual([v['width'] for v in product.image_variants['list']], [160, 300])
+        self.assertEqual([v['width'] for v in product.image_variants['detail']], [300])
+    
+    def test_list_serializer_emits_thumbnail(self):
+        """Test the list shows the list thumbnail and srcset, not just the original"""
+        product = self.upload(self.product)
+        other = Product.objects.create(name='Frame', description='A frame', price=20.00, category=self.category)
+        
+        response = APIClient().get('/api/products/')
+        
+        results = {row['id']: row for row in response.data['results']}
+        thumbnail = results[product.id]['thumbnail']
+        self.assertEqual((thumbnail['width'], thumbnail['height']), (320, 160))
+        self.assertTrue(thumbnail['url'].startswith('http://testserver/media/products/variants/'))
+        self.assertTrue(thumbnail['url'].endswith('-list-320.jpeg'))
+        self.assertEqual(list(thumbnail['srcset']), ['image/webp', 'image/jpeg'])
+        self.assertRegex(thumbnail['srcset']['image/webp'], r'-list-160\.webp 160w, .*-list-320\.webp 320w$')
+        self.assertIsNone(results[other.id]['thumbnail'])
+        
+        response = APIClient().get(f'/api/products/{product.id}/')
+        self.assertEqual(response.data['thumbnail']['width'], 1280)
+    
+    def test_replacing_image_replaces_variants(self):
+        """Test a new upload clears the old derivatives and renders new ones"""
+        product = self.upload(self.product)
+        old = product.image_variants['list'][0]['jpeg']
+        
+        product = self.upload(product, size=(800, 800), name='square.png')
+        
+        storage = product.image.storage
+        self.assertFalse(storage.exists(old))
+        self.assertEqual(product.image_variants['source'], product.image.name)
+        self.assertEqual(product.image_variants['list'][-1]['height'], 320)
+        
+        # Saves that leave the image alone don't re-render
+        with mock.patch('products.models.generate_image_variants') as task:
+            with self.captureOnCommitCallbacks(execute=True):
+                product.price = 15.00
+                product.save()
+        task.delay.assert_not_called()
+    
+    def test_backfill_command(self):
+        """Test the backfill renders only products still missing thumbnails"""
+        self.upload(self.product)
+        missing = Product.objects.create(name='Canvas', description='A canvas', price=40.00, category=self.category)
+        self.upload(missing)
+        Product.objects.filter(pk=missing.pk).update(image_variants={})
+        
+        out = StringIO()
+        call_command('generate_thumbnails', workers=1, stdout=out)
+        
+        self.assertIn('Rendered thumbnails for 1 of 1 products', out.getvalue())
+        missing.refresh_from_db()
+        self.assertEqual(len(missing.image_variants['list']), 2)
+
+
+class ShardedStockTest(TestCase):
+    """Test stock split across counter rows for hot products"""
+    
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_user(username='admin', password='adminpass123', is_staff=True)
+        self.category = Category.objects.create(name='Consoles')
+        self.console = Product.objects.create(
+            name='Console', description='A console', price=300, category=self.category, in_stock_quantity=10
+        )
+        self.client = APIClient()
+    
+    def shard_quantities(self, product):
+        return list(product.shards.order_by('index').values_list('quantity', flat=True))
+    
+    def test_shard_and_unshard(self):
+        """Test stock is split evenly over the shards and folded back unchanged"""
+        out = StringIO()
+        call_command('shard_stock', str(self.console.pk), shards=4, stdout=out)
+        
+        self.assertIn('10 units over 4 shards', out.getvalue())
+        self.assertEqual(self.shard_quantities(self.console), [3, 3, 2, 2])
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(take_stock(self.console.pk, 3, 4))
+        shard_stock(self.console.pk, 0)
+        
+        self.console.refresh_from_db()
+        self.assertEqual((self.console.stock_shards, self.console.in_stock_quantity), (0, 7))
+        self.assertFalse(StockShard.objects.exists())
+    
+    def test_take_stock_spills_across_shards(self):
+        """Test a sale larger than any one shard drains several, and an oversell takes nothing"""
+        shard_stock(self.console.pk, 4)
+        
+        self.assertTrue(take_stock(self.console.pk, 5, 4))
+        self.assertEqual(sum(self.shard_quantities(self.console)), 5)
+        self.assertFalse(take_stock(self.console.pk, 6, 4))
+        self.assertEqual(sum(self.shard_quantities(self.console)), 5)
+        self.assertTrue(take_stock(self.console.pk, 5, 4))
+        self.assertEqual(self.shard_quantities(self.console), [0, 0, 0, 0])
+    
+    def test_catalogue_reads_the_shard_sum(self):
+        """Test list and detail report the summed stock, one extra query per page"""
+        shard_stock(self.console.pk, 4)
+        for i in range(3):
+            product = Product.objects.create(
+                name=f'Pad {i}', description='A pad', price=20, category=self.category, in_stock_quantity=5
+            )
+            shard_stock(product.pk, 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            take_stock(self.console.pk, 10, 4)
+        cache.clear()
+        
+        # COUNT + page + shard sums
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/products/')
+        stock = {p['name']: p['in_stock'] for p in response.data['results']}
+        self.assertEqual(stock, {'Console': False, 'Pad 0': True, 'Pad 1': True, 'Pad 2': True})
+        
+        # Sums are cached, so the detail view adds no query for them
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/products/{self.console.pk}/')
+        self.assertEqual((response.data['in_stock_quantity'], response.data['in_stock']), (0, False))
+    
+    def test_writes_spread_over_the_shards(self):
+        """Test setting stock rewrites the shards and bulk deltas are refused"""
+        shard_stock(self.console.pk, 3)
+        self.client.force_authenticate(user=self.admin)
+        
+        response = self.client.patch(f'/api/products/{self.console.pk}/', {'in_stock_quantity': 7}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['product']['in_stock_quantity'], 7)
+        self.assertEqual(self.shard_quantities(self.console), [3, 2, 2])
+        
+        response = self.client.post(
+            '/api/products/bulk/', [{'op': 'adjust_stock', 'id': self.console.pk, 'delta': 1}], format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(sum(self.shard_quantities(self.console)), 7)
+    
+    def test_sync_sharded_stock(self):
+        """Test the periodic sync copies shard sums into in_stock_quantity"""
+        shard_stock(self.console.pk, 2)
+        take_stock(self.console.pk, 4, 2)
+        
+        self.assertEqual(sync_sharded_stock(), 1)
+        
+        self.console.refresh_from_db()
+        self.assertEqual(self.console.in_stock_quantity, 6)
+
+
+class SparseFieldsetTest(TestCase):
+    """Test ?fields= and ?expand= shape responses and the columns selected"""
+    
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Consoles', description='Game consoles')
+        self.console = Product.objects.create(
+            name='Console', description='A console', price=300, category=self.category, in_stock_quantity=10
+        )
+        self.controller = Product.objects.create(
+            name='Controller', description='A controller', price=50, category=self.category, in_stock_quantity=0
+        )
+        self.client = APIClient()
+    
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, ' '.join(query['sql'] for query in queries.captured_queries)
+    
+    def test_list_fields(self):
+        """Test the list renders and selects only the requested columns"""
+        response, sql = self.get('/api/products/?fields=id,name,in_stock')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0], {'id': self.controller.id, 'name': 'Controller', 'in_stock': False})
+        self.assertNotIn('description', sql)
+        self.assertNotIn('products_category', sql)
+    
+    def test_list_expand_category(self):
+        """Test ?expand=category nests the category with one extra query"""
+        # COUNT + page + categories
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/products/?expand=category')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        category = response.data['results'][0]['category']
+        self.assertEqual(category['name'], 'Consoles')
+        self.assertEqual(category['product_count'], 2)
+        self.assertIn('description', category)
+    
+    def test_detail_nested_fields(self):
+        """Test a dotted name cuts down the nested category and skips its count"""
+        response, sql = self.get(f'/api/products/{self.console.id}/?fields=id,price,category.name')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'id': self.console.id, 'price': '300.00', 'category': {'name': 'Consoles'}})
+        self.assertNotIn('description', sql)
+        self.assertNotIn('COUNT', sql)
+    
+    def test_detail_sharded_stock(self):
+        """Test a sharded product still reports the sum of its shards"""
+        shard_stock(self.console.pk, 4)
+        
+        response = self.client.get(f'/api/products/{self.console.id}/?fields=in_stock_quantity,in_stock')
+        
+        self.assertEqual(response.data, {'in_stock_quantity': 10, 'in_stock': True})
+    
+    def test_category_fields(self):
+        """Test categories skip the product count unless it is requested"""
+        response, sql = self.get('/api/categories/?fields=id,name')
+        
+        self.assertEqual(response.data['results'], [{'id': self.category.id, 'name': 'Consoles'}])
+        self.assertNotIn('products_product', sql)
+    
+    def test_unknown_names_rejected(self):
+        """Test unknown fields and expansions are a 400 before any query"""
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/products/?fields=id,secret')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'fields': ['Unknown field secret.']})
+        
+        response = self.client.get(f'/api/products/{self.console.id}/?fields=category.secret')
+        self.assertEqual(response.data, {'fields': ['Unknown field category.secret.']})
+        
+        response = self.client.get('/api/products/?expand=price')
+        self.assertEqual(response.data, {'expand': ['Cannot expand price.']})
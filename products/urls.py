@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import CategoryViewSet, ProductViewSet
@@ -7,6 +8,18 @@ router = DefaultRouter()
 router.register(r'categories', CategoryViewSet, basename='category')
 router.register(r'products', ProductViewSet, basename='product')
 
-urlpatterns = [
+urlpatterns = []
+
+if settings.ASYNC_CATALOGUE_VIEWS:
+    # Async reads take precedence over the router's routes for the same paths
+    from .async_views import CategoryListAsyncView, ProductDetailAsyncView, ProductListAsyncView
+
+    urlpatterns += [
+        path('categories/', CategoryListAsyncView.as_view(), name='category-list'),
+        path('products/', ProductListAsyncView.as_view(), name='product-list'),
+        path('products/<int:pk>/', ProductDetailAsyncView.as_view(), name='product-detail'),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
 ]
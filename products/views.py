@@ -2,27 +2,45 @@ from django.shortcuts import render
 
 # Create your views here.
 
-from rest_framework import viewsets, filters, status
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser
 from rest_framework.response import Response
+from django.db.models import Prefetch
 from django_filters.rest_framework import DjangoFilterBackend
+from shopsphere_project.fieldsets import SparseFieldsetMixin, nested_serializer, selected_columns
+from shopsphere_project.pagination import OptInCursorPagination
+from shopsphere_project.routers import ReplicaReadMixin
+from .cache import CatalogueCacheMixin
+from .search import ProductOrderingFilter, ProductSearchFilter
 from .models import Category, Product
 from .serializers import (
     CategorySerializer, 
     ProductListSerializer, 
-    ProductDetailSerializer
+    ProductDetailSerializer,
+    ProductBulkSerializer
 )
 
 
-class CategoryViewSet(viewsets.ModelViewSet):
+class CategoryViewSet(SparseFieldsetMixin, ReplicaReadMixin, viewsets.ModelViewSet):
     """
     ViewSet for Category CRUD operations
     List, Create, Retrieve, Update, Delete categories
+    Reads are served from a replica when one is configured
+    Reads take ?fields= to return fewer fields
     """
-    queryset = Category.objects.all()
+    queryset = Category.objects.order_by('name')
     serializer_class = CategorySerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     
+    def get_queryset(self):
+        """Count products only when the response includes the count"""
+        queryset = super().get_queryset()
+        if 'product_count' in self.fieldset_serializer.fields:
+            return queryset.with_product_count()
+        return queryset
+    
     def get_permissions(self):
         """Only admins can create/update/delete"""
         if self.action in ['create', 'update', 'partial_update', 'destroy']:
@@ -30,17 +48,44 @@ class CategoryViewSet(viewsets.ModelViewSet):
         return [IsAuthenticatedOrReadOnly()]
 
 
-class ProductViewSet(viewsets.ModelViewSet):
+class ProductViewSet(SparseFieldsetMixin, ReplicaReadMixin, CatalogueCacheMixin, viewsets.ModelViewSet):
     """
     ViewSet for Product CRUD operations with search and filtering
+    List and retrieve responses are cached per catalogue version
+    Reads are served from a replica when one is configured
+    Reads take ?fields= and ?expand=category to shape the response
     """
     queryset = Product.objects.select_related('category').all()
     permission_classes = [IsAuthenticatedOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['category', 'in_stock_quantity']
-    search_fields = ['name', 'description']
+    pagination_class = OptInCursorPagination  # ?pagination=cursor for keyset paging
+    filter_backends = [DjangoFilterBackend, ProductSearchFilter, ProductOrderingFilter]
+    filterset_fields = {
+        'category': ['exact'],
+        'in_stock_quantity': ['exact', 'gt', 'gte'],  # ?in_stock_quantity__gt=0 for in-stock only
+    }
+    search_fields = ['name', 'description']  # LIKE fallback without full-text search
     ordering_fields = ['price', 'date_created', 'name']
     ordering = ['-date_created']
+    bulk_max_rows = 1000
+    fieldset_columns = ('updated_at',)  # Last-Modified of cached responses
+    
+    def get_queryset(self):
+        """Fetch a nested category with just the columns, and count, it renders"""
+        queryset = super().get_queryset()
+        serializer = self.fieldset_serializer
+        category = nested_serializer(serializer.fields.get('category'))
+        if category is None:
+            return queryset
+        
+        categories = Category.objects.all()
+        columns = selected_columns(category)
+        if columns is not None:
+            if 'category_name' in serializer.fields:
+                columns.add('name')
+            categories = categories.only(*columns)
+        if 'product_count' in category.fields:
+            categories = categories.with_product_count()
+        return queryset.select_related(None).prefetch_related(Prefetch('category', queryset=categories))
     
     def get_serializer_class(self):
         """Use different serializers for list vs detail"""
@@ -50,7 +95,7 @@ class ProductViewSet(viewsets.ModelViewSet):
     
     def get_permissions(self):
         """Only admins can create/update/delete products"""
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk']:
             return [IsAdminUser()]
         return [IsAuthenticatedOrReadOnly()]
     
@@ -86,4 +131,25 @@ class ProductViewSet(viewsets.ModelViewSet):
         
         return Response({
             'message': f'Product "{product_name}" deleted successfully'
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+        }, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Apply a list of creates, updates and stock deltas in one transaction
+        Responds with one status per row; nothing is applied if any row fails
+        """
+        serializer = ProductBulkSerializer(data=request.data, many=True, max_length=self.bulk_max_rows)
+        try:
+            serializer.is_valid(raise_exception=True)
+            results = serializer.save()
+        except ValidationError as exc:
+            if not isinstance(exc.detail, list) or len(exc.detail) != len(request.data):
+                return Response(exc.detail, status=status.HTTP_400_BAD_REQUEST)
+            results = [
+                {'status': 'rejected', 'errors': errors} if errors else {'status': 'skipped'}
+                for errors in exc.detail
+            ]
+            return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({'results': results})
@@ -0,0 +1,180 @@
+"""
+``?fields=`` / ``?expand=`` response shaping for API reads.
+
+``?fields=id,name,category.name`` keeps only the named fields; a dotted name
+cuts a nested serializer down the same way. ``?expand=category`` adds the
+related objects a serializer offers in ``Meta.expandable_fields``, which are
+left out otherwise; ``?expand=items.product`` expands inside a nested field.
+
+The viewset loads only the columns the remaining fields read with
+``.only()``, so an unrequested column is neither selected nor serialized.
+Serializer fields that don't map to a model field of the same name list
+their columns in ``Meta.field_columns``.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.functional import cached_property
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_fieldset(value):
+    """Turn ``'id,category.name'`` into ``{'id': {}, 'category': {'name': {}}}``"""
+    tree = {}
+    for path in value.split(','):
+        node = tree
+        for name in filter(None, (name.strip() for name in path.split('.'))):
+            node = node.setdefault(name, {})
+    return tree
+
+
+def nested_serializer(field):
+    """The serializer behind a nested field, or None for a plain field"""
+    field = getattr(field, 'child', field)
+    return field if isinstance(field, SparseFieldsMixin) else None
+
+
+def selected_columns(serializer):
+    """
+    Names to pass to ``.only()`` for the fields the serializer will render;
+    None if a field reads something that can't be worked out.
+    """
+    model = serializer.Meta.model
+    field_columns = getattr(serializer.Meta, 'field_columns', {})
+    columns = {model._meta.pk.name}
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in field_columns:
+            columns.update(field_columns[name])
+            continue
+        if field.source == '*':
+            return None
+        try:
+            model_field = model._meta.get_field(field.source_attrs[0])
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete:
+            # Reverse relations are prefetched by the view
+            continue
+        columns.add(model_field.name)
+        if len(field.source_attrs) > 1:
+            columns.add('__'.join(field.source_attrs))
+    return columns
+
+
+class SparseFieldsMixin:
+    """
+    Serializer that renders a subset of its fields, plus optional expansions.
+
+    ``fields`` and ``expand`` are trees from ``parse_fieldset``; None (the
+    default) renders every field and expands nothing.
+    """
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        self.sparse_fields = fields
+        self.expand_fields = expand or {}
+        self.fieldset_prefix = ''
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        expandable = getattr(self.Meta, 'expandable_fields', {})
+
+        for name, subtree in self.expand_fields.items():
+            if name in expandable:
+                serializer_class, kwargs = expandable[name]
+                fields[name] = serializer_class(**kwargs)
+            elif nested_serializer(fields.get(name)) is None:
+                raise serializers.ValidationError({EXPAND_PARAM: [f'Cannot expand {self.fieldset_prefix}{name}.']})
+            self._narrow(fields[name], name, None, subtree)
+
+        if self.sparse_fields is not None:
+            readable = {name for name, field in fields.items() if not field.write_only}
+            unknown = set(self.sparse_fields) - readable
+            if unknown:
+                raise serializers.ValidationError({FIELDS_PARAM: [
+                    f'Unknown field {self.fieldset_prefix}{name}.' for name in sorted(unknown)
+                ]})
+            for name in readable - set(self.sparse_fields) - set(self.expand_fields):
+                del fields[name]
+            for name, subtree in self.sparse_fields.items():
+                if subtree:
+                    self._narrow(fields[name], name, subtree, None)
+        return fields
+
+    def _narrow(self, field, name, fields, expand):
+        """Hand a subtree of ``?fields=`` or ``?expand=`` to a nested serializer"""
+        serializer = nested_serializer(field)
+        if serializer is None:
+            param = FIELDS_PARAM if fields is not None else EXPAND_PARAM
+            raise serializers.ValidationError({param: [f'{self.fieldset_prefix}{name} has no subfields.']})
+        serializer.fieldset_prefix = f'{self.fieldset_prefix}{name}.'
+        if fields is not None:
+            serializer.sparse_fields = fields
+        if expand:
+            serializer.expand_fields = expand
+
+
+class SparseFieldsetMixin:
+    """
+    Viewset side of ``?fields=`` / ``?expand=``: shape the serializer of
+    every read and load only the columns it renders.
+
+    ``fieldset_columns`` names columns the view itself needs on every row
+    (e.g. ``updated_at`` for Last-Modified).
+    """
+    fieldset_columns = ()
+
+    @cached_property
+    def fieldset(self):
+        """Parsed ``(fields, expand)`` of a read; ``(None, None)`` otherwise"""
+        if self.request.method not in SAFE_METHODS:
+            return None, None
+        params = self.request.query_params
+        fields = parse_fieldset(params.get(FIELDS_PARAM, '')) or None
+        expand = parse_fieldset(params.get(EXPAND_PARAM, '')) or None
+        return fields, expand
+
+    @cached_property
+    def fieldset_serializer(self):
+        """An unbound serializer shaped for this request, to see which fields it renders"""
+        return self.get_serializer()
+
+    def get_serializer(self, *args, **kwargs):
+        fields, expand = self.fieldset
+        if fields is not None or expand is not None:
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('expand', expand)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields, expand = self.fieldset
+        if fields is None and expand is None:
+            return queryset
+        # Building the fields rejects unknown names before anything is queried
+        columns = selected_columns(self.fieldset_serializer)
+        if fields is None or columns is None:
+            return queryset
+
+        # Pagination reads the sort key back off the rows
+        model = queryset.model
+        for name in queryset.query.order_by or model._meta.ordering:
+            if isinstance(name, str):
+                try:
+                    columns.add(model._meta.get_field(name.lstrip('-')).name)
+                except FieldDoesNotExist:
+                    pass
+        columns.update(self.fieldset_columns)
+
+        related = queryset.query.select_related
+        if isinstance(related, dict):
+            # A deferred foreign key can't be followed with select_related
+            kept = [name for name in related if name in columns]
+            queryset = queryset.select_related(None)
+            if kept:
+                queryset = queryset.select_related(*kept)
+        return queryset.only(*columns)
@@ -0,0 +1,253 @@
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from rest_framework import serializers
+
+logger = logging.getLogger('shopsphere.perf')
+
+# Metrics of the request being handled; sync_to_async carries it into threads
+_current = ContextVar('request_metrics', default=None)
+
+# Histogram bucket upper bounds: milliseconds for timings, counts for queries
+TIME_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# Statements kept per request for the slow-request log
+MAX_CAPTURED_QUERIES = 100
+
+
+class Histogram:
+    """Cumulative bucket counts plus sum and count, as Prometheus expects"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            total += count
+            yield bound, total
+
+
+class MetricsRegistry:
+    """
+    In-process histograms per metric and resolved URL name.
+
+    Each server process keeps its own; scrape every worker or aggregate in
+    the monitoring system.
+    """
+    METRICS = {
+        'request_duration_ms': ('Total request latency', TIME_BUCKETS),
+        'db_duration_ms': ('Time spent in database queries', TIME_BUCKETS),
+        'serialize_duration_ms': ('Time spent building serializer data', TIME_BUCKETS),
+        'db_queries': ('Database queries per request', QUERY_BUCKETS),
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+
+    def observe(self, route, values):
+        with self.lock:
+            for metric, value in values.items():
+                key = (metric, route)
+                if key not in self.histograms:
+                    self.histograms[key] = Histogram(self.METRICS[metric][1])
+                self.histograms[key].observe(value)
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+
+    def render(self):
+        """Prometheus text exposition of every histogram"""
+        with self.lock:
+            lines = []
+            for metric, (description, _) in self.METRICS.items():
+                name = f'shopsphere_{metric}'
+                lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+                for (key, route), histogram in sorted(self.histograms.items()):
+                    if key != metric:
+                        continue
+                    for bound, total in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{route="{route}",le="{bound}"}} {total}')
+                    lines.append(f'{name}_sum{{route="{route}"}} {round(histogram.sum, 3)}')
+                    lines.append(f'{name}_count{{route="{route}"}} {histogram.count}')
+            return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetrics:
+    """Counters for one request, fed by the DB wrapper and serializer timing"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serialize_time = 0.0
+        self.serializing = False
+        self.statements = []
+
+    def __call__(self, execute, sql, params, many, context):
+        """``connection.execute_wrapper`` hook timing every query"""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.queries += 1
+            self.db_time += elapsed
+            if len(self.statements) < MAX_CAPTURED_QUERIES:
+                self.statements.append((sql, elapsed))
+
+    @contextmanager
+    def capture_queries(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield
+
+    def summary(self):
+        return {
+            'queries': self.queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'serialize_ms': round(self.serialize_time * 1000, 2),
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 2),
+        }
+
+
+def _timed_data(data_property):
+    """Wrap a serializer ``data`` property to add its time to the request"""
+
+    def data(self):
+        metrics = _current.get()
+        if metrics is None or metrics.serializing:
+            return data_property.fget(self)
+        # Only the outermost serializer counts; nested ones run inside it
+        metrics.serializing = True
+        started = time.perf_counter()
+        try:
+            return data_property.fget(self)
+        finally:
+            metrics.serialize_time += time.perf_counter() - started
+            metrics.serializing = False
+
+    data._perf_timed = True
+    return property(data)
+
+
+def install_serializer_timing():
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        if not getattr(cls.data.fget, '_perf_timed', False):
+            cls.data = _timed_data(cls.data)
+
+
+class PerformanceMiddleware:
+    """
+    Measure each request: query count, DB time, serializer time and latency.
+
+    Results go to a ``Server-Timing`` header, a structured ``shopsphere.perf``
+    log line and the in-process histograms behind ``/metrics``. Requests over
+    ``PERF_SLOW_REQUEST_MS`` are logged with the SQL they ran.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_serializer_timing()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with metrics.capture_queries():
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        try:
+            with metrics.capture_queries():
+                response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def finish(self, request, response, metrics):
+        summary = metrics.summary()
+        match = getattr(request, 'resolver_match', None)
+        route = (match.view_name if match else None) or 'unresolved'
+
+        registry.observe(route, {
+            'request_duration_ms': summary['total_ms'],
+            'db_duration_ms': summary['db_ms'],
+            'serialize_duration_ms': summary['serialize_ms'],
+            'db_queries': summary['queries'],
+        })
+
+        if settings.PERF_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={summary["db_ms"]};desc="{summary["queries"]} queries", '
+                f'serialize;dur={summary["serialize_ms"]}, '
+                f'total;dur={summary["total_ms"]}'
+            )
+
+        record = {
+            'route': route,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            **summary,
+        }
+        logger.info('request %s', json.dumps(record), extra={'perf': record})
+
+        if summary['total_ms'] >= settings.PERF_SLOW_REQUEST_MS:
+            slow = {
+                **record,
+                'sql': [
+                    {'sql': sql, 'ms': round(elapsed * 1000, 2)}
+                    for sql, elapsed in metrics.statements
+                ],
+            }
+            logger.warning('slow request %s', json.dumps(slow), extra={'perf': slow})
+        return response
+
+
+def metrics_view(request):
+    """Expose the histograms to staff users or a scraper holding PERF_METRICS_TOKEN"""
+    token = settings.PERF_METRICS_TOKEN
+    header = request.headers.get('Authorization', '')
+    authorized = (token and constant_time_compare(header, f'Bearer {token}')) or (
+        request.user.is_authenticated and request.user.is_staff
+    )
+    if not authorized:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4')
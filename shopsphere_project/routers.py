@@ -0,0 +1,71 @@
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.permissions import SAFE_METHODS
+
+# Replica state of the request being handled; None outside replica-enabled views
+_state = ContextVar('replica_state', default=None)
+
+
+class ReplicaState:
+    """Which replica a request reads from, and whether it has been pinned to the primary"""
+
+    def __init__(self):
+        self.alias = None
+        self.pinned = False
+
+
+class ReplicaRouter:
+    """
+    Send reads to a replica while a ``ReplicaReadMixin`` view serves a safe
+    request; everything else uses the primary.
+
+    A request sticks to one replica. Once it writes (``select_for_update``
+    counts as a write) its reads go back to the primary so it always sees its
+    own changes. Commands, tasks and other views never touch a replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.alias is None or state.pinned:
+            return None
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+
+def read_from_primary():
+    """Send the current request's remaining reads to the primary"""
+    state = _state.get()
+    if state is not None:
+        state.pinned = True
+
+
+class ReplicaReadMixin:
+    """
+    Serve GET/HEAD/OPTIONS from a read replica when ``DATABASE_REPLICAS``
+    lists any. Authentication and permission checks run before the switch,
+    so they read users from the primary.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _state.set(ReplicaState())
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _state.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and settings.DATABASE_REPLICAS:
+            _state.get().alias = random.choice(settings.DATABASE_REPLICAS)
@@ -15,6 +15,9 @@ from datetime import timedelta
 from decouple import config
 import os
 import dj_database_url
+from corsheaders.defaults import default_headers
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -35,6 +38,9 @@ DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
 ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',')
 
+# Serve catalogue reads from async views (enabled by default under ASGI)
+ASYNC_CATALOGUE_VIEWS = os.getenv('ASYNC_CATALOGUE_VIEWS', 'False') == 'True'
+
 
 # Application definition
 
@@ -48,17 +54,20 @@ INSTALLED_APPS = [
     
     'rest_framework',
     'rest_framework.authtoken',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     
     'users',
     'products',
     'orders',
+    'analytics',
     
     'drf_yasg',
     
 ]
 
 MIDDLEWARE = [
+    'shopsphere_project.metrics.PerformanceMiddleware',  # First, so it times everything below
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Added for static file serving in production
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -94,10 +103,39 @@ WSGI_APPLICATION = 'shopsphere_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# Seconds a connection is kept open between requests (0 closes it after each)
+DB_CONN_MAX_AGE = int(os.getenv('DB_CONN_MAX_AGE', 60))
+
+# psycopg 3 connection pool size per process; 0 keeps persistent connections
+# instead. Needs `pip install "psycopg[pool]"` on PostgreSQL.
+DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 2))
+DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 0))
+
+
+def database_config(url):
+    """Settings for one database URL with persistent or pooled connections"""
+    if DB_POOL_MAX_SIZE:
+        try:
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            raise ImproperlyConfigured(
+                'DB_POOL_MAX_SIZE needs psycopg 3 and its pool: pip install "psycopg[pool]"'
+            )
+        # The pool checks connections itself and replaces persistent ones
+        config = dj_database_url.parse(url, conn_max_age=0)
+        config.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': DB_POOL_MIN_SIZE,
+            'max_size': DB_POOL_MAX_SIZE,
+        }
+        return config
+    # Reused connections are pinged before each request's first query
+    return dj_database_url.parse(url, conn_max_age=DB_CONN_MAX_AGE, conn_health_checks=True)
+
+
 if os.getenv('DATABASE_URL'):
     # Production database (PostgreSQL on Heroku)
     DATABASES = {
-        'default': dj_database_url.parse(os.getenv('DATABASE_URL'))
+        'default': database_config(os.getenv('DATABASE_URL'))
     }
 else:
     # Development database (SQLite)
@@ -108,9 +146,155 @@ else:
         }
     }
 
+# Read replicas (comma-separated URLs) serve catalogue GETs; see
+# shopsphere_project.routers. Tests run them as mirrors of the primary.
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, os.getenv('DATABASE_REPLICA_URLS', '').split(','))):
+    alias = f'replica_{index + 1}'
+    DATABASES[alias] = {**database_config(url.strip()), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['shopsphere_project.routers.ReplicaRouter']
+
+# Cache
+# Redis in production, local memory for development and tests
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a cached product list/detail response is kept
+CATALOGUE_CACHE_TIMEOUT = int(os.getenv('CATALOGUE_CACHE_TIMEOUT', 300))
+
+# Seconds an authenticated user (with profile) is cached for JWT requests
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', 60))
+
+# Celery
+# Without a broker, tasks run inline so development needs no worker
+
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', os.getenv('REDIS_URL', ''))
+CELERY_TASK_ALWAYS_EAGER = not CELERY_BROKER_URL
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_BEAT_SCHEDULE = {
+    # Relay outbox events whose after-commit trigger was lost
+    'relay-outbox': {
+        'task': 'orders.tasks.relay_outbox',
+        'schedule': 30.0,
+    },
+    'purge-outbox': {
+        'task': 'orders.tasks.purge_outbox',
+        'schedule': timedelta(days=1),
+    },
+    'refresh-sales-rollups': {
+        'task': 'analytics.tasks.refresh_sales_rollups',
+        'schedule': timedelta(minutes=5),
+    },
+    'sweep-stock-holds': {
+        'task': 'orders.tasks.sweep_stock_holds',
+        'schedule': 60.0,
+    },
+    'flush-expired-tokens': {
+        'task': 'users.tasks.flush_expired_tokens',
+        'schedule': timedelta(days=1),
+    },
+    'purge-idempotency-records': {
+        'task': 'users.tasks.purge_idempotency_records',
+        'schedule': timedelta(hours=1),
+    },
+    # Copy sharded products' stock totals into in_stock_quantity
+    'sync-sharded-stock': {
+        'task': 'products.tasks.sync_sharded_stock',
+        'schedule': 60.0,
+    },
+}
+
+# Seconds of Order.updated_at the rollup builder re-reads behind its
+# watermark, so orders from transactions that committed late are not missed
+SALES_ROLLUP_LAG = int(os.getenv('SALES_ROLLUP_LAG', 300))
+
+# Admin change lists over tables at least this large (by pg_class estimate)
+# show an estimated total instead of running COUNT(*)
+ADMIN_ESTIMATED_COUNT_THRESHOLD = int(os.getenv('ADMIN_ESTIMATED_COUNT_THRESHOLD', 100000))
+
+# Seconds a cart reservation holds its stock before it lapses
+CART_HOLD_TTL = int(os.getenv('CART_HOLD_TTL', 900))
+
+# Seconds a create response is replayed to retries with the same Idempotency-Key
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 86400))
+
+# Seconds a sharded product's summed stock is cached for catalogue reads
+STOCK_SHARD_CACHE_TIMEOUT = int(os.getenv('STOCK_SHARD_CACHE_TIMEOUT', 5))
+
+# Products at or below this stock level trigger an alert after an order
+LOW_STOCK_THRESHOLD = int(os.getenv('LOW_STOCK_THRESHOLD', 5))
+
+# Request instrumentation (shopsphere_project.metrics)
+PERF_SERVER_TIMING = os.getenv('PERF_SERVER_TIMING', 'True') == 'True'
+PERF_SLOW_REQUEST_MS = int(os.getenv('PERF_SLOW_REQUEST_MS', 500))
+# Bearer token a metrics scraper sends to /metrics; staff sessions work without it
+PERF_METRICS_TOKEN = os.getenv('PERF_METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'shopsphere.perf': {
+            'handlers': ['console'],
+            'level': os.getenv('PERF_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
+# Password logins load the profile in the same query (see users.authentication);
+# ModelBackend stays listed so sessions saved with its path remain valid
+AUTHENTICATION_BACKENDS = [
+    'users.authentication.ProfileModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# PBKDF2 iterations for password hashes; 0 keeps Django's default. Each
+# user's hash is rehashed to the current count on their next successful
+# login, so a count below the default (a faster, weaker tier) is refused
+# unless PASSWORD_HASH_FAST_TIER acknowledges it
+PASSWORD_HASH_ITERATIONS = int(os.getenv('PASSWORD_HASH_ITERATIONS', 0))
+PASSWORD_HASH_FAST_TIER = os.getenv('PASSWORD_HASH_FAST_TIER', 'False') == 'True'
+if 0 < PASSWORD_HASH_ITERATIONS < PBKDF2PasswordHasher.iterations and not PASSWORD_HASH_FAST_TIER:
+    raise ImproperlyConfigured(
+        f'PASSWORD_HASH_ITERATIONS below {PBKDF2PasswordHasher.iterations} weakens every password hash; '
+        'set PASSWORD_HASH_FAST_TIER=True to accept that'
+    )
+PASSWORD_HASHERS = [
+    'users.hashers.TunablePBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+
+# Login attempts allowed per client IP, and failed logins per username, as
+# DRF rates ("30/min"); an empty value turns that throttle off
+LOGIN_RATE_PER_IP = os.getenv('LOGIN_RATE_PER_IP', '30/min') or None
+LOGIN_RATE_PER_USERNAME = os.getenv('LOGIN_RATE_PER_USERNAME', '10/hour') or None
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -142,6 +326,14 @@ USE_TZ = True
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Thumbnail widths rendered for each product image variant, in every format
+PRODUCT_IMAGE_VARIANTS = {
+    'list': [160, 320],
+    'detail': [640, 1280],
+}
+PRODUCT_IMAGE_FORMATS = ['webp', 'jpeg']
+PRODUCT_IMAGE_QUALITY = 80
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/4.2/howto/static-files/
 
@@ -156,13 +348,17 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10
+    'PAGE_SIZE': 10,
+    # Proxies in front of the app that append to X-Forwarded-For (1 behind the
+    # Heroku router). Throttles key on the address the nearest proxy saw; with
+    # 0 they use REMOTE_ADDR and ignore the client-controlled header.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
 }
 
 SIMPLE_JWT = {
@@ -170,6 +366,10 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
+    'TOKEN_REFRESH_SERIALIZER': 'users.tokens.RotatingTokenRefreshSerializer',
 }
 
-CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True
+# Browsers may send Idempotency-Key on order and registration POSTs
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed']
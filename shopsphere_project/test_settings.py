@@ -5,8 +5,27 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': ':memory:',
-    }
+        # Take the write lock up front and wait for it, like row locks on Postgres
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # File-backed so concurrency tests get real locking across threads
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    },
+    # A separate database standing in for a lagging read replica; routing
+    # tests enable it with override_settings(DATABASE_REPLICAS=['replica'])
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+        'TEST': {
+            'NAME': BASE_DIR / 'test_replica.sqlite3',
+        },
+    },
 }
+DATABASE_REPLICAS = []
 
 # Disable debugging
 DEBUG = False
@@ -14,4 +33,17 @@ DEBUG = False
 # Use fast password hasher for testing
 PASSWORD_HASHERS = [
     'django.contrib.auth.hashers.MD5PasswordHasher',
-]
\ No newline at end of file
+]
+
+# Throttle tests switch login throttling on with override_settings
+LOGIN_RATE_PER_IP = None
+LOGIN_RATE_PER_USERNAME = None
+
+# Run background jobs inline on an in-memory broker
+CELERY_BROKER_URL = 'memory://'
+CELERY_TASK_ALWAYS_EAGER = True
+
+# Keep per-request perf log lines out of the test output
+LOGGING['loggers']['shopsphere.perf']['level'] = 'ERROR'
+# and the low-stock warnings nearly every test order triggers
+LOGGING['loggers']['orders.tasks'] = {'level': 'ERROR'}
@@ -0,0 +1,139 @@
+import re
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+# Literals that differ between otherwise identical statements
+SQL_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(\.\d+)?\b'), '?'),
+    (re.compile(r'\bIN \((\?, )*\?\)'), 'IN (...)'),
+]
+
+
+class QueryPlanTestMixin:
+    """
+    Assertions that every SELECT a block of code runs is served by an index.
+
+    Queries are captured as they execute, then re-run under EXPLAIN. A plan
+    fails if it scans a whole table without an index or sorts into a
+    temporary structure instead of reading an index in order.
+    """
+
+    def explain(self, sql, params):
+        """Return the plan of one query as a list of lines"""
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Tiny test tables always favour seq scans; make them a last resort
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+                cursor.execute(f'EXPLAIN {sql}', params)
+                return [row[0] for row in cursor.fetchall()]
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def plan_problems(self, plan):
+        """Return the plan lines that show a full scan or a temporary sort"""
+        if connection.vendor == 'postgresql':
+            patterns = [r'Seq Scan on', r'^\s*(->\s*)?Sort\b']
+        else:
+            patterns = [r'^SCAN \w+$', r'USE TEMP B-TREE']
+        return [line for line in plan if any(re.search(p, line) for p in patterns)]
+
+    @contextmanager
+    def assertQueriesUseIndexes(self, tables=None):
+        """
+        Fail if a SELECT run inside the block needs a full scan or temp sort.
+
+        ``tables`` limits the check to queries that read those tables. The
+        context value collects ``(sql, plan)`` pairs for further assertions.
+        """
+        captured = []
+        plans = []
+
+        def capture(execute, sql, params, many, context):
+            if sql.lstrip().upper().startswith('SELECT'):
+                captured.append((sql, params))
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(capture):
+            yield plans
+
+        failures = []
+        for sql, params in captured:
+            if tables and not any(table in sql for table in tables):
+                continue
+            plan = self.explain(sql, params)
+            plans.append((sql, plan))
+            problems = self.plan_problems(plan)
+            if problems:
+                failures.append(f'{sql}\n    ' + '\n    '.join(problems))
+        if failures:
+            self.fail('Queries not served by an index:\n' + '\n\n'.join(failures))
+
+
+def normalize_sql(sql):
+    """Replace literals so repeats of one statement with new values compare equal"""
+    for pattern, replacement in SQL_LITERALS:
+        sql = pattern.sub(replacement, sql)
+    return sql
+
+
+def duplicated_queries(queries):
+    """``(count, sql)`` for every normalized statement run more than once"""
+    counts = Counter(normalize_sql(query['sql']) for query in queries)
+    return [(count, sql) for sql, count in counts.most_common() if count > 1]
+
+
+class QueryBudgetTestMixin:
+    """
+    Assertions that an endpoint's query count is capped and independent of
+    how many rows it handles.
+
+    Failures list the statements that ran more than once, with literals
+    normalized, which is how an N+1 shows up.
+    """
+    budget_sizes = (1, 50)
+
+    def query_report(self, queries):
+        duplicates = duplicated_queries(queries)
+        if not duplicates:
+            return 'No repeated statements.'
+        return 'Repeated statements:\n' + '\n'.join(f'  {count}x {sql}' for count, sql in duplicates)
+
+    def assertQueryBudget(self, prepare, budget, sizes=None):
+        """
+        Fail if the request exceeds ``budget`` queries or runs more queries
+        for more rows.
+
+        ``prepare(rows)`` creates the data for one size and returns a callable
+        that makes the request and returns the response; only that call is
+        counted. Each size runs in a savepoint that is rolled back afterwards.
+        """
+        counts = {}
+        for rows in sizes or self.budget_sizes:
+            with transaction.atomic():
+                request = prepare(rows)
+                with CaptureQueriesContext(connection) as context:
+                    response = request()
+                transaction.set_rollback(True)
+            self.assertLess(
+                response.status_code, 400,
+                f'{rows} rows: HTTP {response.status_code} {getattr(response, "data", "")}'
+            )
+            queries = context.captured_queries
+            counts[rows] = len(queries)
+            if len(queries) > budget:
+                self.fail(
+                    f'{len(queries)} queries for {rows} rows exceeds the budget of {budget}.\n'
+                    + self.query_report(queries)
+                )
+            smallest = min(counts)
+            if counts[rows] > counts[smallest]:
+                self.fail(
+                    f'Query count grows with rows: {counts[smallest]} for {smallest}, '
+                    f'{counts[rows]} for {rows}.\n' + self.query_report(queries)
+                )
+        return counts
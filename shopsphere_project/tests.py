@@ -0,0 +1,576 @@
+import json
+import re
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import AsyncClient, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLResolver, get_resolver
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from orders.models import Order, OrderItem
+from orders.stock import reserve
+from products.models import Category, Product
+from .metrics import registry
+from . import routers
+from .pagination import EstimatedCountPaginator, estimated_count
+from .routers import ReplicaRouter
+from .testing import QueryBudgetTestMixin
+
+
+class PerformanceMiddlewareTest(TestCase):
+    """Test per-request timing headers, logs and histograms"""
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        category = Category.objects.create(name='Books')
+        for i in range(3):
+            Product.objects.create(name=f'Book {i}', description='A book', price=10, category=category)
+        self.client = APIClient()
+
+    def timings(self, response):
+        return {
+            name: float(duration)
+            for name, duration in re.findall(r'(\w+);dur=([\d.]+)', response['Server-Timing'])
+        }
+
+    def test_server_timing_header(self):
+        """Test DB, serializer and total time are reported with the query count"""
+        response = self.client.get('/api/products/')
+
+        timings = self.timings(response)
+        self.assertEqual(set(timings), {'db', 'serialize', 'total'})
+        self.assertGreater(timings['serialize'], 0)
+        self.assertGreaterEqual(timings['total'], timings['db'] + timings['serialize'])
+        # COUNT + page
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+    @override_settings(PERF_SERVER_TIMING=False)
+    def test_server_timing_can_be_disabled(self):
+        response = self.client.get('/api/products/')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_structured_log_and_slow_request_sql(self):
+        """Test every request logs a JSON record and slow ones include their SQL"""
+        with self.assertLogs('shopsphere.perf', 'INFO') as logs:
+            with override_settings(PERF_SLOW_REQUEST_MS=0):
+                self.client.get('/api/categories/')
+
+        info, slow = logs.records
+        self.assertEqual(info.perf['route'], 'category-list')
+        self.assertEqual(info.perf['status'], 200)
+        self.assertEqual(json.loads(info.getMessage().split(' ', 1)[1]), info.perf)
+        self.assertEqual(slow.levelname, 'WARNING')
+        self.assertTrue(any('products_category' in q['sql'] for q in slow.perf['sql']))
+
+    def test_metrics_endpoint(self):
+        """Test histograms per URL name, visible to staff and token holders only"""
+        self.client.get('/api/products/')
+        self.client.get('/api/products/')
+
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+        staff = User.objects.create_user(username='ops', password='opspass123', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE shopsphere_request_duration_ms histogram', body)
+        self.assertIn('shopsphere_request_duration_ms_count{route="product-list"} 2', body)
+        self.assertIn('shopsphere_db_queries_bucket{route="product-list",le="2"} 2', body)
+
+        with override_settings(PERF_METRICS_TOKEN='scrape-me'):
+            response = APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer scrape-me')
+        self.assertEqual(response.status_code, 200)
+
+    async def test_async_requests(self):
+        """Test the async middleware path counts queries run in worker threads"""
+        response = await AsyncClient().get('/api/products/')
+
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+
+
+class BenchmarkSmokeTest(TestCase):
+    """Test the benchmark data generator and scenarios run cleanly at tiny scale"""
+
+    def test_scenarios(self):
+        """Test every scenario completes without errors and reports query counts"""
+        from benchmarks.data import generate
+        from benchmarks.run import regressions, run
+        from benchmarks.scenarios import SCENARIOS, TestClientDriver
+
+        scale = generate(categories=2, products=30, users=3, orders=10)
+        self.assertEqual(Product.objects.count(), 30)
+        self.assertEqual(User.objects.filter(profile__isnull=False).count(), 3)
+
+        results = run(TestClientDriver(), scale, list(SCENARIOS), iterations=2)
+
+        self.assertEqual(set(results), set(SCENARIOS))
+        for name, result in results.items():
+            self.assertEqual(result['errors'], 0, name)
+            self.assertGreater(result['requests'], 0, name)
+            self.assertIsNotNone(result['queries_per_request'], name)
+
+        report = {'scenarios': results}
+        self.assertEqual(regressions(report, report, 0.25), [])
+        worse = {'scenarios': {'browse': {**results['browse'], 'p95_ms': results['browse']['p95_ms'] * 2 + 1}}}
+        self.assertEqual(len(regressions(worse, report, 0.25)), 1)
+
+
+class EndpointQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    """
+    Test every API endpoint stays within a fixed query budget at 1 and at 50
+    rows.
+
+    A new route fails ``test_every_endpoint_has_a_budget`` until it gets an
+    entry in ``BUDGETS`` and a ``prepare_<url name>_<method>`` method that
+    creates ``rows`` of the data it serves.
+    """
+    URLCONFS = ['products.urls', 'orders.urls', 'users.urls']
+    METHODS = ['get', 'post', 'put', 'patch', 'delete']
+
+    # Maximum queries per "<url name> <METHOD>", including JWT authentication
+    BUDGETS = {
+        'api-root GET': 0,
+        'category-list GET': 2,
+        'category-list POST': 4,
+        'category-detail GET': 1,
+        'category-detail PUT': 4,
+        'category-detail PATCH': 4,
+        'category-detail DELETE': 5,
+        'product-list GET': 2,
+        'product-list POST': 6,
+        'product-detail GET': 2,
+        'product-detail PUT': 8,
+        'product-detail PATCH': 6,
+        'product-detail DELETE': 9,
+        'product-bulk POST': 11,
+        'order-list GET': 3,
+        'order-list POST': 11,
+        'order-detail GET': 3,
+        'order-detail PUT': 8,
+        'order-detail PATCH': 8,
+        'order-detail DELETE': 5,
+        'order-export GET': 3,
+        'order-export-all GET': 3,
+        'cart-list GET': 2,
+        'cart-list POST': 12,
+        'cart-detail DELETE': 2,
+        'cart-checkout POST': 10,
+        'user-register POST': 6,
+        'user-login POST': 2,
+        'token-refresh POST': 5,
+        'user-profile GET': 1,
+        'user-profile PUT': 2,
+        'user-profile PATCH': 2,
+    }
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(username='admin', password='adminpass123', is_staff=True)
+        self.customer = User.objects.create_user(username='customer', password='custpass123')
+        self.category = Category.objects.create(name='Books')
+
+    def endpoints(self):
+        """``"<url name> <METHOD>"`` for every route in URLCONFS"""
+        found = set()
+        patterns = [pattern for urlconf in self.URLCONFS for pattern in get_resolver(urlconf).url_patterns]
+        while patterns:
+            pattern = patterns.pop()
+            if isinstance(pattern, URLResolver):
+                patterns += pattern.url_patterns
+                continue
+            # Viewsets map methods to actions; plain API views define the handlers
+            actions = getattr(pattern.callback, 'actions', None)
+            for method in self.METHODS:
+                if method in actions if actions is not None else hasattr(pattern.callback.view_class, method):
+                    found.add(f'{pattern.name} {method.upper()}')
+        return found
+
+    def request(self, method, path, data=None, user=None):
+        """A callable making one request as ``user`` with a cold auth cache"""
+        headers = {}
+        if user is not None:
+            headers['HTTP_AUTHORIZATION'] = f'Bearer {RefreshToken.for_user(user).access_token}'
+
+        def send():
+            cache.clear()
+            response = getattr(self.client, method)(path, data, format='json', **headers)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            return response
+
+        return send
+
+    def make_products(self, rows, category=None):
+        return Product.objects.bulk_create([
+            Product(name=f'Book {i}', description='A book', price=10, in_stock_quantity=100,
+                    category=category or self.category)
+            for i in range(rows)
+        ])
+
+    def make_orders(self, rows, user=None, items=1):
+        products = self.make_products(items)
+        orders = Order.objects.bulk_create([
+            Order(user=user or self.customer, total_amount=10 * items, item_count=items,
+                  line_items=[{'product': p.pk, 'quantity': 1, 'price': '10.00'} for p in products])
+            for _ in range(rows)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=10)
+            for order in orders for product in products
+        ])
+        return orders
+
+    def test_every_endpoint_has_a_budget(self):
+        """Test no route is missing from BUDGETS and no budget is stale"""
+        endpoints = self.endpoints()
+        self.assertEqual(sorted(endpoints - set(self.BUDGETS)), [], 'endpoints without a query budget')
+        self.assertEqual(sorted(set(self.BUDGETS) - endpoints), [], 'budgets for unknown endpoints')
+
+    def test_query_budgets(self):
+        """Test each endpoint's query count is within budget and flat in rows"""
+        for endpoint, budget in self.BUDGETS.items():
+            name, method = endpoint.split()
+            prepare = getattr(self, f'prepare_{name.replace("-", "_")}_{method.lower()}')
+            with self.subTest(endpoint):
+                self.assertQueryBudget(prepare, budget)
+
+    # Catalogue
+
+    def prepare_api_root_get(self, rows):
+        return self.request('get', '/api/')
+
+    def prepare_category_list_get(self, rows):
+        for i in range(rows):
+            self.make_products(2, Category.objects.create(name=f'Category {i}'))
+        return self.request('get', '/api/categories/')
+
+    def prepare_category_list_post(self, rows):
+        self.make_products(rows)
+        return self.request('post', '/api/categories/', {'name': 'Games'}, self.admin)
+
+    def prepare_category_detail_get(self, rows):
+        self.make_products(rows)
+        return self.request('get', f'/api/categories/{self.category.pk}/')
+
+    def prepare_category_detail_put(self, rows):
+        self.make_products(rows)
+        return self.request('put', f'/api/categories/{self.category.pk}/', {'name': 'Novels'}, self.admin)
+
+    def prepare_category_detail_patch(self, rows):
+        self.make_products(rows)
+        return self.request('patch', f'/api/categories/{self.category.pk}/', {'name': 'Novels'}, self.admin)
+
+    def prepare_category_detail_delete(self, rows):
+        self.make_products(rows)
+        return self.request('delete', f'/api/categories/{self.category.pk}/', user=self.admin)
+
+    def prepare_product_list_get(self, rows):
+        self.make_products(rows)
+        return self.request('get', '/api/products/')
+
+    def prepare_product_list_post(self, rows):
+        self.make_products(rows)
+        data = {'name': 'New', 'description': 'A book', 'price': '12.00',
+                'category_id': self.category.pk, 'in_stock_quantity': 5}
+        return self.request('post', '/api/products/', data, self.admin)
+
+    def prepare_product_detail_get(self, rows):
+        product = self.make_products(rows)[0]
+        return self.request('get', f'/api/products/{product.pk}/')
+
+    def prepare_product_detail_put(self, rows):
+        product = self.make_products(rows)[0]
+        data = {'name': 'Renamed', 'description': 'A book', 'price': '12.00',
+                'category_id': self.category.pk, 'in_stock_quantity': 5}
+        return self.request('put', f'/api/products/{product.pk}/', data, self.admin)
+
+    def prepare_product_detail_patch(self, rows):
+        product = self.make_products(rows)[0]
+        return self.request('patch', f'/api/products/{product.pk}/', {'price': '12.00'}, self.admin)
+
+    def prepare_product_detail_delete(self, rows):
+        product = self.make_products(rows)[0]
+        self.make_orders(rows, items=1)
+        return self.request('delete', f'/api/products/{product.pk}/', user=self.admin)
+
+    def prepare_product_bulk_post(self, rows):
+        products = self.make_products(rows)
+        data = (
+            [{'op': 'create', 'name': f'New {i}', 'description': 'A book', 'price': '9.00',
+              'category_id': self.category.pk} for i in range(rows)]
+            + [{'op': 'update', 'id': p.pk, 'price': '11.00'} for p in products]
+            + [{'op': 'adjust_stock', 'id': p.pk, 'delta': -1} for p in products]
+        )
+        return self.request('post', '/api/products/bulk/', data, self.admin)
+
+    # Orders
+
+    def prepare_order_list_get(self, rows):
+        self.make_orders(rows, items=2)
+        return self.request('get', '/api/orders/', user=self.customer)
+
+    def prepare_order_list_post(self, rows):
+        data = {'items': [{'product': p.pk, 'quantity': 1} for p in self.make_products(rows)]}
+        return self.request('post', '/api/orders/', data, self.customer)
+
+    def prepare_order_detail_get(self, rows):
+        order = self.make_orders(1, items=rows)[0]
+        return self.request('get', f'/api/orders/{order.pk}/', user=self.customer)
+
+    def prepare_order_detail_put(self, rows):
+        order = self.make_orders(1, items=rows)[0]
+        data = {'status': 'processing', 'total_amount': order.total_amount}
+        return self.request('put', f'/api/orders/{order.pk}/', data, self.customer)
+
+    def prepare_order_detail_patch(self, rows):
+        order = self.make_orders(1, items=rows)[0]
+        return self.request('patch', f'/api/orders/{order.pk}/', {'status': 'processing'}, self.customer)
+
+    def prepare_order_detail_delete(self, rows):
+        order = self.make_orders(1, items=rows)[0]
+        return self.request('delete', f'/api/orders/{order.pk}/', user=self.customer)
+
+    def prepare_order_export_get(self, rows):
+        self.make_orders(rows, items=2)
+        return self.request('get', '/api/orders/export/?output=ndjson', user=self.customer)
+
+    def prepare_order_export_all_get(self, rows):
+        self.make_orders(rows, items=2)
+        return self.request('get', '/api/orders/export/all/', user=self.admin)
+
+    def hold(self, products, user=None):
+        for product in products:
+            reserve(user or self.customer, product.pk, 1)
+
+    def prepare_cart_list_get(self, rows):
+        self.hold(self.make_products(rows))
+        return self.request('get', '/api/cart/', user=self.customer)
+
+    def prepare_cart_list_post(self, rows):
+        products = self.make_products(rows)
+        # Other carts' holds on the product are summed, not loaded
+        for i in range(rows):
+            self.hold(products[:1], User.objects.create_user(username=f'holder{i}'))
+        return self.request('post', '/api/cart/', {'product': products[0].pk, 'quantity': 1}, self.customer)
+
+    def prepare_cart_detail_delete(self, rows):
+        products = self.make_products(rows)
+        self.hold(products)
+        return self.request('delete', f'/api/cart/{products[0].pk}/', user=self.customer)
+
+    def prepare_cart_checkout_post(self, rows):
+        self.hold(self.make_products(rows))
+        return self.request('post', '/api/cart/checkout/', user=self.customer)
+
+    # Accounts
+
+    def make_users(self, rows):
+        for i in range(rows):
+            User.objects.create_user(username=f'shopper{i}', password='shoppass123')
+
+    def prepare_user_register_post(self, rows):
+        self.make_users(rows)
+        data = {'username': 'newbie', 'email': 'newbie@example.com',
+                'password': 'newbiepass123', 'password2': 'newbiepass123'}
+        return self.request('post', '/api/auth/register/', data)
+
+    def prepare_user_login_post(self, rows):
+        self.make_users(rows)
+        return self.request('post', '/api/auth/login/', {'username': 'customer', 'password': 'custpass123'})
+
+    def prepare_token_refresh_post(self, rows):
+        self.make_users(rows)
+        return self.request('post', '/api/auth/token/refresh/', {'refresh': str(RefreshToken.for_user(self.customer))})
+
+    def prepare_user_profile_get(self, rows):
+        self.make_orders(rows)
+        return self.request('get', '/api/auth/profile/', user=self.customer)
+
+    def prepare_user_profile_put(self, rows):
+        self.make_orders(rows)
+        return self.request('put', '/api/auth/profile/', {'phone_number': '555-0100', 'address': '1 Main St'}, self.customer)
+
+    def prepare_user_profile_patch(self, rows):
+        self.make_orders(rows)
+        return self.request('patch', '/api/auth/profile/', {'address': '1 Main St'}, self.customer)
+
+
+class AdminChangelistQueryBudgetTest(QueryBudgetTestMixin, TestCase):
+    """Test admin change lists run a fixed number of queries however many rows they show"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='root', password='rootpass123')
+        self.client.force_login(self.admin)
+        self.category = Category.objects.create(name='Books')
+
+    def make_order_items(self, rows):
+        products = Product.objects.bulk_create([
+            Product(name=f'Book {i}', description='A book', price=10, category=self.category)
+            for i in range(rows)
+        ])
+        users = [User.objects.create_user(username=f'shopper{i}') for i in range(min(rows, 5))]
+        orders = Order.objects.bulk_create([
+            Order(user=users[i % len(users)], total_amount=10, item_count=1) for i in range(rows)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price=10)
+            for order, product in zip(orders, products)
+        ])
+        return orders
+
+    def changelist(self, path):
+        return lambda: self.client.get(path)
+
+    def test_order_changelist(self):
+        """Test the user column is joined, not loaded per row"""
+        def prepare(rows):
+            self.make_order_items(rows)
+            return self.changelist('/admin/orders/order/')
+        # session, user, count, page joined to users
+        self.assertQueryBudget(prepare, 4)
+
+    def test_order_item_changelist(self):
+        """Test order, order user and product are joined for every row"""
+        def prepare(rows):
+            self.make_order_items(rows)
+            return self.changelist('/admin/orders/orderitem/')
+        self.assertQueryBudget(prepare, 4)
+
+    def test_product_changelist(self):
+        """Test categories are joined and the stock filter runs no query of its own"""
+        def prepare(rows):
+            self.make_order_items(rows)
+            return self.changelist('/admin/products/product/?stock=in')
+        # session, user, category filter choices, count, page joined to categories
+        self.assertQueryBudget(prepare, 5)
+
+    def test_no_full_result_count(self):
+        """Test a filtered change list does not count the whole table as well"""
+        self.make_order_items(3)
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get('/admin/orders/order/?status__exact=pending')
+
+        self.assertEqual(response.status_code, 200)
+        counts = [q['sql'] for q in context.captured_queries if 'COUNT(' in q['sql']]
+        self.assertEqual(len(counts), 1)
+        self.assertIn('WHERE', counts[0])
+
+    def test_order_user_autocomplete(self):
+        """Test the order form picks users by autocomplete instead of listing them all"""
+        order = self.make_order_items(1)[0]
+        User.objects.create_user(username='bystander')
+        response = self.client.get(f'/admin/orders/order/{order.pk}/change/')
+
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, 'bystander')
+
+    def test_estimated_count_falls_back_to_exact(self):
+        """Test small tables, filtered querysets and other databases are counted exactly"""
+        self.make_order_items(3)
+        paginator = EstimatedCountPaginator(OrderItem.objects.order_by('pk'), 100)
+
+        self.assertEqual(paginator.count, 3)
+        self.assertIsNone(estimated_count(OrderItem.objects.filter(quantity=1)))
+        self.assertEqual(EstimatedCountPaginator([1, 2], 1).count, 2)
+
+
+# Uncached, so reads reach the database; cache fills are tested separately
+@override_settings(DATABASE_REPLICAS=['replica'], CATALOGUE_CACHE_TIMEOUT=0)
+class ReplicaRoutingTest(TestCase):
+    """Test catalogue reads go to the replica and writes stay on the primary"""
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        # The replica lags: it only has the rows written to it directly
+        self.category = Category.objects.create(name='Books')
+        self.primary_product = Product.objects.create(name='Fresh', description='New', price=10, category=self.category)
+        Category.objects.using('replica').create(pk=self.category.pk, name='Books')
+        Product.objects.using('replica').create(name='Stale', description='Old', price=10, category_id=self.category.pk)
+
+    def names(self, response):
+        return [product['name'] for product in response.data['results']]
+
+    def test_safe_catalogue_requests_read_the_replica(self):
+        """Test product and category GETs are served from the replica"""
+        self.assertEqual(self.names(self.client.get('/api/products/')), ['Stale'])
+        self.assertEqual(self.client.get('/api/categories/').data['results'][0]['product_count'], 1)
+
+    @override_settings(CATALOGUE_CACHE_TIMEOUT=300)
+    def test_cache_fills_read_the_primary(self):
+        """Test a cached catalogue response is never rendered from a lagging replica"""
+        self.assertEqual(self.names(self.client.get('/api/products/')), ['Fresh'])
+        with self.assertNumQueries(0, using='replica'), self.assertNumQueries(0):
+            self.assertEqual(self.names(self.client.get('/api/products/')), ['Fresh'])
+        # Uncached reads still use the replica
+        self.assertEqual(self.client.get('/api/categories/').data['results'][0]['product_count'], 1)
+
+    def test_authentication_reads_the_primary(self):
+        """Test the requesting user is loaded from the primary before routing switches"""
+        user = User.objects.create_user(username='shopper', password='shoppass123')
+        token = RefreshToken.for_user(user).access_token
+
+        response = self.client.get('/api/products/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names(response), ['Stale'])
+
+    def test_writes_read_their_own_changes_from_the_primary(self):
+        """Test a write request and its response use the primary only"""
+        admin = User.objects.create_user(username='admin', password='adminpass123', is_staff=True)
+        self.client.force_authenticate(admin)
+
+        response = self.client.patch(f'/api/products/{self.primary_product.pk}/', {'price': '12.00'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['product']['name'], 'Fresh')
+        self.assertEqual(response.data['product']['category']['product_count'], 1)
+        self.assertFalse(Product.objects.using('replica').filter(price=12).exists())
+
+    def test_reads_after_a_write_stay_on_the_primary(self):
+        """Test a request that has written pins its later reads to the primary"""
+        router = ReplicaRouter()
+        token = routers._state.set(routers.ReplicaState())
+        try:
+            routers._state.get().alias = 'replica'
+            self.assertEqual(router.db_for_read(Product), 'replica')
+            self.assertEqual(router.db_for_write(Product), 'default')
+            self.assertIsNone(router.db_for_read(Product))
+        finally:
+            routers._state.reset(token)
+
+    def test_other_code_reads_the_primary(self):
+        """Test orders, commands and anything outside a catalogue view ignore the replica"""
+        self.assertIsNone(ReplicaRouter().db_for_read(Product))
+        self.assertEqual(Product.objects.get().name, 'Fresh')
+
+    def test_database_config(self):
+        """Test URLs get persistent, health-checked connections, or a pool when sized"""
+        from shopsphere_project import settings as project_settings
+
+        config = project_settings.database_config('postgres://shop:secret@db:5432/shop')
+        self.assertEqual(config['CONN_MAX_AGE'], project_settings.DB_CONN_MAX_AGE)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+
+        with mock.patch.object(project_settings, 'DB_POOL_MAX_SIZE', 10), \
+                mock.patch.dict('sys.modules', {'psycopg_pool': mock.Mock()}):
+            config = project_settings.database_config('postgres://shop:secret@db:5432/shop')
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool'], {'min_size': project_settings.DB_POOL_MIN_SIZE, 'max_size': 10})
+
+    def test_pool_without_psycopg3(self):
+        """Test sizing a pool without psycopg 3's pool installed is a clear configuration error"""
+        from shopsphere_project import settings as project_settings
+
+        with mock.patch.object(project_settings, 'DB_POOL_MAX_SIZE', 10), \
+                mock.patch.dict('sys.modules', {'psycopg_pool': None}):
+            with self.assertRaisesMessage(ImproperlyConfigured, 'psycopg[pool]'):
+                project_settings.database_config('postgres://shop:secret@db:5432/shop')
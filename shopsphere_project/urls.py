@@ -21,6 +21,7 @@ from django.conf.urls.static import static
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -77,6 +78,10 @@ urlpatterns = [
     path('api/auth/', include('users.urls')),
     path('api/', include('products.urls')),
     path('api/', include('orders.urls')),
+    path('api/analytics/', include('analytics.urls')),
+    
+    # Request metrics (Prometheus text format)
+    path('metrics', metrics_view, name='metrics'),
     
     # API Documentation
     path('', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
@@ -0,0 +1,121 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+def field_values(instance, exclude=()):
+    return {f.attname: getattr(instance, f.attname) for f in instance._meta.concrete_fields if f.attname not in exclude}
+
+
+def from_field_values(model, db, values):
+    """An instance as if loaded by a query; fields not in ``values`` are deferred"""
+    names = [f.attname for f in model._meta.concrete_fields if f.attname in values]
+    return model.from_db(db, names, [values[name] for name in names])
+
+
+def user_cache_entry(user):
+    """
+    What the shared cache keeps of a user: its fields and profile without the
+    password hash, plus the digest of it that tokens carry for revocation.
+    """
+    profile = getattr(user, 'profile', None)
+    return {
+        'db': user._state.db,
+        'user': field_values(user, exclude={'password'}),
+        'profile': field_values(profile) if profile is not None else None,
+        'password_digest': get_md5_hash_password(user.password),
+    }
+
+
+def user_from_cache_entry(model, entry):
+    """Rebuild a cached user; its password is read from the database if used"""
+    user = from_field_values(model, entry['db'], entry['user'])
+    profile = None
+    if entry['profile'] is not None:
+        profile_model = model._meta.get_field('profile').related_model
+        profile = from_field_values(profile_model, entry['db'], entry['profile'])
+        profile._state.fields_cache['user'] = user
+    user._state.fields_cache['profile'] = profile
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the token's user from a short-TTL cache.
+
+    The user is loaded together with its profile, so authenticated requests
+    that render the profile cost no queries until the entry expires or a
+    User/Profile save invalidates it. The password hash is never cached.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+
+        key = user_cache_key(user_id)
+        entry = cache.get(key)
+        if entry is None:
+            try:
+                user = self.user_model.objects.select_related('profile').get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found") from e
+            entry = user_cache_entry(user)
+            cache.set(key, entry, settings.AUTH_USER_CACHE_TIMEOUT)
+        else:
+            user = user_from_cache_entry(self.user_model, entry)
+
+        # Same checks as JWTAuthentication.get_user, on the cached user
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != entry['password_digest']:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+        return user
+
+
+class ProfileModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the user with its profile, since the login
+    response renders both; a password login then costs one SELECT.
+
+    It is listed ahead of Django's ModelBackend, which stays configured so
+    existing sessions keep resolving. A rejected password ends the chain with
+    PermissionDenied rather than being hashed again by the next backend.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = User._default_manager.select_related('profile').get(**{User.USERNAME_FIELD: username})
+        except User.DoesNotExist:
+            # Hash anyway so unknown usernames take as long as wrong passwords
+            User().set_password(password)
+            raise PermissionDenied
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        raise PermissionDenied
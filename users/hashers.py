@@ -0,0 +1,19 @@
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 at ``PASSWORD_HASH_ITERATIONS`` rounds (Django's default
+    when unset). Fewer rounds than the default, the faster tier, only apply
+    with ``PASSWORD_HASH_FAST_TIER`` set. It keeps Django's algorithm name,
+    so existing hashes still verify and are rehashed to the configured count
+    on their next login.
+    """
+
+    @property
+    def iterations(self):
+        iterations = settings.PASSWORD_HASH_ITERATIONS or PBKDF2PasswordHasher.iterations
+        if iterations < PBKDF2PasswordHasher.iterations and not settings.PASSWORD_HASH_FAST_TIER:
+            return PBKDF2PasswordHasher.iterations
+        return iterations
@@ -0,0 +1,124 @@
+"""
+``Idempotency-Key`` support for create endpoints.
+
+The first request with a key inserts its ``IdempotencyRecord`` in the same
+transaction as the objects it creates and fills in the response before
+committing. A retry finds the committed record and gets the stored response
+back without running the serializer again. A duplicate sent while the first
+is still running blocks on the record's unique index until the first commits
+(then replays) or rolls back (then runs itself).
+
+Only 2xx responses are stored; an error leaves the key free, so a corrected
+retry can succeed. Records older than ``IDEMPOTENCY_KEY_TTL`` seconds are
+ignored and purged by the ``purge-idempotency-records`` beat job.
+
+Keys are scoped per endpoint and user. Anonymous keys are also scoped by
+the request fingerprint, so two clients that pick the same key never see
+each other's responses. A view can keep secrets out of the table with an
+``idempotent_store(data)`` method and add them back on replay with
+``idempotent_replay(data)``, which returns None if what the first request
+created is gone; the retry then gets 410.
+"""
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from .models import IdempotencyRecord
+
+HEADER = 'Idempotency-Key'
+
+
+def fingerprint(request):
+    """Hash of what makes two requests the same: method, path and body"""
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode()).hexdigest()
+
+
+def live_record(scope, key):
+    """The unexpired record stored under the key, if any"""
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    return IdempotencyRecord.objects.filter(scope=scope, key=key, created_at__gt=cutoff).first()
+
+
+def claim(scope, key, digest):
+    """
+    Insert this request's record, inside the caller's transaction, and
+    return None; or return the live record of a request that got there first.
+    """
+    while True:
+        try:
+            with transaction.atomic():
+                # Waits here while another request holding this key is in flight
+                IdempotencyRecord.objects.create(scope=scope, key=key, fingerprint=digest)
+            return None
+        except IntegrityError:
+            record = live_record(scope, key)
+            if record is not None:
+                return record
+            # The key's record has expired; drop it and claim the key afresh
+            IdempotencyRecord.objects.filter(scope=scope, key=key).delete()
+
+
+def purge_expired():
+    """Delete records past ``IDEMPOTENCY_KEY_TTL``; returns how many"""
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    deleted, _ = IdempotencyRecord.objects.filter(created_at__lte=cutoff).delete()
+    return deleted
+
+
+def idempotent(create):
+    """Let clients retry a view's ``create`` safely by sending an ``Idempotency-Key`` header"""
+
+    @wraps(create)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return create(self, request, *args, **kwargs)
+        if not 0 < len(key) <= 255:
+            return Response(
+                {'detail': f'{HEADER} must be 1 to 255 characters.'}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        digest = fingerprint(request)
+        if request.user.is_authenticated:
+            scope = f'{request.resolver_match.view_name}:{request.user.pk}'
+        else:
+            scope = f'{request.resolver_match.view_name}:anon:{digest}'
+        record = live_record(scope, key)
+        if record is None:
+            with transaction.atomic():
+                record = claim(scope, key, digest)
+                if record is None:
+                    response = create(self, request, *args, **kwargs)
+                    if status.is_success(response.status_code):
+                        store = getattr(self, 'idempotent_store', None)
+                        IdempotencyRecord.objects.filter(scope=scope, key=key).update(
+                            status_code=response.status_code,
+                            response=store(response.data) if store else response.data,
+                        )
+                    else:
+                        transaction.set_rollback(True)
+                    return response
+
+        if record.fingerprint != digest:
+            return Response(
+                {'detail': f'{HEADER} was already used for a different request.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY
+            )
+        replay = getattr(self, 'idempotent_replay', None)
+        data = replay(record.response) if replay else record.response
+        if data is None:
+            return Response(
+                {'detail': f'What the first request with this {HEADER} created no longer exists.'},
+                status=status.HTTP_410_GONE
+            )
+        return Response(data, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+    return wrapper
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from users.tokens import flush_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Delete expired outstanding refresh tokens and their blacklist entries in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Tokens deleted per statement')
+
+    def handle(self, *args, **options):
+        removed = flush_expired_tokens(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} expired token(s)'))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 16:14
+
+from django.db import migrations, models
+
+# simplejwt's model is not ours to add Meta.indexes to, so the index is
+# created through the schema editor, which writes each backend's own DDL
+EXPIRES_INDEX = models.Index(fields=['expires_at'], name='outstanding_token_expires_idx')
+
+
+def add_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model('token_blacklist', 'OutstandingToken'), EXPIRES_INDEX)
+
+
+def remove_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model('token_blacklist', 'OutstandingToken'), EXPIRES_INDEX)
+
+
+class Migration(migrations.Migration):
+    """
+    Index simplejwt's outstanding tokens by expiry so flush_expired_tokens
+    seeks to the expired rows instead of scanning the table.
+    """
+
+    dependencies = [
+        ('users', '0002_idempotencyrecord'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_index, remove_index),
+    ]
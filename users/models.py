@@ -1,7 +1,9 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from .authentication import invalidate_cached_user
 # Create your models here.
 
 class Profile(models.Model):
@@ -21,4 +23,35 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 @receiver(post_save, sender=User)
 def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
\ No newline at end of file
+    instance.profile.save()
+
+# Signals to drop the cached authenticated user whenever it or its profile changes
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_cache(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+@receiver([post_save, post_delete], sender=Profile)
+def invalidate_profile_user_cache(sender, instance, **kwargs):
+    invalidate_cached_user(instance.user_id)
+
+
+class IdempotencyRecord(models.Model):
+    """
+    The response to a create request sent with an ``Idempotency-Key``,
+    replayed to retries of the same request (see idempotency.py).
+    """
+    # View name and user id, so keys from different clients and endpoints never meet
+    scope = models.CharField(max_length=150)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True)
+    response = models.JSONField(null=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['scope', 'key'], name='idempotency_scope_key_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.scope} {self.key}"
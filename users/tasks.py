@@ -0,0 +1,15 @@
+from celery import shared_task
+from . import tokens
+from .idempotency import purge_expired
+
+
+@shared_task
+def purge_idempotency_records():
+    """Delete stored Idempotency-Key responses that have expired"""
+    return purge_expired()
+
+
+@shared_task
+def flush_expired_tokens():
+    """Delete expired outstanding refresh tokens"""
+    return tokens.flush_expired_tokens()
@@ -1,3 +1,341 @@
-from django.test import TestCase
+import pickle
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import jwt
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpRequest
+from django.test import Client, TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import CachedJWTAuthentication, user_cache_key
+from .hashers import TunablePBKDF2PasswordHasher
+from .models import IdempotencyRecord
+from .tasks import purge_idempotency_records
+
+
+class CachedJWTAuthenticationTest(TestCase):
+    """Test JWT requests resolve their user from the cache"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='shopper',
+            email='shopper@example.com',
+            password='shopperpass123'
+        )
+        self.client = APIClient()
+        token = RefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_profile_read_is_query_free_once_cached(self):
+        """Test the first read loads user and profile in one query, later reads none"""
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.data['username'], 'shopper')
+        self.assertIn('phone_number', response.data['profile'])
+
+    def test_authenticated_list_skips_user_query(self):
+        """Test an authenticated list only runs its own queries once cached"""
+        self.client.get('/api/orders/')
+
+        # COUNT only; the page query is skipped for an empty result
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/orders/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_profile_update_invalidates_cache(self):
+        """Test updating the profile is visible on the next request"""
+        self.client.get('/api/auth/profile/')
+
+        response = self.client.put('/api/auth/profile/', {'phone_number': '555-0100'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(cache.get(user_cache_key(self.user.pk)))
+
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.data['profile']['phone_number'], '555-0100')
+
+    def test_deactivated_user_is_rejected(self):
+        """Test saving the user drops the cached copy so is_active is rechecked"""
+        self.client.get('/api/auth/profile/')
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_hash_is_not_cached(self):
+        """Test the shared cache never holds the password hash"""
+        self.client.get('/api/auth/profile/')
+
+        entry = cache.get(user_cache_key(self.user.pk))
+        self.assertNotIn(self.user.password, pickle.dumps(entry).decode('latin-1'))
+
+        # A cached user still reads its password, from the database
+        user = CachedJWTAuthentication().get_user(RefreshToken.for_user(self.user).access_token)
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('shopperpass123'))
+
+    def test_deleted_user_is_rejected(self):
+        """Test a deleted user's token stops working"""
+        self.client.get('/api/auth/profile/')
+
+        self.user.delete()
+
+        response = self.client.get('/api/auth/profile/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class IdempotentRegistrationTest(TestCase):
+    """Test registration retries with an Idempotency-Key create one user"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.data = {
+            'username': 'newbie',
+            'email': 'newbie@example.com',
+            'password': 'newbiepass123',
+            'password2': 'newbiepass123',
+        }
+
+    def register(self, data, key='signup-1'):
+        return self.client.post('/api/auth/register/', data, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_response(self):
+        """Test a retry gets the first response back with fresh tokens"""
+        first = self.register(self.data)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        # record + user + outstanding token
+        with self.assertNumQueries(3):
+            retry = self.register(self.data)
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(list(retry.data), list(first.data))
+        self.assertEqual(retry.data['user'], first.data['user'])
+        self.assertNotEqual(retry.data['tokens']['refresh'], first.data['tokens']['refresh'])
+        self.assertEqual(User.objects.filter(username='newbie').count(), 1)
+
+    def test_tokens_are_not_stored(self):
+        """Test the stored response holds no usable tokens"""
+        self.register(self.data)
+
+        self.assertNotIn('tokens', IdempotencyRecord.objects.get().response)
+
+    def test_anonymous_clients_sharing_a_key(self):
+        """Test two signups that pick the same key each get their own response"""
+        first = self.register(self.data)
+
+        response = self.register({**self.data, 'username': 'other', 'email': 'other@example.com'})
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(response.data['user']['username'], 'other')
+        self.assertNotEqual(response.data['user']['id'], first.data['user']['id'])
+
+    def test_retry_after_the_account_was_deleted(self):
+        """Test a replay for a user deleted since is answered with 410, not a crash"""
+        first = self.register(self.data)
+        User.objects.filter(pk=first.data['user']['id']).delete()
+
+        response = self.register(self.data)
+
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertNotIn('tokens', response.data)
+
+    def test_errors_are_not_stored(self):
+        """Test a failed request leaves the key free for a corrected retry"""
+        response = self.register({**self.data, 'password2': 'mismatch'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+        response = self.register({**self.data, 'password2': 'mismatch'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    @override_settings(IDEMPOTENCY_KEY_TTL=60)
+    def test_expired_records_are_ignored_and_purged(self):
+        """Test an expired key runs the request again and the purge job deletes it"""
+        self.register(self.data)
+        IdempotencyRecord.objects.update(created_at=timezone.now() - timedelta(seconds=61))
+
+        # A fresh run, so the duplicate username is rejected this time
+        response = self.register(self.data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.assertEqual(purge_idempotency_records(), 1)
+        self.assertFalse(IdempotencyRecord.objects.exists())
+
+
+class LoginTest(TestCase):
+    """Test throttled logins, password rehashing and refresh rotation"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='shopper', password='shopperpass123')
+        self.client = APIClient()
+
+    def login(self, password='shopperpass123', username='shopper', **extra):
+        return self.client.post('/api/auth/login/', {'username': username, 'password': password}, format='json', **extra)
+
+    def test_login_queries(self):
+        """Test a login loads user and profile together and records one outstanding token"""
+        with self.assertNumQueries(2):
+            response = self.login()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('phone_number', response.data['user']['profile'])
+        self.assertTrue(OutstandingToken.objects.filter(user=self.user).exists())
+
+    @override_settings(LOGIN_RATE_PER_USERNAME='3/hour')
+    def test_failed_logins_lock_the_username_before_hashing(self):
+        """Test repeated failures refuse further attempts without checking the password"""
+        for _ in range(3):
+            self.assertEqual(self.login('wrong').status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with mock.patch.object(User, 'check_password') as check_password:
+            response = self.login()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        check_password.assert_not_called()
+
+        # Other usernames are unaffected, and the count is per username in any case
+        User.objects.create_user(username='other', password='otherpass123')
+        self.assertEqual(self.login('otherpass123', username='OTHER').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login('otherpass123', username='other').status_code, status.HTTP_200_OK)
+
+    def test_wrong_password_is_hashed_once(self):
+        """Test a rejected password is not checked again by ModelBackend"""
+        with mock.patch.object(User, 'check_password', return_value=False) as check_password:
+            response = self.login('wrong')
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(check_password.call_count, 1)
+
+    def test_existing_model_backend_sessions(self):
+        """Test sessions saved with ModelBackend's path still load their user"""
+        client = Client()
+        client.force_login(self.user, backend='django.contrib.auth.backends.ModelBackend')
+        request = HttpRequest()
+        request.session = client.session
+
+        self.assertEqual(get_user(request), self.user)
+
+    @override_settings(LOGIN_RATE_PER_USERNAME='3/hour')
+    def test_successful_login_clears_failures(self):
+        self.login('wrong')
+        self.login('wrong')
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+        self.login('wrong')
+        self.login('wrong')
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    @override_settings(LOGIN_RATE_PER_IP='2/min')
+    def test_attempts_per_ip(self):
+        """Test one address gets a fixed number of attempts, whatever the username"""
+        self.login()
+        self.login('wrong', username='someone')
+
+        self.assertEqual(self.login().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.login(REMOTE_ADDR='10.0.0.2').status_code, status.HTTP_200_OK)
+
+    @override_settings(LOGIN_RATE_PER_IP='3/min')
+    def test_forwarded_for_does_not_reset_ip_limit(self):
+        """Test a client can't dodge the per-IP limit by rotating X-Forwarded-For"""
+        codes = [
+            self.login('wrong', HTTP_X_FORWARDED_FOR=f'198.51.100.{i}').status_code for i in range(5)
+        ]
+        self.assertEqual(codes[3:], [status.HTTP_429_TOO_MANY_REQUESTS] * 2)
+
+        # Behind one proxy only the address it appended counts
+        cache.clear()
+        rest_framework = {**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}
+        with self.settings(REST_FRAMEWORK=rest_framework):
+            codes = [
+                self.login('wrong', HTTP_X_FORWARDED_FOR=f'198.51.100.{i}, 203.0.113.7').status_code
+                for i in range(5)
+            ]
+            self.assertEqual(codes[3:], [status.HTTP_429_TOO_MANY_REQUESTS] * 2)
+            self.assertEqual(
+                self.login(HTTP_X_FORWARDED_FOR='198.51.100.1, 203.0.113.8').status_code, status.HTTP_200_OK
+            )
+
+    @override_settings(
+        PASSWORD_HASHERS=['users.hashers.TunablePBKDF2PasswordHasher'],
+        PASSWORD_HASH_ITERATIONS=2000,
+        PASSWORD_HASH_FAST_TIER=True,
+    )
+    def test_rehash_on_login(self):
+        """Test a change of hashing tier is applied to each password at its next login"""
+        self.user.set_password('shopperpass123')
+        self.user.save()
+        self.assertIn('$2000$', self.user.password)
+
+        with self.settings(PASSWORD_HASH_ITERATIONS=1000):
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        self.assertTrue(self.user.check_password('shopperpass123'))
+
+    @override_settings(PASSWORD_HASH_ITERATIONS=2000)
+    def test_fast_tier_needs_acknowledging(self):
+        """Test a count below Django's default only applies with PASSWORD_HASH_FAST_TIER"""
+        hasher = TunablePBKDF2PasswordHasher()
+        self.assertEqual(hasher.iterations, PBKDF2PasswordHasher.iterations)
+
+        with self.settings(PASSWORD_HASH_FAST_TIER=True):
+            self.assertEqual(hasher.iterations, 2000)
+
+    def test_refresh_rotation_blacklists_the_old_token(self):
+        """Test a rotated refresh token is blacklisted and its replacement works"""
+        refresh = self.login().data['tokens']['refresh']
+
+        with self.assertNumQueries(5):
+            response = self.client.post('/api/auth/token/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(BlacklistedToken.objects.get().token.jti, RefreshToken(refresh, verify=False)['jti'])
+
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_token_with_wrong_signature_is_rejected(self):
+        """Test a forged refresh token for an unrecorded jti gets no tokens"""
+        forged = RefreshToken.for_user(self.user)
+        payload = RefreshToken(str(forged), verify=False).payload
+        token = jwt.encode(payload, 'not-the-signing-key', algorithm=api_settings.ALGORITHM)
+
+        response = self.client.post('/api/auth/token/refresh/', {'refresh': token}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertNotIn('access', response.data)
+
+    def test_flush_expired_tokens(self):
+        """Test the cleanup command removes expired tokens with their blacklist entries"""
+        refresh = self.login().data['tokens']['refresh']
+        self.client.post('/api/auth/token/refresh/', {'refresh': refresh}, format='json')
+        OutstandingToken.objects.filter(jti=RefreshToken(refresh, verify=False)['jti']).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        out = StringIO()
+        call_command('flush_expired_tokens', batch_size=1, stdout=out)
+
+        self.assertIn('Removed 1 expired token(s)', out.getvalue())
+        self.assertFalse(BlacklistedToken.objects.exists())
+        self.assertEqual(OutstandingToken.objects.count(), 1)
@@ -0,0 +1,73 @@
+"""
+Login throttles. Both run in ``APIView.initial``, before the password is
+hashed, so a throttled brute-force attempt costs a cache read and no PBKDF2.
+"""
+import hashlib
+
+from django.conf import settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+class LoginRateThrottle(SimpleRateThrottle):
+    """Rate read from the setting named by ``rate_setting``; empty disables it"""
+    rate_setting = None
+
+    def get_rate(self):
+        return getattr(settings, self.rate_setting) or None
+
+
+class LoginIPThrottle(LoginRateThrottle):
+    """Every login attempt from one client address, at ``LOGIN_RATE_PER_IP``"""
+    scope = 'login_ip'
+    rate_setting = 'LOGIN_RATE_PER_IP'
+
+    def get_cache_key(self, request, view):
+        return self.cache_format % {'scope': self.scope, 'ident': self.get_ident(request)}
+
+
+class LoginUsernameThrottle(LoginRateThrottle):
+    """
+    Failed logins for one username, from any address, at
+    ``LOGIN_RATE_PER_USERNAME``. Only failures are recorded (by the view),
+    and a successful login clears them.
+    """
+    scope = 'login_username'
+    rate_setting = 'LOGIN_RATE_PER_USERNAME'
+
+    def get_cache_key(self, request, view):
+        username = request.data.get('username')
+        if not isinstance(username, str) or not username:
+            return None
+        # Hashed so any username makes a valid cache key
+        ident = hashlib.sha256(username.lower().encode()).hexdigest()
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def allow_request(self, request, view):
+        """Refuse once the failures in the window reach the limit, without recording this attempt"""
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        self.history = self.cache.get(self.key, [])
+        self.now = self.timer()
+        while self.history and self.history[-1] <= self.now - self.duration:
+            self.history.pop()
+        if len(self.history) >= self.num_requests:
+            return self.throttle_failure()
+        return True
+
+    def record_failure(self, request, view):
+        """Count a failed login against the username"""
+        key = self.get_cache_key(request, view)
+        if self.rate is None or key is None:
+            return
+        now = self.timer()
+        history = [stamp for stamp in self.cache.get(key, []) if stamp > now - self.duration]
+        self.cache.set(key, [now, *history], self.duration)
+
+    def reset(self, request, view):
+        """Forget the username's failures after a successful login"""
+        key = self.get_cache_key(request, view)
+        if self.rate is not None and key is not None:
+            self.cache.delete(key)
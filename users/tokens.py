@@ -0,0 +1,106 @@
+"""JWT issuance and upkeep of the refresh-token blacklist tables."""
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+
+def issue_tokens(user):
+    """
+    A refresh/access pair for the user. The refresh token is recorded as
+    outstanding (one INSERT) so it can be blacklisted on rotation or logout.
+    """
+    refresh = RefreshToken.for_user(user)
+    return {
+        'refresh': str(refresh),
+        'access': str(refresh.access_token),
+    }
+
+
+def record_outstanding(token, user):
+    return OutstandingToken.objects.create(
+        user=user,
+        jti=token[api_settings.JTI_CLAIM],
+        token=str(token),
+        created_at=token.current_time,
+        expires_at=datetime_from_epoch(token['exp']),
+    )
+
+
+class SignedRefreshToken(RefreshToken):
+    """
+    A refresh token checked for signature, expiry and type on construction;
+    the blacklist is left to the caller's own lookup of the token row.
+    """
+
+    def verify(self):
+        Token.verify(self)
+
+
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    simplejwt's refresh with rotation and blacklisting in one SELECT and two
+    INSERTs. The stock serializer looks the user up three times and runs a
+    get_or_create for each token row.
+    """
+
+    def validate(self, attrs):
+        # Signature, expiry and token type; the blacklist check is the SELECT below
+        refresh = SignedRefreshToken(attrs['refresh'])
+
+        jti = refresh[api_settings.JTI_CLAIM]
+        outstanding = (
+            OutstandingToken.objects.select_related('user', 'blacklistedtoken').filter(jti=jti).first()
+        )
+        if outstanding is not None and hasattr(outstanding, 'blacklistedtoken'):
+            raise TokenError(_("Token is blacklisted"))
+        if outstanding is not None:
+            user = outstanding.user
+        else:
+            # Issued before it was recorded, e.g. by another serializer
+            user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+            user = User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            try:
+                with transaction.atomic():
+                    if api_settings.BLACKLIST_AFTER_ROTATION:
+                        if outstanding is None:
+                            outstanding = record_outstanding(refresh, user)
+                        # One-to-one, so a concurrent refresh of the same token fails here
+                        BlacklistedToken.objects.create(token=outstanding)
+                    refresh.set_jti()
+                    refresh.set_exp()
+                    refresh.set_iat()
+                    record_outstanding(refresh, user)
+            except IntegrityError:
+                raise TokenError(_("Token is blacklisted"))
+            data['refresh'] = str(refresh)
+        return data
+
+
+def flush_expired_tokens(batch_size=1000):
+    """
+    Delete expired outstanding tokens, and their blacklist entries, in
+    batches along the ``expires_at`` index; returns how many were removed.
+    """
+    removed = 0
+    while True:
+        batch = list(
+            OutstandingToken.objects.filter(expires_at__lte=timezone.now())
+            .order_by('expires_at')
+            .values_list('pk', flat=True)[:batch_size]
+        )
+        if not batch:
+            return removed
+        OutstandingToken.objects.filter(pk__in=batch).delete()
+        removed += len(batch)
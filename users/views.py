@@ -5,8 +5,11 @@ from rest_framework import status, generics
 from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from .idempotency import idempotent
+from .throttling import LoginIPThrottle, LoginUsernameThrottle
+from .tokens import issue_tokens
 from .serializers import (
     UserRegistrationSerializer, 
     UserSerializer, 
@@ -19,27 +22,35 @@ class UserRegistrationView(generics.CreateAPIView):
     permission_classes = [AllowAny]
     serializer_class = UserRegistrationSerializer
     
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
         
-        # Generate JWT tokens
-        refresh = RefreshToken.for_user(user)
-        
         return Response({
             'user': UserSerializer(user).data,
-            'tokens': {
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-            },
+            'tokens': issue_tokens(user),
             'message': 'User registered successfully'
         }, status=status.HTTP_201_CREATED)
+    
+    def idempotent_store(self, data):
+        """Keep live tokens out of the idempotency table"""
+        return {field: value for field, value in data.items() if field != 'tokens'}
+    
+    def idempotent_replay(self, data):
+        """A replay gets fresh tokens for the user the first request created, if it still exists"""
+        user = User.objects.filter(pk=data['user']['id']).first()
+        if user is None:
+            return None
+        return {'user': data['user'], 'tokens': issue_tokens(user), **data}
 
 
 class UserLoginView(APIView):
     """Login user and return JWT tokens"""
     permission_classes = [AllowAny]
+    # Checked before the password is hashed
+    throttle_classes = [LoginIPThrottle, LoginUsernameThrottle]
     
     def post(self, request):
         username = request.data.get('username')
@@ -52,23 +63,20 @@ class UserLoginView(APIView):
             )
         
         # Authenticate user
-        user = authenticate(username=username, password=password)
+        user = authenticate(request, username=username, password=password)
         
         if user is None:
+            LoginUsernameThrottle().record_failure(request, self)
             return Response(
                 {'error': 'Invalid credentials'},
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        # Generate tokens
-        refresh = RefreshToken.for_user(user)
+        LoginUsernameThrottle().reset(request, self)
         
         return Response({
             'user': UserSerializer(user).data,
-            'tokens': {
-                'refresh': str(refresh),
-                'access': str(refresh.access_token),
-            },
+            'tokens': issue_tokens(user),
             'message': 'Login successful'
         }, status=status.HTTP_200_OK)
 
@@ -79,7 +87,11 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
     
     def get_object(self):
-        return self.request.user
+        user = self.request.user
+        if User.profile.is_cached(user):
+            # Loaded with its profile by CachedJWTAuthentication
+            return user
+        return User.objects.select_related('profile').get(pk=user.pk)
     
     def update(self, request, *args, **kwargs):
         user = self.get_object()